@@ -0,0 +1,94 @@
+"""
+Memory and time benchmark for the ACI object model (nati_data.aci_model).
+
+Decodes a synthetic fabric's class responses and builds the objects the
+collectors keep until their upsert, once with the former per-object
+dicts and repeated DN splits and once with the named tuples and interned
+DN components. Reports the memory the kept objects hold (tracemalloc)
+and the build time per object.
+
+    python -m benchmarks.bench_aci_model [epgs per AP]
+"""
+
+import json
+import sys
+import time
+import tracemalloc
+
+from benchmarks.fake_apic import build_fabric
+from nati_data import aci_model
+
+
+def node_dict(attr):
+    return {'id': attr['dn'], 'name': attr['name'], 'role': attr['role'], 'serial': attr.get('serial', '')}
+
+
+def tenant_dict(attr):
+    return {'id': attr['dn'].split('/')[1], 'dn': attr['dn'], 'name': attr['name'], 'descr': attr.get('descr', '')}
+
+
+def child_dict(attr):
+    return {
+        'id': attr['dn'].split('/')[2], 'name': attr['name'],
+        'tenant': attr['dn'].split('/')[1], 'descr': attr.get('descr', '')
+    }
+
+
+def epg_dict(attr):
+    parts = attr['dn'].split('/')
+    return {
+        'id': attr['dn'].split('/')[3], 'name': attr['name'],
+        'tenant': parts[1], 'ap': parts[2], 'descr': attr.get('descr', '')
+    }
+
+
+BUILDERS = {
+    "dicts": {
+        'fabricNode': node_dict, 'fvTenant': tenant_dict, 'fvCtx': child_dict,
+        'fvAp': child_dict, 'fvBD': child_dict, 'fvAEPg': epg_dict,
+    },
+    "aci_model": {
+        'fabricNode': aci_model.node_info, 'fvTenant': aci_model.tenant_info, 'fvCtx': aci_model.vrf_info,
+        'fvAp': aci_model.ap_info, 'fvBD': aci_model.bd_info, 'fvAEPg': aci_model.epg_info,
+    },
+}
+
+
+def build(pages, builders):
+    """Decode every page and keep the built objects, as a class query does before its upsert."""
+    kept = []
+    for class_name, page in pages.items():
+        info = builders[class_name]
+        for mo in json.loads(page)['imdata']:
+            kept.append(info(mo[class_name]['attributes']))
+    return kept
+
+
+def measure(pages, builders):
+    """(bytes held by the kept objects, seconds to build them)"""
+    aci_model.parent_parts.cache_clear()
+    tracemalloc.start()
+    kept = build(pages, builders)
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    start = time.perf_counter()
+    build(pages, builders)
+    return held, time.perf_counter() - start, len(kept)
+
+
+def main(epgs=100):
+    fabric = build_fabric(tenants=20, vrfs=5, bds=100, aps=20, epgs=epgs, nodes=500)
+    # Serialised responses, so every run decodes fresh strings as from the APIC
+    pages = {class_name: json.dumps({'imdata': mos}) for class_name, mos in fabric.items()}
+
+    results = {name: measure(pages, builders) for name, builders in BUILDERS.items()}
+    for name, (held, elapsed, count) in results.items():
+        print(f"{name:10} {held / 2 ** 20:8.1f} MiB held {held / count:6.0f} B/object "
+              f"{elapsed / count * 1e6:6.2f} us/object")
+    print(f"{count} objects; aci_model holds {results['aci_model'][0] / results['dicts'][0]:.0%} "
+          f"of the dicts' memory")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100))
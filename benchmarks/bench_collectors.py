@@ -0,0 +1,363 @@
+"""
+End-to-end collection benchmark against local stand-ins for the network.
+
+Each collector runs against a fake started in its own process: an APIC
+per fabric serving synthetic imdata (fake_apic), SSH-served IOS devices
+with per-command latency (fake_ssh) and a Lighthouse (fake_lighthouse).
+The collector itself runs in a fresh process writing to a scratch SQLite
+database, or to the database in the nati.ini section given by --db,
+which must be a disposable one.
+
+Reported per collector: objects collected per second, wall time, peak
+RSS of the collector process and database round trips (statements and
+commits). Results are written as JSON; --compare prints the change
+against an earlier results file.
+
+    python -m benchmarks.bench_collectors [--collectors aci cli opengear] [--compare old.json]
+"""
+
+import argparse
+import concurrent.futures
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from nati_data import storage
+from nati_data.migrations import migrate
+from nati_data.schema import TABLES
+from nati_data.storage import BulkWriter, close_pools, load_db_config, translate_ddl, DEFAULT_CHUNK_SIZE, SQLITE
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+METRICS = ("objects", "wall_time", "objects_per_sec", "peak_rss_kb", "db_round_trips")
+
+
+class RoundTrips:
+    """Statements and commits sent to the database, counted by wrapping storage.connect."""
+
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def add(self):
+        with self.lock:
+            self.count += 1
+
+    def install(self):
+        connect = storage.connect
+        storage.connect = lambda db_config: CountingConnection(connect(db_config), self)
+        return self
+
+
+class CountingCursor:
+    def __init__(self, cursor, counter):
+        self.cursor = cursor
+        self.counter = counter
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cursor.close()
+
+    def execute(self, sql, params=None):
+        self.counter.add()
+        return self.cursor.execute(sql, params)
+
+    def executemany(self, sql, rows):
+        self.counter.add()
+        return self.cursor.executemany(sql, rows)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+class CountingConnection:
+    def __init__(self, conn, counter):
+        self.conn = conn
+        self.counter = counter
+
+    def cursor(self):
+        return CountingCursor(self.conn.cursor(), self.counter)
+
+    def commit(self):
+        self.counter.add()
+        self.conn.commit()
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+
+def peak_rss_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def create_schema(db_config):
+    conn = storage.connect(db_config)
+    try:
+        with conn.cursor() as cursor:
+            for table in TABLES:
+                for statement in translate_ddl(table, storage.db_type(db_config)):
+                    cursor.execute(statement)
+        conn.commit()
+        migrate(conn, storage.db_type(db_config))
+    finally:
+        conn.close()
+
+
+def seed_site(writer, site_id):
+    """A region and site for the run's fabrics and console servers; returns the site_uuid."""
+    region_uuid, site_uuid = str(uuid.uuid4()), str(uuid.uuid4())
+    writer.execute(
+        "INSERT INTO nati_region (region_uuid, region_name) VALUES (%s, %s)", (region_uuid, site_id)
+    )
+    writer.execute(
+        "INSERT INTO nati_site (site_uuid, region_uuid, site_id, site_name) VALUES (%s, %s, %s, %s)",
+        (site_uuid, region_uuid, site_id, site_id)
+    )
+    return site_uuid
+
+
+def prepare_aci(writer, settings, endpoint, site_uuid, directory):
+    from nati_data import cisco_aci
+
+    cisco_aci.aci_config.update(user="admin", password="bench")
+    cisco_aci.aci_workers = settings["workers"]
+    cisco_aci.page_size = settings["page_size"]
+    cisco_aci.query_mode = settings["query_mode"]
+    cisco_aci.incremental = False
+    writer.upsert(
+        "aci_fabric", ("fabric_uuid", "site_uuid", "fabric_name", "url", "host", "username"),
+        [(str(uuid.uuid4()), site_uuid, f"bench-fabric-{n}", f"https://{host}", host, "admin")
+         for n, host in enumerate(endpoint["hosts"])],
+        keys=("fabric_uuid",)
+    )
+
+    def run():
+        try:
+            cisco_aci.collect_aci(writer)
+        finally:
+            cisco_aci.close_apic_sessions()
+        return sum(count for count, elapsed in writer.stats.values())
+    return run
+
+
+def prepare_cli(writer, settings, endpoint, site_uuid, directory):
+    from netmiko import ConnectHandler
+    from nati_data.cisco_cli import DeviceIndex, DiscoveryScheduler, device_params
+    from nati_data.credentials import CredentialCache
+    from nati_data.ssh_pool import SessionPool
+
+    # Seeds look like device IPs; each maps to its fake device's local port
+    seeds = [f"10.255.{n >> 8}.{n & 255}" for n in range(len(endpoint["ports"]))]
+    ports = dict(zip(seeds, endpoint["ports"]))
+    credentials = [{"cred_uuid": "bench", "username": "admin", "password": "bench"}]
+
+    def connect(host, username, password):
+        return ConnectHandler(**dict(device_params("127.0.0.1", username, password), port=ports[host]))
+
+    def run():
+        pool = SessionPool(connect, max_per_device=2)
+        cred_cache = CredentialCache(os.path.join(directory, "credential_cache.json"))
+        try:
+            index = DeviceIndex(writer)
+            scheduler = DiscoveryScheduler(
+                credentials, index, pool, cred_cache, settings["workers"], settings["workers"]
+            )
+            results = scheduler.run([(seed, None) for seed in seeds], {seed: (seed, None) for seed in seeds})
+            index.flush()
+        finally:
+            pool.close_all()
+        return sum(1 for status, detail in results.values() if status != "failed")
+    return run
+
+
+def prepare_opengear(writer, settings, endpoint, site_uuid, directory):
+    from nati_data.opengear import Lighthouse, ResponseCache
+    from nati_data.opengear_sync import sync_lighthouse
+
+    def run():
+        cache = ResponseCache(os.path.join(directory, "lighthouse_cache.json"))
+        lighthouse = Lighthouse(endpoint["host"], "admin", "bench", cache=cache, workers=settings["workers"])
+        try:
+            nodes = lighthouse.get_nodes_with_ports(settings["per_page"])
+            sync_lighthouse(writer, lighthouse, nodes)
+        finally:
+            lighthouse.logout()
+        return len(nodes) + sum(len(node["ports"]) for node in nodes)
+    return run
+
+
+COLLECTORS = {
+    "aci": prepare_aci,
+    "cli": prepare_cli,
+    "opengear": prepare_opengear,
+}
+
+
+def run_fake(collector, settings, ready, stop):
+    """Fake server process: report the endpoint on `ready`, then serve until `stop`."""
+    if collector == "aci":
+        from benchmarks import fake_apic
+        servers = fake_apic.serve(
+            settings["fabrics"], settings["http_latency"], tenants=settings["tenants"], vrfs=settings["vrfs"],
+            bds=settings["bds"], aps=settings["aps"], epgs=settings["epgs"], nodes=settings["nodes"]
+        )
+        ready.put({"hosts": [f"127.0.0.1:{server.server_address[1]}" for server in servers]})
+    elif collector == "cli":
+        from benchmarks import fake_ssh
+        devices = fake_ssh.serve(settings["devices"], settings["ssh_latency"], password="bench")
+        ready.put({"ports": devices.ports})
+    else:
+        from benchmarks import fake_lighthouse
+        server = fake_lighthouse.serve(
+            settings["http_latency"], nodes=settings["og_nodes"], ports=settings["og_ports"],
+            site_id=settings["site_id"]
+        )
+        ready.put({"host": f"127.0.0.1:{server.server_address[1]}"})
+    stop.wait()
+
+
+def run_collector(collector, settings, endpoint, db_config):
+    """Collector process: one timed collection run; returns its metrics."""
+    round_trips = RoundTrips().install()
+    with tempfile.TemporaryDirectory() as directory:
+        db_config = db_config or {"type": SQLITE, "filename": os.path.join(directory, "bench.db")}
+        create_schema(db_config)
+        try:
+            with BulkWriter(db_config, chunk_size=settings["batch_size"]) as writer:
+                site_uuid = seed_site(writer, settings["site_id"])
+                run = COLLECTORS[collector](writer, settings, endpoint, site_uuid, directory)
+                writer.stats.clear()
+                round_trips.count = 0
+                start = time.perf_counter()
+                objects = run()
+                wall_time = time.perf_counter() - start
+        finally:
+            close_pools()
+    return {
+        "objects": objects,
+        "wall_time": round(wall_time, 3),
+        "objects_per_sec": round(objects / wall_time, 1) if wall_time > 0 else 0.0,
+        "peak_rss_kb": peak_rss_kb(),
+        "db_round_trips": round_trips.count,
+    }
+
+
+def benchmark(collector, settings, db_config):
+    context = multiprocessing.get_context("spawn")
+    ready = context.Queue()
+    stop = context.Event()
+    fake = context.Process(target=run_fake, args=(collector, settings, ready, stop), daemon=True)
+    fake.start()
+    try:
+        endpoint = ready.get(timeout=120)
+        # A fresh process per collector, so peak RSS is that collector's alone
+        with concurrent.futures.ProcessPoolExecutor(1, mp_context=context) as pool:
+            return pool.submit(run_collector, collector, settings, endpoint, db_config).result()
+    finally:
+        stop.set()
+        fake.join(10)
+        if fake.is_alive():
+            fake.terminate()
+
+
+def print_comparison(previous, results):
+    for collector, metrics in results["collectors"].items():
+        before = previous.get("collectors", {}).get(collector)
+        if not before or "error" in before or "error" in metrics:
+            continue
+        print(f"{collector}:")
+        for metric in METRICS:
+            old, new = before[metric], metrics[metric]
+            change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+            print(f"    {metric:16} {old:>12} -> {new:>12} ({change})")
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collectors", nargs="+", choices=sorted(COLLECTORS), default=sorted(COLLECTORS))
+    parser.add_argument(
+        "--db", metavar="SECTION", help="nati.ini section of a disposable database (default: scratch SQLite)"
+    )
+    parser.add_argument("--output", help="results file (default: benchmarks/results/collectors-<time>.json)")
+    parser.add_argument("--compare", metavar="RESULTS", help="earlier results file to compare against")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--http-latency", type=float, default=0.0, help="seconds per fake APIC/Lighthouse response")
+    # Fabric size: per fabric, and per tenant or application profile below it
+    parser.add_argument("--fabrics", type=int, default=2)
+    parser.add_argument("--tenants", type=int, default=20)
+    parser.add_argument("--vrfs", type=int, default=5)
+    parser.add_argument("--bds", type=int, default=50)
+    parser.add_argument("--aps", type=int, default=10)
+    parser.add_argument("--epgs", type=int, default=20)
+    parser.add_argument("--nodes", type=int, default=100)
+    parser.add_argument("--page-size", type=int, default=5000)
+    parser.add_argument("--query-mode", choices=("class", "subtree"), default="class")
+    parser.add_argument("--devices", type=int, default=50)
+    parser.add_argument("--ssh-latency", type=float, default=0.05, help="seconds per fake IOS command")
+    parser.add_argument("--og-nodes", type=int, default=500)
+    parser.add_argument("--og-ports", type=int, default=48)
+    parser.add_argument("--per-page", type=int, default=100)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    settings = {
+        name: value for name, value in vars(args).items() if name not in ("collectors", "db", "output", "compare")
+    }
+    settings["site_id"] = f"bench-{uuid.uuid4().hex[:8]}"
+    db_config = load_db_config(args.db) if args.db else None
+
+    results = {
+        "started": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "database": storage.db_type(db_config) if db_config else SQLITE,
+        "settings": settings,
+        "collectors": {},
+    }
+    failures = 0
+    for collector in args.collectors:
+        print(f"[*] Benchmarking {collector}...")
+        try:
+            metrics = benchmark(collector, settings, db_config)
+        except Exception as e:
+            failures += 1
+            metrics = {"error": f"{type(e).__name__}: {e}"}
+            print(f"[!] {collector} failed: {metrics['error']}")
+        else:
+            print(f"[=] {collector}: {metrics['objects']} objects in {metrics['wall_time']:.2f}s "
+                  f"({metrics['objects_per_sec']:.0f}/s), peak RSS {metrics['peak_rss_kb'] / 1024:.0f} MiB, "
+                  f"{metrics['db_round_trips']} DB round trips")
+        results["collectors"][collector] = metrics
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"collectors-{stamp}.json")
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"[=] Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            print_comparison(json.load(f), results)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
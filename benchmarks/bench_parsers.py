@@ -0,0 +1,54 @@
+"""
+Parse-time benchmark for nati_data.parsers against the fixture corpus.
+
+Every fixture is first checked against expected.json, then parsed
+repeatedly to report the cost per parse.
+
+    python -m benchmarks.bench_parsers [iterations]
+"""
+
+import json
+import os
+import sys
+import time
+
+from nati_data.parsers import detect_platform, parse
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "show_version")
+
+
+def load_corpus():
+    with open(os.path.join(FIXTURE_DIR, "expected.json"), "r") as f:
+        expected = json.load(f)
+    corpus = {}
+    for name in sorted(expected):
+        with open(os.path.join(FIXTURE_DIR, name), "r") as f:
+            corpus[name] = f.read()
+    return corpus, expected
+
+
+def main(iterations=2000):
+    corpus, expected = load_corpus()
+    failures = 0
+    for name, output in corpus.items():
+        record = parse(detect_platform(output), "show version", output)._asdict()
+        if record != expected[name]:
+            failures += 1
+            print(f"[!] {name}: parsed {record}, expected {expected[name]}")
+
+    total = 0.0
+    for name, output in corpus.items():
+        start = time.perf_counter()
+        for _ in range(iterations):
+            parse(detect_platform(output), "show version", output)
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        print(f"{name:32} {elapsed / iterations * 1e6:8.1f} us/parse")
+
+    print(f"{'corpus':32} {total / (iterations * len(corpus)) * 1e6:8.1f} us/parse "
+          f"({len(corpus)} fixtures, {iterations} iterations)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
@@ -0,0 +1,157 @@
+"""
+Query benchmark for the schema migrations' lookup and covering indexes.
+
+Builds a synthetic ACI and device inventory in a scratch SQLite database,
+times the dashboard queries on the baseline schema (plus aci_epg.bd_id,
+without which EPG -> BD -> VRF cannot be joined), applies the index
+migration and times them again. Query plans are printed for both.
+
+    python -m benchmarks.bench_schema [iterations]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+from nati_data.migrations import migrate
+from nati_data.schema import TABLES
+from nati_data.storage import connect, translate_ddl, SQLITE
+
+TENANTS = 40
+VRFS_PER_TENANT = 5
+BDS_PER_TENANT = 100
+APS_PER_TENANT = 10
+EPGS_PER_AP = 20
+NODES = 2000
+DEVICES = 20000
+
+QUERIES = {
+    "node by serial": (
+        "SELECT fabric_uuid, node_id, name FROM aci_node WHERE serial = %s",
+        lambda fabric: ("SN01234",),
+    ),
+    "devices by type": (
+        "SELECT device_uuid, hostname FROM network_device WHERE device_type = %s",
+        lambda fabric: ("cisco_nxos",),
+    ),
+    "BDs of a VRF": (
+        "SELECT bd_id, bd_name FROM aci_bd WHERE fabric_uuid = %s AND tenant_id = %s AND vrf_id = %s",
+        lambda fabric: (fabric, "tn-17", "ctx-3"),
+    ),
+    "EPG -> BD -> VRF": (
+        "SELECT e.epg_name, b.bd_name, v.vrf_name FROM aci_epg e "
+        "JOIN aci_bd b ON b.fabric_uuid = e.fabric_uuid AND b.tenant_id = e.tenant_id AND b.bd_id = e.bd_id "
+        "JOIN aci_vrf v ON v.fabric_uuid = b.fabric_uuid AND v.tenant_id = b.tenant_id AND v.vrf_id = b.vrf_id "
+        "WHERE e.epg_name = %s",
+        lambda fabric: ("epg-17-3-11",),
+    ),
+    "EPGs of a VRF": (
+        "SELECT e.epg_name FROM aci_vrf v "
+        "JOIN aci_bd b ON b.fabric_uuid = v.fabric_uuid AND b.tenant_id = v.tenant_id AND b.vrf_id = v.vrf_id "
+        "JOIN aci_epg e ON e.fabric_uuid = b.fabric_uuid AND e.tenant_id = b.tenant_id AND e.bd_id = b.bd_id "
+        "WHERE v.fabric_uuid = %s AND v.tenant_id = %s AND v.vrf_id = %s",
+        lambda fabric: (fabric, "tn-17", "ctx-3"),
+    ),
+}
+
+
+def populate(conn):
+    """Insert the synthetic inventory; returns the fabric_uuid."""
+    region, site, fabric = (str(uuid.uuid4()) for _ in range(3))
+    with conn.cursor() as cursor:
+        cursor.execute("INSERT INTO nati_region (region_uuid, region_name) VALUES (%s, %s)", (region, "bench"))
+        cursor.execute(
+            "INSERT INTO nati_site (site_uuid, region_uuid, site_name) VALUES (%s, %s, %s)", (site, region, "bench")
+        )
+        cursor.execute(
+            "INSERT INTO aci_fabric (fabric_uuid, site_uuid, fabric_name, url, host, username) "
+            "VALUES (%s, %s, %s, %s, %s, %s)", (fabric, site, "bench", "https://apic", "apic", "admin")
+        )
+        tenants = [f"tn-{t}" for t in range(TENANTS)]
+        cursor.executemany(
+            "INSERT INTO aci_tenant (fabric_uuid, tenant_dn, tenant_id, tenant_name) VALUES (%s, %s, %s, %s)",
+            [(fabric, f"uni/{tenant}", tenant, tenant) for tenant in tenants]
+        )
+        cursor.executemany(
+            "INSERT INTO aci_vrf (fabric_uuid, tenant_id, vrf_id, vrf_name) VALUES (%s, %s, %s, %s)",
+            [(fabric, tenant, f"ctx-{v}", f"vrf-{t}-{v}")
+             for t, tenant in enumerate(tenants) for v in range(VRFS_PER_TENANT)]
+        )
+        cursor.executemany(
+            "INSERT INTO aci_bd (fabric_uuid, tenant_id, bd_id, bd_name, vrf_id) VALUES (%s, %s, %s, %s, %s)",
+            [(fabric, tenant, f"BD-{b}", f"bd-{t}-{b}", f"ctx-{b % VRFS_PER_TENANT}")
+             for t, tenant in enumerate(tenants) for b in range(BDS_PER_TENANT)]
+        )
+        cursor.executemany(
+            "INSERT INTO aci_ap (fabric_uuid, tenant_id, ap_id, ap_name) VALUES (%s, %s, %s, %s)",
+            [(fabric, tenant, f"ap-{a}", f"ap-{t}-{a}")
+             for t, tenant in enumerate(tenants) for a in range(APS_PER_TENANT)]
+        )
+        cursor.executemany(
+            "INSERT INTO aci_epg (fabric_uuid, tenant_id, ap_id, epg_id, epg_name, bd_id) "
+            "VALUES (%s, %s, %s, %s, %s, %s)",
+            [(fabric, tenant, f"ap-{a}", f"epg-{e}", f"epg-{t}-{a}-{e}", f"BD-{(a * EPGS_PER_AP + e) % BDS_PER_TENANT}")
+             for t, tenant in enumerate(tenants) for a in range(APS_PER_TENANT) for e in range(EPGS_PER_AP)]
+        )
+        cursor.executemany(
+            "INSERT INTO aci_node (fabric_uuid, node_id, name, role, serial) VALUES (%s, %s, %s, %s, %s)",
+            [(fabric, f"topology/pod-1/node-{n}", f"node-{n}", "leaf", f"SN{n:05}") for n in range(NODES)]
+        )
+        # One device in a hundred is NX-OS, the rest split between IOS and IOS XE
+        types = ("cisco_ios", "cisco_xe")
+        cursor.executemany(
+            "INSERT INTO network_device (device_uuid, hostname, ip_address, device_type) VALUES (%s, %s, %s, %s)",
+            [(str(uuid.uuid4()), f"dev-{d}", f"10.{d >> 16}.{(d >> 8) & 255}.{d & 255}",
+              "cisco_nxos" if d % 100 == 0 else types[d % 2])
+             for d in range(DEVICES)]
+        )
+    conn.commit()
+    return fabric
+
+
+def measure(conn, fabric, iterations):
+    """query name -> (seconds per query, plan)"""
+    results = {}
+    with conn.cursor() as cursor:
+        for name, (sql, params) in QUERIES.items():
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params(fabric))
+            plan = "; ".join(row["detail"] for row in cursor.fetchall())
+            start = time.perf_counter()
+            for _ in range(iterations):
+                cursor.execute(sql, params(fabric))
+                cursor.fetchall()
+            results[name] = ((time.perf_counter() - start) / iterations, plan)
+    return results
+
+
+def main(iterations=200):
+    with tempfile.TemporaryDirectory() as directory:
+        conn = connect({"type": SQLITE, "filename": os.path.join(directory, "bench.db")})
+        try:
+            with conn.cursor() as cursor:
+                for table in TABLES:
+                    for statement in translate_ddl(table, SQLITE):
+                        cursor.execute(statement)
+            conn.commit()
+            migrate(conn, SQLITE, target=1)
+            fabric = populate(conn)
+            before = measure(conn, fabric, iterations)
+            migrate(conn, SQLITE)
+            with conn.cursor() as cursor:
+                cursor.execute("ANALYZE")
+            after = measure(conn, fabric, iterations)
+        finally:
+            conn.close()
+
+    for name in QUERIES:
+        (old, old_plan), (new, new_plan) = before[name], after[name]
+        print(f"{name:20} {old * 1e6:10.1f} us -> {new * 1e6:8.1f} us ({old / new:6.1f}x)")
+        print(f"{'':20} before: {old_plan}")
+        print(f"{'':20} after:  {new_plan}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
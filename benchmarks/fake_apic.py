@@ -0,0 +1,102 @@
+"""
+Stand-in APIC serving a synthetic fabric over the REST calls the
+collectors make: aaaLogin/aaaRefresh/aaaLogout, paged class queries and
+the paged tenant subtree query. Filters are ignored, so every query
+returns the whole class, BDs and EPGs with their fvRsCtx and fvRsBd.
+"""
+
+import uuid
+
+from benchmarks.fake_https import JSONHandler, self_signed_context, serve_https
+
+MOD_TS = "2026-01-01T00:00:00.000+00:00"
+
+# Tenant subtree classes in the order the APIC returns them
+TENANT_CLASSES = ("fvTenant", "fvCtx", "fvAp", "fvBD", "fvAEPg")
+
+
+def build_fabric(tenants=10, vrfs=5, bds=50, aps=10, epgs=20, nodes=100):
+    """
+    class name -> MOs of a fabric with `tenants` tenants, each holding
+    `vrfs` VRFs, `bds` BDs and `aps` APs of `epgs` EPGs, plus `nodes`
+    switches. MOs are sorted by DN, as order-by=<class>.dn returns them.
+    """
+    def mo(class_name, dn, name, **attributes):
+        return {class_name: {"attributes": dict(dn=dn, name=name, descr="", modTs=MOD_TS, **attributes)}}
+
+    def relate(item, class_name, target):
+        # The relation child rsp-subtree=children returns with the MO
+        body = next(iter(item.values()))
+        body["children"] = [{class_name: {"attributes": {"tDn": target}}}]
+        return item
+
+    classes = {class_name: [] for class_name in TENANT_CLASSES + ("fabricNode",)}
+    for t in range(tenants):
+        tenant = f"uni/tn-bench{t}"
+        classes["fvTenant"].append(mo("fvTenant", tenant, f"bench{t}"))
+        classes["fvCtx"].extend(mo("fvCtx", f"{tenant}/ctx-vrf{v}", f"vrf{v}") for v in range(vrfs))
+        classes["fvBD"].extend(
+            relate(mo("fvBD", f"{tenant}/BD-bd{b}", f"bd{b}"), "fvRsCtx", f"{tenant}/ctx-vrf{b % vrfs}")
+            for b in range(bds)
+        )
+        for a in range(aps):
+            ap = f"{tenant}/ap-ap{a}"
+            classes["fvAp"].append(mo("fvAp", ap, f"ap{a}"))
+            classes["fvAEPg"].extend(
+                relate(mo("fvAEPg", f"{ap}/epg-epg{e}", f"epg{e}"), "fvRsBd", f"{tenant}/BD-bd{e % bds}")
+                for e in range(epgs)
+            )
+    for n in range(nodes):
+        node_id = 101 + n
+        classes["fabricNode"].append(mo(
+            "fabricNode", f"topology/pod-1/node-{node_id}", f"leaf{node_id}",
+            role="spine" if n < 2 else "leaf", serial=f"FDO{node_id:08}"
+        ))
+    for mos in classes.values():
+        mos.sort(key=lambda item: next(iter(item.values()))["attributes"]["dn"])
+    return classes
+
+
+def object_count(classes):
+    return sum(len(mos) for mos in classes.values())
+
+
+class ApicHandler(JSONHandler):
+    def authorized(self):
+        return f"APIC-cookie={self.server.token}" in (self.headers.get("Cookie") or "")
+
+    def login_payload(self):
+        self.server.token = uuid.uuid4().hex
+        attributes = {"token": self.server.token, "refreshTimeoutSeconds": "600"}
+        return {"totalCount": "1", "imdata": [{"aaaLogin": {"attributes": attributes}}]}
+
+    def route(self, method, path, query, body):
+        if path == "/api/aaaLogin.json":
+            return 200, self.login_payload(), None
+        if not self.authorized():
+            return 403, {"totalCount": "0", "imdata": []}, None
+        if path == "/api/aaaRefresh.json":
+            return 200, self.login_payload(), None
+        if path == "/api/aaaLogout.json":
+            return 200, {"totalCount": "0", "imdata": []}, None
+
+        classes = self.server.classes
+        if path.startswith("/api/node/class/"):
+            mos = classes.get(path[len("/api/node/class/"):-len(".json")], [])
+        elif path == "/api/node/mo/uni.json" and query.get("query-target") == "subtree":
+            wanted = query.get("target-subtree-class", "").split(",")
+            mos = [mo for class_name in TENANT_CLASSES if class_name in wanted for mo in classes[class_name]]
+        else:
+            return 400, {"totalCount": "0", "imdata": []}, None
+
+        page = int(query.get("page", 0))
+        page_size = int(query.get("page-size", len(mos) or 1))
+        start = page * page_size
+        return 200, {"totalCount": str(len(mos)), "imdata": mos[start:start + page_size]}, None
+
+
+def serve(fabrics=1, latency=0.0, **size):
+    """Start one fake APIC per fabric; returns the servers. `size` goes to build_fabric()."""
+    context = self_signed_context()
+    classes = build_fabric(**size)
+    return [serve_https(ApicHandler, context, latency, classes=classes, token=None) for _ in range(fabrics)]
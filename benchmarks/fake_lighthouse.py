@@ -0,0 +1,76 @@
+"""
+Stand-in Opengear Lighthouse serving a synthetic node inventory: session
+login/logout, paged /nodes with meta.total_pages and /nodes/{id}/ports.
+Responses carry ETags and answer If-None-Match with 304, like Lighthouse.
+"""
+
+import uuid
+
+from benchmarks.fake_https import JSONHandler, self_signed_context, serve_https
+
+API = "/api/v3.7"
+
+
+def build_nodes(nodes=500, ports=48, site_id="bench"):
+    """(node list, node id -> port list) for `nodes` console servers of `ports` ports each."""
+    inventory = []
+    node_ports = {}
+    for n in range(nodes):
+        node_id = f"nodes-{n + 1}"
+        inventory.append({
+            "id": node_id,
+            "name": f"og-bench-{n + 1:05}",
+            "model": "OM2248",
+            "serial_number": f"2248{n:08}",
+            "firmware_version": "24.07.0",
+            "mac_address": f"00:13:c6:{n >> 16 & 255:02x}:{n >> 8 & 255:02x}:{n & 255:02x}",
+            "lhvpn_address": f"192.168.{128 + (n >> 8 & 127)}.{n & 255}",
+            "connection_status": "connected",
+            "tag_list": {"tags": [{"name": "Site", "value": site_id}]},
+        })
+        node_ports[node_id] = [
+            {"id": f"ports-{p}", "label": f"Port {p}", "mode": "consoleServer"} for p in range(1, ports + 1)
+        ]
+    return inventory, node_ports
+
+
+def object_count(inventory, node_ports):
+    return len(inventory) + sum(len(ports) for ports in node_ports.values())
+
+
+class LighthouseHandler(JSONHandler):
+    def cached(self, etag, payload):
+        if self.headers.get("If-None-Match") == etag:
+            return 304, None, {"ETag": etag}
+        return 200, payload, {"ETag": etag}
+
+    def route(self, method, path, query, body):
+        if path == f"{API}/sessions" and method == "POST":
+            self.server.token = uuid.uuid4().hex
+            return 200, {"state": "authenticated", "session": self.server.token}, None
+        if self.headers.get("Authorization") != f"Token {self.server.token}":
+            return 401, {"error": [{"text": "Invalid session"}]}, None
+        if path == f"{API}/sessions/self" and method == "DELETE":
+            self.server.token = None
+            return 200, {}, None
+
+        if path == f"{API}/nodes":
+            page = int(query.get("page", 1))
+            per_page = int(query.get("per_page", 100))
+            nodes = self.server.nodes
+            start = (page - 1) * per_page
+            total_pages = max(1, -(-len(nodes) // per_page))
+            payload = {"nodes": nodes[start:start + per_page], "meta": {"total_pages": total_pages}}
+            return self.cached(f'"nodes-{page}-{per_page}"', payload)
+        if path.startswith(f"{API}/nodes/") and path.endswith("/ports"):
+            node_id = path[len(f"{API}/nodes/"):-len("/ports")]
+            if node_id not in self.server.ports:
+                return 404, {"error": [{"text": "No such node"}]}, None
+            return self.cached(f'"ports-{node_id}"', {"ports": self.server.ports[node_id]})
+        return 404, {"error": [{"text": "Not found"}]}, None
+
+
+def serve(latency=0.0, **size):
+    """Start the fake Lighthouse; returns the server. `size` goes to build_nodes()."""
+    inventory, node_ports = build_nodes(**size)
+    return serve_https(LighthouseHandler, self_signed_context(), latency, nodes=inventory, ports=node_ports, token=None)
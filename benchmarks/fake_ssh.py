@@ -0,0 +1,129 @@
+"""
+Stand-in IOS devices for the CLI collectors, served over SSH with paramiko.
+
+Each device listens on its own 127.0.0.1 port and answers the commands
+discovery sends (terminal setup, show version, show run | include
+^hostname) with IOS output, after `latency` seconds per command. Input is
+echoed like a real terminal, which Netmiko relies on to find the end of
+a command.
+"""
+
+import os
+import selectors
+import socket
+import threading
+import time
+
+import paramiko
+
+VERSION_FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "show_version", "cisco_ios_isr2900.txt")
+FIXTURE_HOSTNAME = "rtr-branch-17"
+
+
+class DeviceServer(paramiko.ServerInterface):
+    def __init__(self, username, password):
+        self.username = username
+        self.password = password
+        self.shell = threading.Event()
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_auth_password(self, username, password):
+        if (username, password) == (self.username, self.password):
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        return True
+
+    def check_channel_shell_request(self, channel):
+        self.shell.set()
+        return True
+
+
+class FakeDevices:
+    """`count` fake IOS devices; self.ports[n] is the SSH port of the n-th."""
+
+    def __init__(self, count, latency=0.0, username="admin", password="bench"):
+        self.latency = latency
+        self.username = username
+        self.password = password
+        self.host_key = paramiko.RSAKey.generate(2048)
+        with open(VERSION_FIXTURE, "r") as f:
+            self.version_output = f.read()
+        self.selector = selectors.DefaultSelector()
+        self.ports = []
+        for n in range(count):
+            listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            listener.bind(("127.0.0.1", 0))
+            listener.listen(16)
+            self.selector.register(listener, selectors.EVENT_READ, f"bench-sw{n + 1:05}")
+            self.ports.append(listener.getsockname()[1])
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def serve_forever(self):
+        while True:
+            for key, _ in self.selector.select():
+                client, _ = key.fileobj.accept()
+                threading.Thread(target=self.handle, args=(client, key.data), daemon=True).start()
+
+    def handle(self, client, hostname):
+        transport = paramiko.Transport(client)
+        transport.add_server_key(self.host_key)
+        server = DeviceServer(self.username, self.password)
+        try:
+            transport.start_server(server=server)
+            channel = transport.accept(30)
+            if channel is not None and server.shell.wait(30):
+                self.shell(channel, hostname)
+        except (EOFError, OSError, paramiko.SSHException):
+            pass
+        finally:
+            transport.close()
+
+    def reply(self, command, hostname):
+        if command in ("", "terminal length 0", "terminal width 511", "terminal no monitor"):
+            return ""
+        if command == "show version":
+            return self.version_output.replace(FIXTURE_HOSTNAME, hostname)
+        if command == "show run | include ^hostname":
+            return f"hostname {hostname}"
+        return "                    ^\n% Invalid input detected at '^' marker."
+
+    def shell(self, channel, hostname):
+        prompt = f"{hostname}#"
+        channel.sendall(f"\r\n{prompt}".encode())
+        pending = ""
+        while True:
+            data = channel.recv(4096)
+            if not data:
+                return
+            text = data.decode(errors="replace").replace("\r\n", "\n").replace("\r", "\n")
+            channel.sendall(text.replace("\n", "\r\n").encode())
+            pending += text
+            while "\n" in pending:
+                line, pending = pending.split("\n", 1)
+                command = line.strip()
+                if command in ("exit", "logout"):
+                    channel.close()
+                    return
+                output = self.reply(command, hostname)
+                if command and self.latency:
+                    time.sleep(self.latency)
+                if output:
+                    channel.sendall((output.replace("\n", "\r\n") + "\r\n").encode())
+                channel.sendall(prompt.encode())
+
+
+def serve(devices=50, latency=0.0, **credentials):
+    """Start `devices` fake IOS devices; returns the FakeDevices."""
+    return FakeDevices(devices, latency, **credentials).start()
@@ -0,0 +1,87 @@
+"""
+Compact ACI managed objects, shared by every ACI collector.
+
+Each MO read from the APIC becomes a named tuple of the fields the
+tables store, instead of a per-object dict, and its attribute dict is
+dropped right away. dn_parts() splits a DN once. The parent part of a DN
+is parsed through a cache into interned components. The tenant and AP of
+thousands of EPGs then share one string object each, and only the last
+component is new per object.
+
+Components keep their APIC prefixes, as stored in the tables:
+uni/tn-common/ap-app/epg-web has tenant "tn-common", AP "ap-app" and
+EPG "epg-web".
+"""
+
+import sys
+from collections import namedtuple
+from functools import lru_cache
+
+# Parent DNs kept parsed: tenants, APs and pods, not the objects themselves
+DN_CACHE_SIZE = 4096
+
+Node = namedtuple("Node", ("id", "name", "role", "serial"))
+Tenant = namedtuple("Tenant", ("id", "dn", "name", "descr"))
+Vrf = namedtuple("Vrf", ("id", "name", "tenant", "descr"))
+Ap = namedtuple("Ap", ("id", "name", "tenant", "descr"))
+Bd = namedtuple("Bd", ("id", "name", "tenant", "descr", "vrf"))
+Epg = namedtuple("Epg", ("id", "name", "tenant", "ap", "descr", "bd"))
+
+
+@lru_cache(maxsize=DN_CACHE_SIZE)
+def parent_parts(parent):
+    return tuple(sys.intern(part) for part in parent.split('/')) if parent else ()
+
+
+def dn_parts(dn):
+    """The '/'-separated components of `dn`; all but the last are cached and interned."""
+    parent, _, name = dn.rpartition('/')
+    return parent_parts(parent) + (name,)
+
+
+def node_info(attr):
+    return Node(attr['dn'], attr['name'], sys.intern(attr['role']), attr.get('serial', ''))
+
+
+def tenant_info(attr):
+    parts = dn_parts(attr['dn'])
+    return Tenant(parts[1], attr['dn'], attr['name'], attr.get('descr', ''))
+
+
+def vrf_info(attr):
+    parts = dn_parts(attr['dn'])
+    return Vrf(parts[2], attr['name'], parts[1], attr.get('descr', ''))
+
+
+def ap_info(attr):
+    parts = dn_parts(attr['dn'])
+    return Ap(parts[2], attr['name'], parts[1], attr.get('descr', ''))
+
+
+def bd_info(attr, children=()):
+    parts = dn_parts(attr['dn'])
+    vrf = rs_target(children, 'fvRsCtx', parts[1])
+    return Bd(parts[2], attr['name'], parts[1], attr.get('descr', ''), vrf)
+
+
+def rs_target(children, class_name, tenant):
+    """
+    The DN part ("BD-web", "ctx-prod") of the object that the relation
+    child `class_name` (fvRsBd, fvRsCtx) resolved to, if that object is in
+    `tenant`. The tables key these references within the referencing
+    object's tenant, so a target in another tenant (usually common, where
+    unresolved names fall back to) is None, as is a missing one.
+    """
+    for child in children:
+        if class_name in child:
+            parts = dn_parts(child[class_name]['attributes'].get('tDn') or '')
+            if len(parts) == 3 and parts[1] == tenant:
+                return sys.intern(parts[2])
+            return None
+    return None
+
+
+def epg_info(attr, children=()):
+    parts = dn_parts(attr['dn'])
+    bd = rs_target(children, 'fvRsBd', parts[1])
+    return Epg(parts[3], attr['name'], parts[1], parts[2], attr.get('descr', ''), bd)
@@ -0,0 +1,221 @@
+"""
+Event-driven ACI collection: keeps the aci_* tables current from APIC
+websocket subscriptions instead of polling every class on a timer.
+
+Each fabric gets its own thread; database connections come from the
+shared storage pool. On every
+(re)connect the thread subscribes first and then runs a full resync,
+which also deletes the stored objects the APIC no longer returns, so no
+change made while the socket was down is lost.
+"""
+
+import json
+import threading
+import time
+
+import requests
+
+from nati_data import cisco_aci, metrics
+from nati_data.aci_model import dn_parts
+from nati_data.storage import BulkWriter, DatabaseError
+
+# Seconds between subscriptionRefresh calls; APIC drops subscriptions
+# that are not refreshed within about a minute
+refresh_interval = cisco_aci.settings["subscription_refresh"]
+
+# Longest wait between reconnect attempts
+MAX_BACKOFF = 300
+
+# Table, key columns after fabric_uuid, and DN parts -> key values for deletes
+ACI_KEYS = {
+    'fvTenant': ('aci_tenant', ('tenant_id',), lambda parts: (parts[1],)),
+    'fvCtx': ('aci_vrf', ('tenant_id', 'vrf_id'), lambda parts: (parts[1], parts[2])),
+    'fvAp': ('aci_ap', ('tenant_id', 'ap_id'), lambda parts: (parts[1], parts[2])),
+    'fvBD': ('aci_bd', ('tenant_id', 'bd_id'), lambda parts: (parts[1], parts[2])),
+    'fvAEPg': ('aci_epg', ('tenant_id', 'ap_id', 'epg_id'), lambda parts: (parts[1], parts[2], parts[3])),
+    'fabricNode': ('aci_node', ('node_id',), lambda parts: ('/'.join(parts),)),
+}
+
+# Child classes (cisco_aci.ACI_CHILDREN) whose events rewrite their parent MO
+ACI_PARENTS = {child: parent for parent, child in cisco_aci.ACI_CHILDREN.items()}
+
+SUBSCRIBED_CLASSES = list(ACI_KEYS) + list(ACI_PARENTS)
+
+
+class FabricSubscriber:
+    def __init__(self, fabric, stop_event):
+        self.fabric = fabric
+        self.fabric_uuid = fabric['fabric_uuid']
+        self.stop_event = stop_event
+        self.session = cisco_aci.get_apic_session(cisco_aci.apic_host(fabric))
+        self.writer = BulkWriter(cisco_aci.db_config, chunk_size=cisco_aci.batch_size)
+        self.ws = None
+        self.subscriptions = {}
+        self.closed = None
+        self.refresher = None
+
+    def run(self):
+        backoff = 1
+        while not self.stop_event.is_set():
+            try:
+                self.connect()
+                backoff = 1
+                self.stream()
+            except Exception as e:
+                print(f"[!] Subscription to fabric {self.fabric['fabric_name']} lost: {e}")
+                self.stop_event.wait(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF)
+            finally:
+                self.disconnect()
+        self.writer.close()
+
+    def connect(self):
+        self.ws = self.session.open_websocket(timeout=1)
+        self.subscriptions = {
+            self.session.subscribe(class_name): class_name for class_name in SUBSCRIBED_CLASSES
+        }
+        # Refreshing starts before the resync, which can outlast the subscription timeout
+        self.closed = threading.Event()
+        self.refresher = threading.Thread(
+            target=self.refresh_loop, args=(self.closed,), name=f"{self.fabric['fabric_name']}-refresh", daemon=True
+        )
+        self.refresher.start()
+        self.resync()
+        print(f"[*] Subscribed to {len(self.subscriptions)} classes on fabric {self.fabric['fabric_name']}")
+
+    def disconnect(self):
+        if self.refresher is not None:
+            self.closed.set()
+            self.refresher.join()
+            self.refresher = None
+        if self.ws is not None:
+            self.ws.close()
+            self.ws = None
+
+    def refresh_loop(self, closed):
+        """Refresh every subscription each refresh_interval seconds until `closed` is set."""
+        while not closed.wait(refresh_interval):
+            try:
+                for subscription_id in self.subscriptions:
+                    self.session.refresh_subscription(subscription_id)
+            except Exception as e:
+                # The subscriptions may be gone; closing the socket makes run() reconnect
+                print(f"[!] Subscription refresh on fabric {self.fabric['fabric_name']} failed: {e}")
+                self.ws.close()
+                return
+
+    def resync(self):
+        """
+        Full collection of the fabric, parents before children. Once every
+        class is written, stored objects the APIC did not return were
+        deleted while the socket was down and are deleted here too.
+        """
+        seen = {class_name: set() for class_name in ACI_KEYS}
+        for name, (fetch, insert) in cisco_aci.aci_tasks().items():
+            cisco_aci.sync_aci_class(self.writer, self.fabric, name, self.recorded(name, fetch, seen), insert, {})
+        # Children first: aci_bd rows keep their aci_vrf from being deleted
+        for class_name in reversed(list(ACI_KEYS)):
+            self.prune(class_name, seen[class_name])
+
+    def recorded(self, name, fetch, seen):
+        """`fetch` that also adds the key of every object it yields to `seen`."""
+        def fetch_and_record(fabric, sync):
+            for item in fetch(fabric, sync):
+                # The tenant subtree task yields (class name, info) pairs
+                class_name, info = (name, item) if name in ACI_KEYS else item
+                seen[class_name].add(cisco_aci.INFO_KEYS[class_name](info))
+                yield item
+        return fetch_and_record
+
+    def prune(self, class_name, seen):
+        """Delete this fabric's stored `class_name` objects whose keys are not in `seen`."""
+        table, keys, _ = ACI_KEYS[class_name]
+        if not seen:
+            # Far likelier a failed query than a fabric without any; never wipe the table
+            return
+        stored = self.writer.iter_query(
+            f"SELECT {', '.join(keys)} FROM {table} WHERE fabric_uuid = %s", (self.fabric_uuid,)
+        )
+        stale = [
+            (self.fabric_uuid,) + key
+            for key in (tuple(row[column] for column in keys) for row in stored)
+            if key not in seen
+        ]
+        if stale:
+            self.writer.delete(table, ('fabric_uuid',) + keys, stale)
+            print(f"[=] Deleted {len(stale)} {class_name} gone from fabric {self.fabric['fabric_name']}")
+
+    def stream(self):
+        # websocket-client is imported by ApicSession.open_websocket()
+        import websocket
+        while not self.stop_event.is_set():
+            try:
+                message = self.ws.recv()
+            except websocket.WebSocketTimeoutException:
+                continue
+            if message:
+                self.handle(json.loads(message))
+
+    def handle(self, event):
+        for mo in event.get('imdata', []):
+            for class_name, body in mo.items():
+                if class_name in ACI_PARENTS:
+                    # e.g. an EPG bound to another BD: re-read the EPG with its children
+                    parent_dn = body['attributes']['dn'].rpartition('/')[0]
+                    self.apply(ACI_PARENTS[class_name], {'dn': parent_dn, 'status': 'modified'})
+                elif class_name in ACI_KEYS:
+                    self.apply(class_name, body['attributes'])
+
+    def apply(self, class_name, attr):
+        table, keys, key_values = ACI_KEYS[class_name]
+        status = attr.get('status')
+        metrics.inc("aci_events_total", class_name=class_name, status=status or "unknown")
+        try:
+            if status == 'deleted':
+                key = (self.fabric_uuid,) + key_values(dn_parts(attr['dn']))
+                self.writer.delete(table, ('fabric_uuid',) + keys, [key])
+                return
+            body = {'attributes': attr}
+            if status != 'created' or class_name in cisco_aci.ACI_CHILDREN:
+                # modified events only carry the attributes that changed, created ones no children
+                body = self.fetch_mo(class_name, attr['dn'])
+                if body is None:
+                    return
+            insert = cisco_aci.ACI_CLASSES[class_name][1]
+            insert(self.writer, [cisco_aci.mo_info(class_name, body)], self.fabric_uuid)
+        except (*DatabaseError, requests.RequestException, KeyError) as e:
+            print(f"[!] Failed to apply {status} {class_name} {attr.get('dn')}: {e}")
+
+    def fetch_mo(self, class_name, dn):
+        params = cisco_aci.child_params([class_name]) or None
+        imdata = self.session.get(f"/api/node/mo/{dn}.json", params=params)['imdata']
+        return imdata[0][class_name] if imdata else None
+
+
+def main():
+    stop_event = threading.Event()
+    with BulkWriter(cisco_aci.db_config) as writer:
+        fabrics = cisco_aci.get_aci_fabrics(writer)
+
+    threads = []
+    for fabric in fabrics:
+        subscriber = FabricSubscriber(fabric, stop_event)
+        thread = threading.Thread(target=subscriber.run, name=fabric['fabric_name'], daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    try:
+        with metrics.collector_run("aci_subscriber"):
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(1)
+    except KeyboardInterrupt:
+        print("Stopping ACI subscriptions...")
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        cisco_aci.close_apic_sessions()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Module for talking to the Cisco APIC REST API.
+
+Documentation:
+- APIC REST API Configuration Guide:
+  https://www.cisco.com/c/en/us/td/docs/dcn/aci/apic/all/apic-rest-api-configuration-guide.html
+"""
+
+import codecs
+import json
+import ssl
+import threading
+import time
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+from nati_data import metrics
+
+# Disable "InsecureRequestWarning" when skipping TLS verification
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+# Refresh the token once fewer than this many seconds of its lifetime remain
+REFRESH_MARGIN = 60
+
+# Objects per page for paged class queries
+DEFAULT_PAGE_SIZE = 5000
+
+# Bytes read from the socket per step while streaming a response
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def iter_imdata(chunks):
+    """
+    Decode the `imdata` array of an APIC response one object at a time
+    from an iterable of byte chunks, so a page is never held in memory
+    as a whole.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    in_array = False
+    for chunk in chunks:
+        buffer += utf8.decode(chunk)
+        if not in_array:
+            key = buffer.find('"imdata"')
+            start = buffer.find('[', key) if key >= 0 else -1
+            if start < 0:
+                continue
+            buffer = buffer[start + 1:]
+            in_array = True
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos == len(buffer):
+                break
+            if buffer[pos] == ']':
+                return
+            try:
+                mo, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Object continues in the next chunk
+                break
+            yield mo
+        buffer = buffer[pos:]
+    raise ValueError("Truncated APIC response: imdata array not terminated")
+
+
+class ApicSession:
+    """
+    One logged-in APIC session: the token is cached with its expiry and
+    refreshed through aaaRefresh before it lapses, and requests share a
+    keep-alive connection pool of `pool_size` connections.
+    """
+
+    def __init__(self, host, username, password, verify=False, pool_size=4):
+        self.host = host
+        self.username = username
+        self.password = password
+        self.verify = verify
+        self.token = None
+        self.expires_at = 0.0
+        self.lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+
+    def _store_token(self, response):
+        attr = response.json()['imdata'][0]['aaaLogin']['attributes']
+        self.token = attr['token']
+        self.expires_at = time.monotonic() + int(attr.get('refreshTimeoutSeconds', 600))
+        self.session.headers.update({"Cookie": f"APIC-cookie={self.token}"})
+
+    def login(self):
+        login_url = f"https://{self.host}/api/aaaLogin.json"
+        auth_data = {"aaaUser": {"attributes": {"name": self.username, "pwd": self.password}}}
+        with metrics.span("apic_login", host=self.host):
+            response = self.session.post(login_url, json=auth_data, verify=self.verify)
+            response.raise_for_status()
+        self._store_token(response)
+
+    def refresh(self):
+        refresh_url = f"https://{self.host}/api/aaaRefresh.json"
+        with metrics.span("apic_token_refresh", host=self.host):
+            response = self.session.get(refresh_url, verify=self.verify)
+        if response.status_code in (401, 403):
+            self.login()
+            return
+        response.raise_for_status()
+        self._store_token(response)
+
+    def ensure_token(self):
+        """Return a valid token, logging in or refreshing only when needed."""
+        with self.lock:
+            remaining = self.expires_at - time.monotonic()
+            if self.token is None or remaining <= 0:
+                self.login()
+            elif remaining < REFRESH_MARGIN:
+                self.refresh()
+            return self.token
+
+    def invalidate(self, token):
+        with self.lock:
+            if self.token == token:
+                self.token = None
+
+    def request(self, method, path, **kwargs):
+        token = self.ensure_token()
+        url = f"https://{self.host}{path}"
+        response = self.session.request(method, url, verify=self.verify, **kwargs)
+        if response.status_code in (401, 403):
+            # Token was revoked or timed out server side; log in again once.
+            # A streamed response holds its connection until closed.
+            response.close()
+            self.invalidate(token)
+            self.ensure_token()
+            response = self.session.request(method, url, verify=self.verify, **kwargs)
+        try:
+            response.raise_for_status()
+        except requests.HTTPError:
+            response.close()
+            raise
+        return response
+
+    def get(self, path, params=None):
+        return self.request("GET", path, params=params).json()
+
+    def iter_pages(self, path, params=None, page_size=DEFAULT_PAGE_SIZE):
+        """Yield every MO returned by `path`, requesting one page at a time."""
+        page = 0
+        while True:
+            page_params = dict(params or {}, page=page)
+            page_params['page-size'] = page_size
+            # Until the headers arrive; the body is decoded as the caller consumes it
+            with metrics.span("apic_request", path=path):
+                response = self.request("GET", path, params=page_params, stream=True)
+            count = 0
+            try:
+                for mo in iter_imdata(response.iter_content(STREAM_CHUNK_SIZE)):
+                    count += 1
+                    yield mo
+            finally:
+                response.close()
+                metrics.inc("apic_objects_total", count, path=path)
+            if count < page_size:
+                return
+            page += 1
+
+    def iter_class(self, class_name, params=None, page_size=DEFAULT_PAGE_SIZE):
+        """Yield every MO of `class_name`, ordered by DN so pages stay stable."""
+        params = dict(params or {})
+        params.setdefault('order-by', f"{class_name}.dn")
+        return self.iter_pages(f"/api/node/class/{class_name}.json", params, page_size)
+
+    def iter_subtree(self, dn, classes, params=None, page_size=DEFAULT_PAGE_SIZE):
+        """Yield every MO of `classes` below `dn` from one paged subtree query, ordered by DN."""
+        params = dict(params or {})
+        params['query-target'] = 'subtree'
+        params['target-subtree-class'] = ','.join(classes)
+        # Without a sort order the APIC may return MOs on two pages or on none
+        params.setdefault('order-by', ','.join(f"{class_name}.dn" for class_name in classes))
+        return self.iter_pages(f"/api/node/mo/{dn}.json", params, page_size)
+
+    def open_websocket(self, timeout=None):
+        """Open the event websocket that subscriptions on this session report to."""
+        # websocket-client is only needed for event subscriptions
+        import websocket
+        token = self.ensure_token()
+        sslopt = {} if self.verify else {"cert_reqs": ssl.CERT_NONE}
+        return websocket.create_connection(
+            f"wss://{self.host}/socket{token}", timeout=timeout, sslopt=sslopt
+        )
+
+    def subscribe(self, class_name):
+        """Subscribe to events for `class_name`; returns the subscription id."""
+        # A single-object page keeps the initial query response small, the
+        # subscription itself still covers the whole class
+        data = self.get(
+            f"/api/node/class/{class_name}.json",
+            params={'subscription': 'yes', 'page-size': 1},
+        )
+        return data['subscriptionId']
+
+    def refresh_subscription(self, subscription_id):
+        self.get("/api/subscriptionRefresh.json", params={'id': subscription_id})
+
+    def logout(self):
+        with self.lock:
+            if self.token:
+                logout_url = f"https://{self.host}/api/aaaLogout.json"
+                auth_data = {"aaaUser": {"attributes": {"name": self.username}}}
+                self.session.post(logout_url, json=auth_data, verify=self.verify)
+                self.token = None
+
+    def close(self):
+        try:
+            self.logout()
+        except requests.RequestException as e:
+            print(f"[!] Logout from {self.host} failed: {e}")
+        finally:
+            self.session.close()
@@ -0,0 +1,46 @@
+"""
+On-disk state the collectors keep between runs: the DNS, credential and
+Lighthouse response caches and the encrypted token store.
+
+Several threads of a process, and the worker processes of
+`sharding --processes`, save the same files. Every save writes a temp
+file of its own next to the target and renames it over the target, so
+saves never write into each other's temp file and readers only ever see
+a complete file. Files are created readable by their owner only.
+"""
+
+import json
+import os
+import tempfile
+
+
+def load_json(path, description):
+    """Contents of the JSON file `path`, or None when it is missing or unreadable."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[!] Ignoring unreadable {description} {path}: {e}")
+        return None
+
+
+def write_atomic(path, data):
+    """Replace the file `path` with the bytes `data`."""
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def save_json(path, data):
+    write_atomic(path, json.dumps(data).encode())
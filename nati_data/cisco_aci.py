@@ -1,296 +1,524 @@
-import requests
-import pymysql
 import configparser
-from nati.config_manager import ConfigManager
-import urllib3
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
-# Load configuration
-config = ConfigManager()
-
-# Database Credentials
-aci_config = {
-    'host': config.get('ciscoaci.host'),
-    'user': config.get('ciscoaci.username'),
-    'password': config.get('ciscoaci.password'),
-}
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from nati_data import metrics
+from nati_data.aci_model import node_info, tenant_info, vrf_info, ap_info, bd_info, epg_info
+from nati_data.apic import ApicSession, DEFAULT_PAGE_SIZE
+from nati_data.storage import BulkWriter, DEFAULT_CHUNK_SIZE, close_pools, get_workers, load_db_config
+
+CONFIG_FILE = "nati.ini"
+
+
+def load_config(path=CONFIG_FILE):
+    """Every setting of the ACI collectors: [ciscoaci], and [database] for the writers."""
+    config = configparser.ConfigParser()
+    config.read(path)
+    return {
+        "aci": {
+            'host': config.get("ciscoaci", "host", fallback=None),
+            'user': config.get("ciscoaci", "username", fallback=None),
+            'password': config.get("ciscoaci", "password", fallback=None),
+        },
+        "db_config": load_db_config(path=path),
+        "batch_size": config.getint("database", "batch_size", fallback=DEFAULT_CHUNK_SIZE),
+        "workers": get_workers(config, "ciscoaci", "workers", fallback=1),
+        "per_apic_workers": get_workers(config, "ciscoaci", "per_apic_workers", fallback=4),
+        "page_size": config.getint("ciscoaci", "page_size", fallback=DEFAULT_PAGE_SIZE),
+        "query_mode": config.get("ciscoaci", "query_mode", fallback="class"),
+        "incremental": config.getboolean("ciscoaci", "incremental", fallback=False),
+        "subscription_refresh": config.getint("ciscoaci", "subscription_refresh", fallback=45),
+    }
+
+
+settings = load_config()
+
+# APIC login, for fabrics without a host of their own
+aci_config = settings["aci"]
+
+db_config = settings["db_config"]
+
+# Rows per multi-row upsert statement
+batch_size = settings["batch_size"]
+
+# Concurrent collection: total in-flight APIC requests, and per APIC
+aci_workers = settings["workers"]
+per_apic_workers = settings["per_apic_workers"]
+
+# Objects per APIC page for class queries
+page_size = settings["page_size"]
+
+# "class" queries each tenant class separately, "subtree" fetches them in one query
+query_mode = settings["query_mode"]
+
+# Only fetch objects modified since the last run and skip unchanged rows
+incremental = settings["incremental"]
+
+# One logged-in session per APIC host, shared by every collector in the run
+apic_sessions = {}
+apic_sessions_lock = threading.Lock()
+
+
+def apic_host(fabric):
+    return fabric.get('host') or aci_config['host']
+
+
+def get_apic_session(aci_host):
+    with apic_sessions_lock:
+        if aci_host not in apic_sessions:
+            apic_sessions[aci_host] = ApicSession(
+                aci_host, aci_config['user'], aci_config['password'], pool_size=per_apic_workers
+            )
+        return apic_sessions[aci_host]
+
+
+def close_apic_sessions():
+    with apic_sessions_lock:
+        for session in apic_sessions.values():
+            session.close()
+        apic_sessions.clear()
+
+
+def get_aci_token(aci_host=None):
+    aci_host = aci_host or aci_config['host']
+    with metrics.span("aci_token", host=aci_host):
+        return get_apic_session(aci_host).ensure_token()
+
+
+def get_aci_fabrics(writer):
+    return writer.query("SELECT * FROM aci_fabric")
 
-# Database Credentials
-db_config = {
-    'host': config.get('database.random'),
-    'port': int(config.get('database.port')),
-    'user': config.get('database.username'),
-    'password': config.get('database.password'),
-    'database': config.get('database.database'),
-    'cursorclass': pymysql.cursors.DictCursor
-}
 
-def get_aci_token():
-    aci_host = aci_config['host']
-    aci_user = aci_config['user']
-    aci_pass = aci_config['password']
-    login_url = f"https://{aci_host}/api/aaaLogin.json"
-    auth_data = {"aaaUser": {"attributes": {"name": aci_user, "pwd": aci_pass}}}
-    response = requests.post(login_url, json=auth_data, verify=False)
-    response.raise_for_status()
-    return response.json()['imdata'][0]['aaaLogin']['attributes']['token']
-
-
-def get_aci_fabrics():
-    conn = pymysql.connect(**db_config)
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM aci_fabric")
-    fabrics = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return fabrics
-
-
-def insert_aci_node(node, fabric_uuid):
-    conn = pymysql.connect(**db_config)
-    cursor = conn.cursor()
-
-    insert_query = """
-    INSERT INTO aci_node (fabric_uuid, node_id, name, role, serial)
-    VALUES (%s, %s, %s, %s, %s)
-    ON DUPLICATE KEY UPDATE
-    name=VALUES(name), role=VALUES(role), serial=VALUES(serial)
+class ClassSync:
     """
+    modTs high-water mark for one query on one fabric: builds the filter
+    for objects modified since the stored mark and tracks the newest
+    modTs seen while the results stream past.
+    """
+
+    def __init__(self, since=None):
+        self.since = since
+        self.latest = since
+
+    def params(self, classes):
+        if not self.since:
+            return {}
+        # ge rather than gt: objects sharing the mark's modTs are re-read and
+        # then skipped as unchanged
+        filters = [f'ge({class_name}.modTs,"{self.since}")' for class_name in classes]
+        if len(filters) == 1:
+            return {'query-target-filter': filters[0]}
+        return {'query-target-filter': f"or({','.join(filters)})"}
+
+    def track(self, mos):
+        for mo in mos:
+            for body in mo.values():
+                mod_ts = body['attributes'].get('modTs')
+                if mod_ts and (self.latest is None or mod_ts > self.latest):
+                    self.latest = mod_ts
+            yield mo
+
+
+def load_high_water_marks(writer):
+    if not incremental:
+        return {}
+    rows = writer.query("SELECT fabric_uuid, class_name, high_water_mark FROM aci_sync_state")
+    return {(row['fabric_uuid'], row['class_name']): row['high_water_mark'] for row in rows}
+
+
+def save_high_water_mark(writer, fabric_uuid, class_name, sync):
+    if incremental and sync.latest and sync.latest != sync.since:
+        writer.upsert(
+            'aci_sync_state', ('fabric_uuid', 'class_name', 'high_water_mark'),
+            [(fabric_uuid, class_name, sync.latest)], keys=('fabric_uuid', 'class_name')
+        )
+
+
+def unchanged_filter(fabric_uuid):
+    """Stored rows that incremental runs compare against before writing."""
+    return {'fabric_uuid': fabric_uuid} if incremental else None
+
+
+def sync_aci_class(writer, fabric, name, fetch, insert, marks):
+    """Fetch and write one class, or the tenant subtree, of one fabric."""
+    fabric_uuid = fabric['fabric_uuid']
+    sync = ClassSync(marks.get((fabric_uuid, name)))
+    infos = metrics.timed(fetch(fabric, sync), "aci_class_query", class_name=name, fabric=fabric['fabric_name'])
+    insert(writer, infos, fabric_uuid)
+    save_high_water_mark(writer, fabric_uuid, name, sync)
+
 
-    cursor.execute(insert_query, (fabric_uuid, node['id'], node['name'], node['role'], node['serial']))
-
-    conn.commit()
-    cursor.close()
-    conn.close()
-
-
-def collect_aci_nodes():
-    aci_host = aci_config['host']
-    aci_user = aci_config['user']
-    aci_pass = aci_config['password']
-    fabrics = get_aci_fabrics()
-    for fabric in fabrics:
-        token = get_aci_token()
-        headers = {"Cookie": f"APIC-cookie={token}"}
-        nodes_url = f"https://{aci_host}/api/node/class/fabricNode.json"
-
-        response = requests.get(nodes_url, headers=headers, verify=False)
-        response.raise_for_status()
-        nodes = response.json()['imdata']
-
-        for node in nodes:
-            attr = node['fabricNode']['attributes']
-            node_info = {
-                'id': attr['dn'],
-                'name': attr['name'],
-                'role': attr['role'],
-                'serial': attr.get('serial', '')
-            }
-            insert_aci_node(node_info, fabric['fabric_uuid'])
+# Child MOs fetched along with a class for columns its own attributes lack.
+# A changed child does not bump the parent's modTs; the subscriber catches those.
+ACI_CHILDREN = {'fvBD': 'fvRsCtx', 'fvAEPg': 'fvRsBd'}
+
+
+def child_params(classes):
+    children = [ACI_CHILDREN[class_name] for class_name in classes if class_name in ACI_CHILDREN]
+    if not children:
+        return {}
+    return {'rsp-subtree': 'children', 'rsp-subtree-class': ','.join(children)}
+
+
+def get_aci_class(fabric, class_name, sync=None):
+    session = get_apic_session(apic_host(fabric))
+    params = child_params([class_name])
+    if sync is None:
+        return session.iter_class(class_name, params, page_size)
+    return sync.track(session.iter_class(class_name, dict(params, **sync.params([class_name])), page_size))
+
+
+def insert_aci_nodes(writer, nodes, fabric_uuid):
+    rows = ((fabric_uuid, node.id, node.name, node.role, node.serial) for node in nodes)
+    return writer.upsert(
+        'aci_node', ('fabric_uuid', 'node_id', 'name', 'role', 'serial'), rows,
+        keys=('fabric_uuid', 'node_id'),
+        skip_unchanged=unchanged_filter(fabric_uuid)
+    )
+
+
+def fetch_aci_nodes(fabric, sync=None):
+    for node in get_aci_class(fabric, 'fabricNode', sync):
+        yield node_info(node['fabricNode']['attributes'])
+
+
+def collect_aci_nodes(writer):
+    marks = load_high_water_marks(writer)
+    for fabric in get_aci_fabrics(writer):
+        sync_aci_class(writer, fabric, 'fabricNode', fetch_aci_nodes, insert_aci_nodes, marks)
 
     print("ACI Nodes updated successfully.")
 
 
-def collect_aci_tenants():
-    aci_host = aci_config['host']
-    aci_user = aci_config['user']
-    aci_pass = aci_config['password']
-    fabrics = get_aci_fabrics()
-    for fabric in fabrics:
-        token = get_aci_token()
-        headers = {"Cookie": f"APIC-cookie={token}"}
-        tenants_url = f"https://{aci_host}/api/node/class/fvTenant.json"
-
-        response = requests.get(tenants_url, headers=headers, verify=False)
-        response.raise_for_status()
-        tenants = response.json()['imdata']
-
-        for tenant in tenants:
-            attr = tenant['fvTenant']['attributes']
-            tenant_info = {
-                'id': attr['dn'].split('/')[1],
-                'dn': attr['dn'],
-                'name': attr['name'],
-                'descr': attr.get('descr', '')
-            }
-            insert_aci_tenant(tenant_info, fabric['fabric_uuid'])
+def fetch_aci_tenants(fabric, sync=None):
+    for tenant in get_aci_class(fabric, 'fvTenant', sync):
+        yield tenant_info(tenant['fvTenant']['attributes'])
+
+
+def collect_aci_tenants(writer):
+    marks = load_high_water_marks(writer)
+    for fabric in get_aci_fabrics(writer):
+        sync_aci_class(writer, fabric, 'fvTenant', fetch_aci_tenants, insert_aci_tenants, marks)
 
     print("ACI Tenants updated successfully.")
 
 
-def insert_aci_tenant(tenant, fabric_uuid):
-    conn = pymysql.connect(**db_config)
-    cursor = conn.cursor()
-    insert_query = """
-    INSERT INTO aci_tenant (fabric_uuid, tenant_id, tenant_dn, tenant_name, description)
-    VALUES (%s, %s, %s, %s, %s)
-    ON DUPLICATE KEY UPDATE
-    tenant_name=VALUES(tenant_name), description=VALUES(description)
-    """
-    cursor.execute(insert_query, (fabric_uuid, tenant['id'], tenant['dn'], tenant['name'], tenant['descr']))
-    conn.commit()
-    cursor.close()
-    conn.close()
-
-
-def insert_aci_vrf(vrf, fabric_uuid):
-    conn = pymysql.connect(**db_config)
-    cursor = conn.cursor()
-    insert_query = """
-    INSERT INTO aci_vrf (fabric_uuid, vrf_id, vrf_name, tenant_id, description)
-    VALUES (%s, %s, %s, %s, %s)
-    ON DUPLICATE KEY UPDATE
-    vrf_name=VALUES(vrf_name), description=VALUES(description)
-    """
-    cursor.execute(insert_query, (fabric_uuid, vrf['id'], vrf['name'], vrf['tenant'], vrf['descr']))
-    conn.commit()
-    cursor.close()
-    conn.close()
-
-
-def collect_aci_vrfs():
-    aci_host = aci_config['host']
-    token = get_aci_token()
-    headers = {"Cookie": f"APIC-cookie={token}"}
-    fabrics = get_aci_fabrics()
-    for fabric in fabrics:
-        vrf_url = f"https://{aci_host}/api/node/class/fvCtx.json"
-        response = requests.get(vrf_url, headers=headers, verify=False)
-        response.raise_for_status()
-        vrfs = response.json()['imdata']
-        for vrf in vrfs:
-            attr = vrf['fvCtx']['attributes']
-            vrf_info = {
-                'id': attr['dn'].split('/')[2],  # extract VRF ID from DN
-                'name': attr['name'],
-                'tenant': attr['dn'].split('/')[1],  # extract tenant name from DN
-                'descr': attr.get('descr', '')
-            }
-            insert_aci_vrf(vrf_info, fabric['fabric_uuid'])
+def insert_aci_tenants(writer, tenants, fabric_uuid):
+    rows = ((fabric_uuid, tenant.id, tenant.dn, tenant.name, tenant.descr) for tenant in tenants)
+    return writer.upsert(
+        'aci_tenant', ('fabric_uuid', 'tenant_id', 'tenant_dn', 'tenant_name', 'description'), rows,
+        keys=('fabric_uuid', 'tenant_id'), update=('tenant_name', 'description'),
+        skip_unchanged=unchanged_filter(fabric_uuid)
+    )
+
+
+def insert_aci_vrfs(writer, vrfs, fabric_uuid):
+    rows = ((fabric_uuid, vrf.id, vrf.name, vrf.tenant, vrf.descr) for vrf in vrfs)
+    return writer.upsert(
+        'aci_vrf', ('fabric_uuid', 'vrf_id', 'vrf_name', 'tenant_id', 'description'), rows,
+        keys=('fabric_uuid', 'tenant_id', 'vrf_id'),
+        skip_unchanged=unchanged_filter(fabric_uuid)
+    )
+
+
+def fetch_aci_vrfs(fabric, sync=None):
+    for vrf in get_aci_class(fabric, 'fvCtx', sync):
+        yield vrf_info(vrf['fvCtx']['attributes'])
+
+
+def collect_aci_vrfs(writer):
+    marks = load_high_water_marks(writer)
+    for fabric in get_aci_fabrics(writer):
+        sync_aci_class(writer, fabric, 'fvCtx', fetch_aci_vrfs, insert_aci_vrfs, marks)
 
     print("ACI VRFs updated successfully.")
 
 
-def insert_aci_ap(ap, fabric_uuid):
-    conn = pymysql.connect(**db_config)
-    cursor = conn.cursor()
-    insert_query = """
-    INSERT INTO aci_ap (fabric_uuid, ap_id, ap_name, tenant_id, description)
-    VALUES (%s, %s, %s, %s, %s)
-    ON DUPLICATE KEY UPDATE
-    ap_name=VALUES(ap_name), description=VALUES(description)
-    """
-    cursor.execute(insert_query, (fabric_uuid, ap['id'], ap['name'], ap['tenant'], ap['descr']))
-    conn.commit()
-    cursor.close()
-    conn.close()
-
-
-def collect_aci_aps():
-    token = get_aci_token()
-    headers = {"Cookie": f"APIC-cookie={token}"}
-    fabrics = get_aci_fabrics()
-    for fabric in fabrics:
-        ap_url = f"https://{aci_config['host']}/api/node/class/fvAp.json"
-        response = requests.get(ap_url, headers=headers, verify=False)
-        response.raise_for_status()
-        aps = response.json()['imdata']
-        for ap in aps:
-            attr = ap['fvAp']['attributes']
-            ap_info = {
-                'id': attr['dn'].split('/')[2],
-                'name': attr['name'],
-                'tenant': attr['dn'].split('/')[1],
-                'descr': attr.get('descr', '')
-            }
-            insert_aci_ap(ap_info, fabric['fabric_uuid'])
+def insert_aci_aps(writer, aps, fabric_uuid):
+    rows = ((fabric_uuid, ap.id, ap.name, ap.tenant, ap.descr) for ap in aps)
+    return writer.upsert(
+        'aci_ap', ('fabric_uuid', 'ap_id', 'ap_name', 'tenant_id', 'description'), rows,
+        keys=('fabric_uuid', 'tenant_id', 'ap_id'),
+        skip_unchanged=unchanged_filter(fabric_uuid)
+    )
+
+
+def fetch_aci_aps(fabric, sync=None):
+    for ap in get_aci_class(fabric, 'fvAp', sync):
+        yield ap_info(ap['fvAp']['attributes'])
+
+
+def collect_aci_aps(writer):
+    marks = load_high_water_marks(writer)
+    for fabric in get_aci_fabrics(writer):
+        sync_aci_class(writer, fabric, 'fvAp', fetch_aci_aps, insert_aci_aps, marks)
 
     print("ACI APs updated successfully.")
 
 
-def insert_aci_bd(bd, fabric_uuid):
-    conn = pymysql.connect(**db_config)
-    cursor = conn.cursor()
-    insert_query = """
-    INSERT INTO aci_bd (fabric_uuid, bd_id, bd_name, tenant_id, description)
-    VALUES (%s, %s, %s, %s, %s)
-    ON DUPLICATE KEY UPDATE
-    bd_name=VALUES(bd_name), description=VALUES(description)
-    """
-    cursor.execute(insert_query, (fabric_uuid, bd['id'], bd['name'], bd['tenant'], bd['descr']))
-    conn.commit()
-    cursor.close()
-    conn.close()
-
-
-def collect_aci_bds():
-    token = get_aci_token()
-    headers = {"Cookie": f"APIC-cookie={token}"}
-    fabrics = get_aci_fabrics()
-    for fabric in fabrics:
-        bd_url = f"https://{aci_config['host']}/api/node/class/fvBD.json"
-        response = requests.get(bd_url, headers=headers, verify=False)
-        response.raise_for_status()
-        bds = response.json()['imdata']
-        for bd in bds:
-            attr = bd['fvBD']['attributes']
-            bd_info = {
-                'id': attr['dn'].split('/')[2],
-                'name': attr['name'],
-                'tenant': attr['dn'].split('/')[1],
-                'descr': attr.get('descr', '')
-            }
-            insert_aci_bd(bd_info, fabric['fabric_uuid'])
+def insert_aci_bds(writer, bds, fabric_uuid):
+    rows = ((fabric_uuid, bd.id, bd.name, bd.tenant, bd.descr, bd.vrf) for bd in bds)
+    return writer.upsert(
+        'aci_bd', ('fabric_uuid', 'bd_id', 'bd_name', 'tenant_id', 'description', 'vrf_id'), rows,
+        keys=('fabric_uuid', 'tenant_id', 'bd_id'),
+        skip_unchanged=unchanged_filter(fabric_uuid)
+    )
+
+
+def fetch_aci_bds(fabric, sync=None):
+    for bd in get_aci_class(fabric, 'fvBD', sync):
+        yield mo_info('fvBD', bd['fvBD'])
+
+
+def collect_aci_bds(writer):
+    marks = load_high_water_marks(writer)
+    for fabric in get_aci_fabrics(writer):
+        sync_aci_class(writer, fabric, 'fvBD', fetch_aci_bds, insert_aci_bds, marks)
 
     print("ACI BDs updated successfully.")
 
 
-def insert_aci_epg(epg, fabric_uuid):
-    conn = pymysql.connect(**db_config)
-    cursor = conn.cursor()
-    insert_query = """
-    INSERT INTO aci_epg (fabric_uuid, epg_id, epg_name, tenant_id, ap_id, description)
-    VALUES (%s, %s, %s, %s, %s, %s)
-    ON DUPLICATE KEY UPDATE
-    epg_name=VALUES(epg_name), description=VALUES(description)
-    """
-    cursor.execute(insert_query, (fabric_uuid, epg['id'], epg['name'], epg['tenant'], epg['ap'], epg['descr']))
-    conn.commit()
-    cursor.close()
-    conn.close()
-
-
-def collect_aci_epgs():
-    token = get_aci_token()
-    headers = {"Cookie": f"APIC-cookie={token}"}
-    fabrics = get_aci_fabrics()
-    for fabric in fabrics:
-        epg_url = f"https://{aci_config['host']}/api/node/class/fvAEPg.json"
-        response = requests.get(epg_url, headers=headers, verify=False)
-        response.raise_for_status()
-        epgs = response.json()['imdata']
-        for epg in epgs:
-            attr = epg['fvAEPg']['attributes']
-            parts = attr['dn'].split('/')
-            epg_info = {
-                'id': attr['dn'].split('/')[3],
-                'name': attr['name'],
-                'tenant': parts[1],
-                'ap': parts[2],
-                'descr': attr.get('descr', '')
-            }
-            insert_aci_epg(epg_info, fabric['fabric_uuid'])
+def insert_aci_epgs(writer, epgs, fabric_uuid):
+    rows = ((fabric_uuid, epg.id, epg.name, epg.tenant, epg.ap, epg.descr, epg.bd) for epg in epgs)
+    return writer.upsert(
+        'aci_epg', ('fabric_uuid', 'epg_id', 'epg_name', 'tenant_id', 'ap_id', 'description', 'bd_id'), rows,
+        keys=('fabric_uuid', 'tenant_id', 'ap_id', 'epg_id'),
+        skip_unchanged=unchanged_filter(fabric_uuid)
+    )
+
+
+def fetch_aci_epgs(fabric, sync=None):
+    for epg in get_aci_class(fabric, 'fvAEPg', sync):
+        yield mo_info('fvAEPg', epg['fvAEPg'])
+
+
+def collect_aci_epgs(writer):
+    marks = load_high_water_marks(writer)
+    for fabric in get_aci_fabrics(writer):
+        sync_aci_class(writer, fabric, 'fvAEPg', fetch_aci_epgs, insert_aci_epgs, marks)
 
     print("ACI EPGs updated successfully.")
 
-    
+
+# Fetch and insert functions per APIC class, in the order main() writes them
+ACI_CLASSES = {
+    'fvTenant': (fetch_aci_tenants, insert_aci_tenants),
+    'fabricNode': (fetch_aci_nodes, insert_aci_nodes),
+    'fvCtx': (fetch_aci_vrfs, insert_aci_vrfs),
+    'fvAp': (fetch_aci_aps, insert_aci_aps),
+    'fvBD': (fetch_aci_bds, insert_aci_bds),
+    'fvAEPg': (fetch_aci_epgs, insert_aci_epgs),
+}
+
+# Rows of a class reference its parent's table, so the parent is written first
+ACI_CLASS_PARENTS = {
+    'fvCtx': 'fvTenant',
+    'fvAp': 'fvTenant',
+    # aci_bd.vrf_id references aci_vrf
+    'fvBD': 'fvCtx',
+    'fvAEPg': 'fvAp',
+}
+
+# Key values after fabric_uuid of a collected object (nati_data.aci_model tuples)
+INFO_KEYS = {
+    'fvTenant': lambda info: (info.id,),
+    'fvCtx': lambda info: (info.tenant, info.id),
+    'fvAp': lambda info: (info.tenant, info.id),
+    'fvBD': lambda info: (info.tenant, info.id),
+    'fvAEPg': lambda info: (info.tenant, info.ap, info.id),
+    'fabricNode': lambda info: (info.id,),
+}
+
+
+def referenced_rows(class_name, info):
+    """(class, key) of the rows a hierarchy row's foreign keys point at."""
+    if class_name in ('fvCtx', 'fvAp'):
+        return [('fvTenant', (info.tenant,))]
+    if class_name == 'fvBD':
+        tenant = [('fvTenant', (info.tenant,))]
+        return tenant + [('fvCtx', (info.tenant, info.vrf))] if info.vrf else tenant
+    if class_name == 'fvAEPg':
+        return [('fvAp', (info.tenant, info.ap))]
+    return []
+
+
+# Classes whose rows other rows reference
+PARENT_CLASSES = set(ACI_CLASS_PARENTS.values())
+
+
+# Tenant hierarchy classes, parents before children
+ACI_HIERARCHY = {
+    'fvTenant': tenant_info,
+    'fvCtx': vrf_info,
+    'fvAp': ap_info,
+    'fvBD': bd_info,
+    'fvAEPg': epg_info,
+}
+
+
+# Row info per class of every collected MO
+ACI_INFO = dict(ACI_HIERARCHY, fabricNode=node_info)
+
+
+def mo_info(class_name, body):
+    """Row info of one MO body, with the children ACI_CHILDREN fetched for its class."""
+    if class_name in ACI_CHILDREN:
+        return ACI_INFO[class_name](body['attributes'], body.get('children', ()))
+    return ACI_INFO[class_name](body['attributes'])
+
+
+def fetch_aci_hierarchy(fabric, sync=None):
+    """Yield (class name, info) for the whole tenant hierarchy from one subtree query."""
+    session = get_apic_session(apic_host(fabric))
+    sync = sync or ClassSync()
+    params = dict(child_params(ACI_HIERARCHY), **sync.params(ACI_HIERARCHY))
+    mos = session.iter_subtree('uni', ACI_HIERARCHY, params, page_size)
+    for mo in sync.track(mos):
+        for class_name, body in mo.items():
+            yield class_name, mo_info(class_name, body)
+
+
+def insert_aci_hierarchy(writer, items, fabric_uuid):
+    """
+    Write the tenant subtree as it streams in, up to batch_size rows of a
+    class per upsert. A row waits only for the rows it references
+    (referenced_rows): a buffered parent is written early, and a row whose
+    parent has not arrived yet is held until it does. Whatever still waits
+    at the end references rows already stored, as on incremental runs.
+    """
+    ready = {class_name: [] for class_name in ACI_HIERARCHY}
+    buffered = set()
+    written = set()
+    waiting = {}
+
+    def flush(class_name):
+        infos, ready[class_name] = ready[class_name], []
+        if not infos:
+            return
+        ACI_CLASSES[class_name][1](writer, infos, fabric_uuid)
+        for info in infos:
+            row = (class_name, INFO_KEYS[class_name](info))
+            buffered.discard(row)
+            written.add(row)
+            for child in waiting.pop(row, ()):
+                add(*child)
+
+    def add(class_name, info):
+        for parent in referenced_rows(class_name, info):
+            if parent in buffered:
+                flush(parent[0])
+            elif parent not in written:
+                waiting.setdefault(parent, []).append((class_name, info))
+                return
+        ready[class_name].append(info)
+        if class_name in PARENT_CLASSES:
+            buffered.add((class_name, INFO_KEYS[class_name](info)))
+        if len(ready[class_name]) >= batch_size:
+            flush(class_name)
+
+    for class_name, info in items:
+        add(class_name, info)
+    for children in waiting.values():
+        for class_name, info in children:
+            ready[class_name].append(info)
+    waiting.clear()
+    for class_name in ACI_HIERARCHY:
+        flush(class_name)
+
+
+def collect_aci_hierarchy(writer):
+    marks = load_high_water_marks(writer)
+    for fabric in get_aci_fabrics(writer):
+        sync_aci_class(writer, fabric, 'uni', fetch_aci_hierarchy, insert_aci_hierarchy, marks)
+
+    print("ACI Tenants, VRFs, APs, BDs and EPGs updated successfully.")
+
+
+def aci_tasks():
+    """Fetch and insert functions for one fabric, keyed by task name."""
+    if query_mode == 'subtree':
+        return {
+            'fabricNode': ACI_CLASSES['fabricNode'],
+            'uni': (fetch_aci_hierarchy, insert_aci_hierarchy),
+        }
+    return ACI_CLASSES
+
+
+def collect_aci_concurrent(writer, max_workers=None, fabrics=None):
+    """
+    Collect every class of every fabric (or of `fabrics`) in parallel,
+    capped globally by `max_workers` and per APIC by `per_apic_workers`.
+    A class is submitted only once its parent class (ACI_CLASS_PARENTS)
+    is written on that fabric and its APIC has a free slot, so pool
+    threads never wait on a busy APIC. Each task streams its class from
+    the APIC into the database.
+    """
+    if fabrics is None:
+        fabrics = get_aci_fabrics(writer)
+    marks = load_high_water_marks(writer)
+    tasks = aci_tasks()
+    # Interleave fabrics so one slow APIC does not hold every worker
+    waiting = [(fabric, class_name) for class_name in tasks for fabric in fabrics]
+    in_flight = {}
+    done = set()
+    futures = {}
+
+    def ready(fabric, class_name):
+        parent = ACI_CLASS_PARENTS.get(class_name)
+        if parent in tasks and (fabric['fabric_uuid'], parent) not in done:
+            return False
+        return in_flight.get(apic_host(fabric), 0) < per_apic_workers
+
+    with ThreadPoolExecutor(max_workers=max_workers or aci_workers) as pool:
+        while waiting or futures:
+            blocked = []
+            for fabric, class_name in waiting:
+                if not ready(fabric, class_name):
+                    blocked.append((fabric, class_name))
+                    continue
+                host = apic_host(fabric)
+                in_flight[host] = in_flight.get(host, 0) + 1
+                fetch, insert = tasks[class_name]
+                future = pool.submit(sync_aci_class, writer, fabric, class_name, fetch, insert, marks)
+                futures[future] = (fabric, class_name)
+            waiting = blocked
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                fabric, class_name = futures.pop(future)
+                in_flight[apic_host(fabric)] -= 1
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"[!] Failed to collect {class_name} from fabric {fabric['fabric_name']}: {e}")
+                # Children of a failed class are still tried, as in the sequential run
+                done.add((fabric['fabric_uuid'], class_name))
+
+    print(f"ACI collection finished for {len(fabrics)} fabrics.")
+
+
+def collect_aci(writer):
+    """One collection run over every fabric, as configured in [ciscoaci]."""
+    if aci_workers > 1:
+        collect_aci_concurrent(writer)
+    elif query_mode == 'subtree':
+        collect_aci_hierarchy(writer)
+        collect_aci_nodes(writer)
+    else:
+        collect_aci_tenants(writer)
+        collect_aci_nodes(writer)
+        collect_aci_vrfs(writer)
+        collect_aci_aps(writer)
+        collect_aci_bds(writer)
+        collect_aci_epgs(writer)
+
+
 def main():
-    collect_aci_tenants()
-    collect_aci_nodes()
-    collect_aci_vrfs()
-    collect_aci_aps()
-    collect_aci_bds()
-    collect_aci_epgs()
+    try:
+        with metrics.collector_run("aci"), BulkWriter(db_config, chunk_size=batch_size) as writer:
+            collect_aci(writer)
+            writer.report()
+    finally:
+        close_apic_sessions()
+        close_pools()
 
 
 if __name__ == "__main__":
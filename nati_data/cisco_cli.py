@@ -1,10 +1,20 @@
 import os
 import uuid
 import socket
+import threading
 import ipaddress
-import pymysql
 import configparser
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from netmiko import ConnectHandler, NetmikoTimeoutException, NetmikoAuthenticationException
+from nati_data import metrics
+from nati_data.parsers import detect_platform, parse
+from nati_data.credentials import (
+    CredentialCache, credential_session, load_credentials, CREDENTIAL_CACHE_FILE, DEFAULT_FAILURE_TTL
+)
+from nati_data.ssh_pool import SessionPool, send_command
+from nati_data.resolver import DnsCache, resolve_all, DNS_CACHE_FILE, DEFAULT_TTL, DEFAULT_NEGATIVE_TTL
+from nati_data.storage import BulkWriter, DatabaseError, DEFAULT_CHUNK_SIZE, get_workers, load_db_config
 
 CONFIG_FILE = "nati.ini"
 SEEDLIST_FILE = "seedlist.txt"
@@ -13,28 +23,55 @@ def load_config():
     config = configparser.ConfigParser()
     config.read(CONFIG_FILE)
 
+    # Fallback login, tried after the nati_credential entries
     cli_creds = {
+        "cred_uuid": "ciscocli",
         "username": config["ciscocli"]["username"],
         "password": config["ciscocli"]["password"]
     }
 
-    db_config = {
-        "host": config["database"]["host"],
-        "port": int(config["database"]["port"]),
-        "user": config["database"]["username"],
-        "password": config["database"]["password"],
-        "database": config["database"]["database"],
-        "cursorclass": pymysql.cursors.DictCursor
+    db_config = load_db_config(path=CONFIG_FILE)
+
+    discovery = {
+        "workers": get_workers(config, "ciscocli", "workers", fallback=16),
+        "per_site_workers": get_workers(config, "ciscocli", "per_site_workers", fallback=4),
+        "batch_size": config.getint("database", "batch_size", fallback=DEFAULT_CHUNK_SIZE)
     }
 
-    return cli_creds, db_config
+    sessions = {
+        "timeout": config.getint("ciscocli", "timeout", fallback=30),
+        "max_per_device": config.getint("ciscocli", "max_sessions_per_device", fallback=2),
+        "idle_timeout": config.getint("ciscocli", "session_idle_timeout", fallback=300),
+        "max_idle": config.getint("ciscocli", "max_idle_sessions", fallback=64)
+    }
+
+    dns = {
+        "path": config.get("ciscocli", "dns_cache", fallback=DNS_CACHE_FILE),
+        "ttl": config.getint("ciscocli", "dns_ttl", fallback=DEFAULT_TTL),
+        "negative_ttl": config.getint("ciscocli", "dns_negative_ttl", fallback=DEFAULT_NEGATIVE_TTL),
+        "workers": config.getint("ciscocli", "dns_workers", fallback=32)
+    }
+
+    credential_cache = {
+        "path": config.get("ciscocli", "credential_cache", fallback=CREDENTIAL_CACHE_FILE),
+        "failure_ttl": config.getint("ciscocli", "credential_failure_ttl", fallback=DEFAULT_FAILURE_TTL)
+    }
+
+    return cli_creds, db_config, discovery, dns, sessions, credential_cache
 
 def load_seedlist():
+    """Return (seed, site) pairs; the optional second column names the seed's site."""
     if not os.path.exists(SEEDLIST_FILE):
         print(f"[!] Seedlist file not found: {SEEDLIST_FILE}")
         return []
+    seeds = []
     with open(SEEDLIST_FILE, "r") as f:
-        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            fields = line.split()
+            seeds.append((fields[0], fields[1] if len(fields) > 1 else None))
+    return seeds
 
 def resolve_host(seed):
     try:
@@ -51,88 +88,253 @@ def resolve_host(seed):
             print(f"[!] Failed to resolve hostname: {seed}")
             return None, seed
 
-def connect_to_device(ip, username, password):
-    device = {
+def device_params(ip, username, password, timeout=30):
+    return {
         "device_type": "cisco_ios",
         "host": ip,
         "username": username,
         "password": password,
-        "fast_cli": True
+        "fast_cli": True,
+        "conn_timeout": timeout,
+        "auth_timeout": timeout,
+        "banner_timeout": timeout,
+        "timeout": timeout
     }
+
+def connect_to_device(ip, username, password, timeout=30):
     try:
-        return ConnectHandler(**device)
+        with metrics.span("ssh_connect"):
+            return ConnectHandler(**device_params(ip, username, password, timeout))
     except (NetmikoTimeoutException, NetmikoAuthenticationException) as e:
         print(f"[!] Failed to connect to {ip}: {e}")
         return None
 
 def discover_device_info(conn):
-    hostname = conn.send_command("show run | include ^hostname").split("hostname")[-1].strip()
-    version_info = conn.send_command("show version")
-    model = ""
-    version = ""
+    version_info = send_command(conn, "show version")
+    platform = detect_platform(version_info)
+    record = parse(platform, "show version", version_info)
 
-    for line in version_info.splitlines():
-        if "Model number" in line or "Processor board ID" in line:
-            model = line.split(":")[-1].strip()
-        if "Cisco IOS Software" in line:
-            version = line.strip()
+    hostname = record.hostname
+    if not hostname:
+        # Only platforms whose show version lacks the hostname pay for this
+        hostname = send_command(conn, "show run | include ^hostname").split("hostname")[-1].strip()
 
     location = None  # Optionally set by user
 
     return {
         "hostname": hostname,
-        "model": model,
-        "version": version,
+        "platform": platform,
+        "model": record.model or "",
+        "serial": record.serial or "",
+        "version": record.version or "",
+        "uptime": record.uptime,
         "location": location
     }
 
-def write_to_db(db_config, device_info, ip, fqdn, device_type="cisco_ios"):
-    try:
-        conn = pymysql.connect(**db_config)
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT * FROM network_device WHERE ip_address = %s", (ip,))
-            if cursor.fetchone():
-                print(f"[=] Device {ip} already exists in database. Skipping.")
+class DeviceIndex:
+    """
+    Every network_device row, loaded once per run and keyed by IP, so each
+    discovered device is classified as new, changed or unchanged without
+    a query. New and changed rows are written in bulk; the index only
+    takes them in once their upsert has committed, and the IPs of a batch
+    that failed are kept in `failed` with the error.
+    """
+
+    COLUMNS = ("device_uuid", "hostname", "fqdn", "ip_address", "location", "device_type")
+    # location is maintained by users, discovery never overwrites it
+    UPDATE = ("hostname", "fqdn", "ip_address", "device_type")
+
+    def __init__(self, writer):
+        self.writer = writer
+        rows = writer.query(f"SELECT {', '.join(self.COLUMNS)} FROM network_device")
+        self.by_ip = {row["ip_address"]: row for row in rows}
+        self.pending = {}
+        self.failed = {}
+        # Reentrant: stage() flushes while holding it
+        self.lock = threading.RLock()
+
+    def stage(self, device_info, ip, fqdn, device_type):
+        """Returns "added", "updated" or "exists"."""
+        row = {
+            "hostname": device_info["hostname"],
+            "fqdn": fqdn,
+            "ip_address": ip,
+            "location": device_info["location"],
+            "device_type": device_type
+        }
+        with self.lock:
+            existing = self.pending.get(ip) or self.by_ip.get(ip)
+            if existing is None:
+                status = "added"
+                row["device_uuid"] = str(uuid.uuid4())
+            elif all(existing[column] == row[column] for column in self.UPDATE):
+                return "exists"
+            else:
+                status = "updated" if ip in self.by_ip else "added"
+                row["device_uuid"] = existing["device_uuid"]
+                row["location"] = existing["location"]
+            self.pending[ip] = row
+            self.failed.pop(ip, None)
+            if len(self.pending) >= self.writer.chunk_size:
+                self.flush()
+        return status
+
+    def flush(self):
+        """Write the staged rows; a failure is recorded in `failed` rather than raised."""
+        with self.lock:
+            if not self.pending:
                 return
+            batch = dict(self.pending)
+            try:
+                self.writer.upsert(
+                    "network_device", self.COLUMNS,
+                    [tuple(row[column] for column in self.COLUMNS) for row in batch.values()],
+                    keys=("device_uuid",), update=self.UPDATE
+                )
+            except (*DatabaseError, TimeoutError) as e:
+                print(f"[!] Failed to write {len(batch)} devices: {e}")
+                metrics.inc("devices_total", len(batch), status="write_failed")
+                for ip in batch:
+                    self.failed[ip] = str(e)
+            else:
+                self.by_ip.update(batch)
+            finally:
+                for ip in batch:
+                    del self.pending[ip]
 
-            device_uuid = str(uuid.uuid4())
-            cursor.execute("""
-                INSERT INTO network_device (
-                    device_uuid, hostname, fqdn, ip_address, location, device_type
-                ) VALUES (%s, %s, %s, %s, %s, %s)
-            """, (
-                device_uuid,
-                device_info["hostname"],
-                fqdn,
-                ip,
-                device_info["location"],
-                device_type
-            ))
-            conn.commit()
-            print(f"[+] Added {device_info['hostname']} ({ip}) to database.")
-    except pymysql.MySQLError as err:
-        print(f"[!] DB error: {err}")
-    finally:
-        conn.close()
+def write_to_db(index, device_info, ip, fqdn, device_type="cisco_ios"):
+    """Returns "added", "updated" or "exists"; rows are persisted by index.flush()."""
+    with metrics.span("device_write"):
+        status = index.stage(device_info, ip, fqdn, device_type)
+    metrics.inc("devices_total", status=status)
+    if status == "added":
+        print(f"[+] Adding {device_info['hostname']} ({ip}) to database.")
+    elif status == "updated":
+        print(f"[~] Updating {device_info['hostname']} ({ip}) in database.")
+    else:
+        print(f"[=] Device {ip} already exists in database. Skipping.")
+    return status
+
+def create_session_pool(timeout=30, max_per_device=2, idle_timeout=300, max_idle=64):
+    def connect(host, username, password):
+        # Let login errors through so the credential trial can tell them apart
+        with metrics.span("ssh_connect"):
+            return ConnectHandler(**device_params(host, username, password, timeout))
+    return SessionPool(connect, max_per_device, idle_timeout, max_idle)
+
+def discover_seed(seed, ip, fqdn, credentials, index, pool, cred_cache):
+    """Connect -> discover -> persist one resolved seed. Returns (status, detail)."""
+    print(f"[*] Connecting to {ip} (resolved from {seed})...")
+    try:
+        with credential_session(pool, ip, credentials, cred_cache) as (conn, credential):
+            device_info = discover_device_info(conn)
+    except ConnectionError as e:
+        print(f"[!] Failed to connect to {ip}: {e}")
+        return "failed", str(e)
+
+    return write_to_db(index, device_info, ip, fqdn, device_info["platform"]), ip
+
+class DiscoveryScheduler:
+    """
+    Runs discover_seed() for many seeds at once: `workers` devices in
+    flight overall and at most `per_site_workers` for any one site.
+    Seeds wait in a queue per site and are submitted only when their site
+    has a free slot, so pool threads never wait on a busy site.
+    """
+
+    def __init__(self, credentials, index, pool, cred_cache, workers=16, per_site_workers=4):
+        self.credentials = credentials
+        self.index = index
+        self.pool = pool
+        self.cred_cache = cred_cache
+        self.workers = workers
+        self.per_site_workers = per_site_workers
+
+    def discover(self, seed, ip, fqdn):
+        try:
+            return discover_seed(seed, ip, fqdn, self.credentials, self.index, self.pool, self.cred_cache)
+        except Exception as e:
+            return "failed", str(e)
+
+    def site_full(self, site, in_flight):
+        # Seeds without a site are not limited
+        return site is not None and in_flight.get(site, 0) >= self.per_site_workers
+
+    def run(self, seeds, resolved):
+        """Discover `seeds` ((seed, site) pairs) using the `resolved` seed -> (ip, fqdn) map."""
+        results = {}
+        queues = {}
+        for seed, site in seeds:
+            ip, fqdn = resolved[seed]
+            if not ip:
+                results[seed] = ("failed", "DNS resolution failed")
+                continue
+            queues.setdefault(site, deque()).append((seed, ip, fqdn))
+        in_flight = {}
+        futures = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while queues or futures:
+                # One seed per site and round, so one large site does not fill the pool first
+                while any(not self.site_full(site, in_flight) for site in queues):
+                    for site, queue in list(queues.items()):
+                        if self.site_full(site, in_flight):
+                            continue
+                        seed, ip, fqdn = queue.popleft()
+                        if not queue:
+                            del queues[site]
+                        in_flight[site] = in_flight.get(site, 0) + 1
+                        futures[pool.submit(self.discover, seed, ip, fqdn)] = (seed, site)
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    seed, site = futures.pop(future)
+                    in_flight[site] -= 1
+                    results[seed] = future.result()
+        return results
+
+def print_summary(results):
+    counts = Counter(status for status, detail in results.values())
+    print(f"[=] Discovery finished: {counts['added']} added, {counts['updated']} updated, "
+          f"{counts['exists']} unchanged, {counts['failed']} failed of {len(results)} seeds.")
+    for seed, (status, detail) in sorted(results.items()):
+        if status == "failed":
+            print(f"    [!] {seed}: {detail}")
+
+def run_discovery(writer, seed_hosts, pool, cred_cache, dns_cache, fallback, workers=16, per_site_workers=4,
+                  dns_workers=32):
+    """Resolve and discover `seed_hosts` ((seed, site) pairs); returns seed -> (status, detail)."""
+    resolved = resolve_all([seed for seed, site in seed_hosts], resolve_host, dns_cache, dns_workers)
+    credentials = load_credentials(writer, fallback=fallback)
+    index = DeviceIndex(writer)
+    scheduler = DiscoveryScheduler(credentials, index, pool, cred_cache, workers, per_site_workers)
+    results = scheduler.run(seed_hosts, resolved)
+    index.flush()
+    for seed, (status, detail) in results.items():
+        # detail is the IP for discovered seeds
+        if status in ("added", "updated") and detail in index.failed:
+            results[seed] = ("failed", f"database write failed: {index.failed[detail]}")
+    return results
 
 def main():
-    cli_creds, db_config = load_config()
+    cli_creds, db_config, discovery, dns, sessions, credential_cache = load_config()
     seed_hosts = load_seedlist()
     if not seed_hosts:
         print("[!] No IPs or hostnames to process.")
         return
 
-    for seed in seed_hosts:
-        ip, fqdn = resolve_host(seed)
-        if not ip:
-            continue
-
-        print(f"[*] Connecting to {ip} (resolved from {seed})...")
-        conn = connect_to_device(ip, cli_creds["username"], cli_creds["password"])
-        if conn:
-            device_info = discover_device_info(conn)
-            write_to_db(db_config, device_info, ip, fqdn)
-            conn.disconnect()
+    dns_cache = DnsCache(dns["path"], dns["ttl"], dns["negative_ttl"])
+    cred_cache = CredentialCache(**credential_cache)
+    pool = create_session_pool(**sessions)
+    try:
+        with metrics.collector_run("discovery"), \
+                BulkWriter(db_config, chunk_size=discovery.pop("batch_size")) as writer:
+            results = run_discovery(
+                writer, seed_hosts, pool, cred_cache, dns_cache, cli_creds, dns_workers=dns["workers"], **discovery
+            )
+            writer.report()
+    finally:
+        pool.close_all()
+        cred_cache.save()
+    print_summary(results)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,201 @@
+"""
+Interface and circuit collection for devices already in network_device.
+
+Each device is asked for its interfaces and interface descriptions over
+one pooled CLI session. Its network_interface rows are then replaced in a
+single transaction, however many chunks the upsert takes: one bulk upsert
+keyed on (device_uuid, interface_id), followed by one DELETE for every
+interface the device no longer reports.
+
+When circuit_pattern is configured, descriptions matching it also fill
+network_circuit, e.g. "CID: ABC-12345 ATT" for an interface to a carrier.
+"""
+
+import configparser
+import re
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from nati_data import metrics
+from nati_data.cisco_cli import CONFIG_FILE, load_config, create_session_pool
+from nati_data.credentials import CredentialCache, credential_session, load_credentials
+from nati_data.parsers import parse
+from nati_data.ssh_pool import send_command
+from nati_data.storage import BulkWriter
+
+# (interfaces, descriptions) commands per platform
+INTERFACE_COMMANDS = {
+    "cisco_ios": ("show interfaces", "show interfaces description"),
+    "cisco_xe": ("show interfaces", "show interfaces description"),
+    "cisco_nxos": ("show interface", "show interface description"),
+}
+
+INTERFACE_COLUMNS = ("interface_uuid", "device_uuid", "interface_id", "name", "description")
+CIRCUIT_COLUMNS = ("circuit_uuid", "interface_uuid", "circuit_id", "provider", "bandwidth")
+
+INTERFACE_NAME = re.compile(r"^([A-Za-z-]+)(.*)$")
+
+
+def load_interface_config():
+    config = configparser.ConfigParser()
+    config.read(CONFIG_FILE)
+    pattern = config.get("ciscocli", "circuit_pattern", fallback="").strip()
+    return {
+        "workers": config.getint("ciscocli", "interface_workers", fallback=16),
+        "circuit_pattern": re.compile(pattern) if pattern else None
+    }
+
+
+def name_key(name):
+    """
+    Key shared by a full and an abbreviated interface name, so that
+    "GigabitEthernet1/0/1" and "Gi1/0/1" (or "Ethernet1/1" and "Eth1/1")
+    meet: the first two letters of the type plus the numbering.
+    """
+    match = INTERFACE_NAME.match(name)
+    if not match:
+        return name.lower(), ""
+    return match.group(1)[:2].lower(), match.group(2)
+
+
+def fetch_interfaces(device, credentials, pool, cred_cache):
+    """Interfaces of one device as (interface_id, name, description, bandwidth) tuples."""
+    platform = device["device_type"] if device["device_type"] in INTERFACE_COMMANDS else "cisco_ios"
+    interfaces_command, descriptions_command = INTERFACE_COMMANDS[platform]
+    with credential_session(pool, device["ip_address"], credentials, cred_cache) as (conn, credential):
+        interfaces = parse(platform, interfaces_command, send_command(conn, interfaces_command))
+        descriptions = parse(platform, descriptions_command, send_command(conn, descriptions_command))
+
+    short_names = {name_key(row.name): row for row in descriptions}
+    merged = []
+    for interface in interfaces:
+        short = short_names.get(name_key(interface.interface_id))
+        merged.append((
+            interface.interface_id,
+            short.name if short else interface.interface_id,
+            interface.description or (short.description if short else None),
+            interface.bandwidth,
+        ))
+    return merged
+
+
+def sync_device_interfaces(writer, device, interfaces, circuit_pattern=None):
+    """Make network_interface (and matched circuits) for `device` equal `interfaces`."""
+    device_uuid = device["device_uuid"]
+    stored = {
+        row["interface_id"]: row["interface_uuid"]
+        for row in writer.query(
+            "SELECT interface_id, interface_uuid FROM network_interface WHERE device_uuid = %s",
+            (device_uuid,)
+        )
+    }
+
+    rows = []
+    circuits = []
+    for interface_id, name, description, bandwidth in interfaces:
+        interface_uuid = stored.get(interface_id) or str(uuid.uuid4())
+        rows.append((interface_uuid, device_uuid, interface_id, name, description))
+        match = circuit_pattern.search(description) if circuit_pattern and description else None
+        if match:
+            groups = match.groupdict()
+            circuits.append((
+                str(uuid.uuid4()),
+                interface_uuid,
+                groups.get("circuit") or match.group(0),
+                groups.get("provider"),
+                f"{bandwidth} Kbit" if bandwidth else None,
+            ))
+
+    placeholders = ", ".join(["%s"] * len(rows))
+    prune = (
+        f"DELETE FROM network_interface WHERE device_uuid = %s AND interface_id NOT IN ({placeholders})",
+        (device_uuid, *(row[2] for row in rows)),
+    )
+    writer.upsert(
+        "network_interface", INTERFACE_COLUMNS, rows,
+        keys=("device_uuid", "interface_id"), update=("name", "description"), then=[prune]
+    )
+
+    if circuit_pattern:
+        prune_circuits = (
+            "DELETE FROM network_circuit WHERE interface_uuid IN "
+            "(SELECT interface_uuid FROM network_interface WHERE device_uuid = %s)" +
+            (f" AND circuit_id NOT IN ({', '.join(['%s'] * len(circuits))})" if circuits else ""),
+            (device_uuid, *(circuit[2] for circuit in circuits)),
+        )
+        writer.upsert(
+            "network_circuit", CIRCUIT_COLUMNS, circuits,
+            keys=("circuit_id",), update=("interface_uuid", "provider", "bandwidth"), then=[prune_circuits]
+        )
+    return len(rows), len(circuits)
+
+
+def collect_interfaces(writer, devices, credentials, pool, cred_cache, workers=16, circuit_pattern=None):
+    """
+    Fetch interfaces from `devices` in parallel and write each device as
+    its output arrives; the writer itself stays on this thread.
+    """
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(fetch_interfaces, device, credentials, pool, cred_cache): device
+            for device in devices
+        }
+        for future in as_completed(futures):
+            device = futures[future]
+            try:
+                interfaces = future.result()
+                if not interfaces:
+                    # An empty parse is far likelier than a device without interfaces;
+                    # never let it wipe the stored ones
+                    raise ValueError("no interfaces parsed")
+                count, circuit_count = sync_device_interfaces(writer, device, interfaces, circuit_pattern)
+                print(f"[+] {device['hostname']}: {count} interfaces, {circuit_count} circuits.")
+                results[device["hostname"]] = ("synced", count)
+            except Exception as e:
+                print(f"[!] {device['hostname']} ({device['ip_address']}): {e}")
+                results[device["hostname"]] = ("failed", str(e))
+    return results
+
+
+def load_devices(writer):
+    return writer.query(
+        "SELECT device_uuid, hostname, ip_address, device_type FROM network_device "
+        "WHERE ip_address IS NOT NULL"
+    )
+
+
+def run_interfaces(writer, pool, cred_cache, fallback, workers=16, circuit_pattern=None, devices=None):
+    """Collect the interfaces of `devices`, or every stored device; returns hostname -> (status, detail)."""
+    credentials = load_credentials(writer, fallback=fallback)
+    if devices is None:
+        devices = load_devices(writer)
+    return collect_interfaces(writer, devices, credentials, pool, cred_cache, workers, circuit_pattern)
+
+
+def print_summary(results):
+    counts = Counter(status for status, detail in results.values())
+    print(f"[=] Interface collection finished: {counts['synced']} synced, "
+          f"{counts['failed']} failed of {len(results)} devices.")
+
+
+def main():
+    cli_creds, db_config, discovery, dns, sessions, credential_cache = load_config()
+    settings = load_interface_config()
+
+    cred_cache = CredentialCache(**credential_cache)
+    pool = create_session_pool(**sessions)
+    try:
+        with metrics.collector_run("interfaces"), \
+                BulkWriter(db_config, chunk_size=discovery["batch_size"]) as writer:
+            results = run_interfaces(writer, pool, cred_cache, cli_creds, **settings)
+            writer.report()
+    finally:
+        pool.close_all()
+        cred_cache.save()
+    print_summary(results)
+
+
+if __name__ == "__main__":
+    main()
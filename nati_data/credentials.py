@@ -0,0 +1,123 @@
+"""
+Credential resolution for CLI logins.
+
+Devices may accept any of the credentials in nati_credential. Instead of
+trying them blindly on every run, CredentialCache remembers which one
+worked per device and per subnet, and which ones a device rejected, so
+later runs try the likely credential first and skip known failures.
+"""
+
+import ipaddress
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from netmiko import NetmikoAuthenticationException
+
+from nati_data.cachefile import load_json, save_json
+
+CREDENTIAL_CACHE_FILE = "credential_cache.json"
+DEFAULT_FAILURE_TTL = 86400
+
+
+def load_credentials(writer, fallback=None):
+    """nati_credential rows, followed by the optional `fallback` credential dict."""
+    credentials = list(writer.query("SELECT cred_uuid, username, password FROM nati_credential"))
+    if fallback:
+        credentials.append(fallback)
+    return credentials
+
+
+def subnet_of(ip):
+    prefix = 24 if ipaddress.ip_address(ip).version == 4 else 64
+    return str(ipaddress.ip_network(f"{ip}/{prefix}", strict=False))
+
+
+class CredentialCache:
+    """Per-device and per-subnet credential outcomes, persisted as JSON."""
+
+    def __init__(self, path=CREDENTIAL_CACHE_FILE, failure_ttl=DEFAULT_FAILURE_TTL):
+        self.path = path
+        self.failure_ttl = failure_ttl
+        self.devices = {}
+        self.subnets = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        data = load_json(self.path, "credential cache")
+        if data is None:
+            return
+        self.devices = data.get("devices", {})
+        self.subnets = {subnet: Counter(wins) for subnet, wins in data.get("subnets", {}).items()}
+
+    def save(self):
+        with self.lock:
+            save_json(self.path, {"devices": self.devices, "subnets": self.subnets})
+
+    def order(self, ip, credentials):
+        """
+        `credentials` in trial order: the device's last working one, then
+        by how often each worked in the device's subnet. Credentials the
+        device rejected within failure_ttl are left out.
+        """
+        now = time.time()
+        with self.lock:
+            device = self.devices.get(ip, {})
+            failed = {cred for cred, expires in device.get("failed", {}).items() if expires > now}
+            wins = self.subnets.get(subnet_of(ip), Counter())
+            known_good = device.get("good")
+
+        def rank(credential):
+            cred_uuid = credential["cred_uuid"]
+            return (cred_uuid != known_good, -wins[cred_uuid])
+
+        return sorted(
+            (credential for credential in credentials if credential["cred_uuid"] not in failed),
+            key=rank,
+        )
+
+    def record_success(self, ip, cred_uuid):
+        with self.lock:
+            device = self.devices.setdefault(ip, {})
+            device["good"] = cred_uuid
+            device.get("failed", {}).pop(cred_uuid, None)
+            self.subnets.setdefault(subnet_of(ip), Counter())[cred_uuid] += 1
+
+    def record_failure(self, ip, cred_uuid):
+        with self.lock:
+            device = self.devices.setdefault(ip, {})
+            device.setdefault("failed", {})[cred_uuid] = time.time() + self.failure_ttl
+            if device.get("good") == cred_uuid:
+                del device["good"]
+
+
+@contextmanager
+def credential_session(pool, ip, credentials, cache):
+    """
+    Pooled session to `ip` with the first credential that logs in, tried
+    in the order learned by `cache`. Yields (conn, credential).
+
+    Only authentication failures move on to the next credential; a device
+    that cannot be reached fails straight away.
+    """
+    for credential in cache.order(ip, credentials):
+        try:
+            conn = pool.acquire(ip, credential["username"], credential["password"])
+        except ConnectionError as e:
+            if isinstance(e.__cause__, NetmikoAuthenticationException):
+                cache.record_failure(ip, credential["cred_uuid"])
+                continue
+            raise
+        cache.record_success(ip, credential["cred_uuid"])
+        break
+    else:
+        raise ConnectionError(f"no working credential for {ip}")
+
+    try:
+        yield conn, credential
+    except Exception:
+        pool.release(ip, credential["username"], conn, broken=True)
+        raise
+    pool.release(ip, credential["username"], conn)
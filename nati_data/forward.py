@@ -0,0 +1,92 @@
+"""
+Forward collected rows from an edge SQLite store to the central MariaDB.
+
+Edge collectors write to a local SQLite database ([database] type =
+sqlite). This job upserts every row changed since the previous forward
+into the database configured in [forward], table by table and in
+batch_size batches. Deletions stay local: the central collectors'
+own reconciles remove stale rows there.
+
+The fabrics, sites and devices the rows refer to must exist centrally.
+"""
+
+import configparser
+
+from nati_data import metrics
+from nati_data.storage import BulkWriter, DEFAULT_CHUNK_SIZE, CONFIG_FILE, load_db_config
+
+# Collector tables, parents before children, with their key columns
+FORWARD_TABLES = (
+    ("network_device", ("device_uuid",)),
+    ("network_interface", ("interface_uuid",)),
+    ("network_circuit", ("circuit_uuid",)),
+    ("aci_node", ("fabric_uuid", "node_id")),
+    ("aci_tenant", ("fabric_uuid", "tenant_id")),
+    ("aci_vrf", ("fabric_uuid", "tenant_id", "vrf_id")),
+    ("aci_bd", ("fabric_uuid", "tenant_id", "bd_id")),
+    ("aci_ap", ("fabric_uuid", "tenant_id", "ap_id")),
+    ("aci_epg", ("fabric_uuid", "tenant_id", "ap_id", "epg_id")),
+    ("opengear_node", ("node_uuid",)),
+    ("opengear_port", ("node_uuid", "port_id")),
+)
+
+FORWARD_STATE_DDL = """
+CREATE TABLE IF NOT EXISTS forward_state (
+    table_name VARCHAR(64) PRIMARY KEY,
+    forwarded_until TIMESTAMP NOT NULL
+)
+"""
+
+
+def load_marks(source):
+    source.execute(FORWARD_STATE_DDL)
+    return {row["table_name"]: row["forwarded_until"] for row in source.query("SELECT * FROM forward_state")}
+
+
+def forward_table(source, target, table, keys, since=None):
+    """Upsert rows of `table` changed at or after `since` (all rows if None) into `target`."""
+    sql = f"SELECT * FROM {table}"
+    params = None
+    if since is not None:
+        # >=: timestamps have one-second resolution, re-sending the boundary second is harmless
+        sql += " WHERE timestamp >= %s"
+        params = (since,)
+    rows = source.iter_query(sql, params)
+
+    first = next(rows, None)
+    if first is None:
+        return 0
+    # The central database keeps its own timestamps
+    columns = tuple(column for column in first if column != "timestamp")
+
+    def values():
+        yield tuple(first[column] for column in columns)
+        for row in rows:
+            yield tuple(row[column] for column in columns)
+
+    return target.upsert(table, columns, values(), keys=keys, label=f"{table} (forwarded)")
+
+
+def forward(source, target, tables=FORWARD_TABLES):
+    marks = load_marks(source)
+    for table, keys in tables:
+        started = source.query("SELECT CURRENT_TIMESTAMP AS now")[0]["now"]
+        count = forward_table(source, target, table, keys, marks.get(table))
+        source.upsert("forward_state", ("table_name", "forwarded_until"), [(table, started)], keys=("table_name",))
+        print(f"[=] {table}: forwarded {count} rows.")
+
+
+def main():
+    config = configparser.ConfigParser()
+    config.read(CONFIG_FILE)
+    batch_size = config.getint("forward", "batch_size", fallback=DEFAULT_CHUNK_SIZE)
+
+    with metrics.collector_run("forward"), \
+            BulkWriter(load_db_config("database"), chunk_size=batch_size) as source, \
+            BulkWriter(load_db_config("forward"), chunk_size=batch_size) as target:
+        forward(source, target)
+        target.report()
+
+
+if __name__ == "__main__":
+    main()
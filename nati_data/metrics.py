@@ -0,0 +1,289 @@
+"""
+In-process metrics for the collectors: counters, gauges and latency
+histograms, exported in the Prometheus text format.
+
+    with metrics.span("aci_class_query", class_name="fvBD"):
+        ...
+    for mo in metrics.timed(mos, "aci_class_query", class_name="fvBD"):
+        ...
+    metrics.inc("devices_total", status="added")
+
+Spans always record; one costs two perf_counter() calls and a locked
+dict update. What happens to the numbers is set in [metrics] of nati.ini
+and applied by collector_run(), which every collector's main() enters:
+
+- textfile_dir: nati_<job>.prom is written there after each run, for
+  node_exporter's textfile collector
+- port: /metrics is served over HTTP while the process runs, for
+  long-lived jobs such as aci_subscriber
+- profile: cprofile or pyinstrument (optional package) profiles each
+  run into profile_dir. Both follow the thread that runs main(); work
+  done on worker threads shows up as waits, so profile with workers = 1
+  for the full picture.
+"""
+
+import bisect
+import configparser
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONFIG_FILE = "nati.ini"
+PREFIX = "nati_"
+
+# Seconds; spans range from sub-millisecond upserts to minute-long class queries
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+class Registry:
+    """Metric values keyed by (name, labels); labels are a sorted tuple of pairs."""
+
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.gauges[(name, label_key(labels))] = value
+
+    def observe(self, name, value, **labels):
+        key = (name, label_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def clear(self):
+        with self.lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            for kind, values in (("counter", self.counters), ("gauge", self.gauges)):
+                for name in sorted({name for name, labels in values}):
+                    lines.append(f"# TYPE {PREFIX}{name} {kind}")
+                    for (metric, labels), value in sorted(values.items()):
+                        if metric == name:
+                            lines.append(f"{PREFIX}{name}{format_labels(labels)} {value}")
+            for name in sorted({name for name, labels in self.histograms}):
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                for (metric, labels), histogram in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                        cumulative += count
+                        bucket_labels = labels + (("le", bound),)
+                        lines.append(f"{PREFIX}{name}_bucket{format_labels(bucket_labels)} {cumulative}")
+                    lines.append(f"{PREFIX}{name}_sum{format_labels(labels)} {histogram.sum}")
+                    lines.append(f"{PREFIX}{name}_count{format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+# The process-wide registry every collector records into
+registry = Registry()
+
+
+def inc(name, amount=1, **labels):
+    registry.inc(name, amount, **labels)
+
+
+def set_gauge(name, value, **labels):
+    registry.set(name, value, **labels)
+
+
+@contextmanager
+def span(name, **labels):
+    """Time the block into the `<name>_seconds` histogram; exceptions also count `<name>_errors_total`."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        registry.inc(f"{name}_errors_total", **labels)
+        raise
+    finally:
+        registry.observe(f"{name}_seconds", time.perf_counter() - start, **labels)
+
+
+def timed(iterable, name, **labels):
+    """
+    Yield from `iterable`, recording the time spent producing its items
+    (not the caller's time between them) as one `<name>_seconds`
+    observation once it is exhausted or closed. Nothing is buffered.
+    """
+    elapsed = 0.0
+    iterator = iter(iterable)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - start
+            yield item
+    except Exception:
+        registry.inc(f"{name}_errors_total", **labels)
+        raise
+    finally:
+        registry.observe(f"{name}_seconds", elapsed, **labels)
+
+
+# Jobs of the scheduler finish on different threads but share one textfile
+textfile_lock = threading.Lock()
+
+
+def write_textfile(path):
+    """Write the registry to `path` atomically, so a scraper never reads half a file."""
+    tmp_path = f"{path}.tmp"
+    with textfile_lock:
+        with open(tmp_path, "w") as f:
+            f.write(registry.render())
+        os.replace(tmp_path, path)
+
+
+def textfile_path(textfile_dir, job):
+    return os.path.join(textfile_dir, f"{PREFIX}{job}.prom")
+
+
+def record_run(job, duration, success):
+    """Gauges for one finished run of `job`: its duration, end time and outcome."""
+    set_gauge("run_duration_seconds", duration, job=job)
+    set_gauge("last_run_timestamp_seconds", time.time(), job=job)
+    set_gauge("last_run_success", int(success), job=job)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        data = registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port, host=""):
+    """Serve /metrics on `port` from a background thread; returns the server."""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_profiler(kind):
+    if kind == "cprofile":
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+    if kind == "pyinstrument":
+        # pyinstrument is only needed when asked for
+        from pyinstrument import Profiler
+        profiler = Profiler()
+        profiler.start()
+        return profiler
+    print(f"[!] Unknown profiler {kind!r}; expected cprofile or pyinstrument.")
+    return None
+
+
+def stop_profiler(profiler, kind, path):
+    """Stop `profiler` and save it under `path` plus .prof (cProfile) or .html (pyinstrument); returns the file."""
+    if kind == "cprofile":
+        profiler.disable()
+        path += ".prof"
+        profiler.dump_stats(path)
+    else:
+        profiler.stop()
+        path += ".html"
+        with open(path, "w") as f:
+            f.write(profiler.output_html())
+    return path
+
+
+def load_config(path=CONFIG_FILE):
+    config = configparser.ConfigParser()
+    config.read(path)
+    return {
+        "textfile_dir": config.get("metrics", "textfile_dir", fallback=""),
+        "port": config.getint("metrics", "port", fallback=0),
+        "profile": config.get("metrics", "profile", fallback="").strip().lower(),
+        "profile_dir": config.get("metrics", "profile_dir", fallback="profiles"),
+    }
+
+
+@contextmanager
+def collector_run(job, path=CONFIG_FILE):
+    """
+    One run of collector `job`, exported as configured in [metrics]. The
+    run's duration, end time and outcome are recorded as gauges.
+    """
+    settings = load_config(path)
+    server = serve(settings["port"]) if settings["port"] else None
+    profiler = start_profiler(settings["profile"]) if settings["profile"] else None
+    start = time.perf_counter()
+    success = False
+    try:
+        yield
+        success = True
+    finally:
+        record_run(job, time.perf_counter() - start, success)
+        if profiler is not None:
+            os.makedirs(settings["profile_dir"], exist_ok=True)
+            stamp = time.strftime("%Y%m%d-%H%M%S")
+            base = os.path.join(settings["profile_dir"], f"{job}-{stamp}")
+            output = stop_profiler(profiler, settings["profile"], base)
+            print(f"[=] Profile of this run written to {output}")
+        if settings["textfile_dir"]:
+            write_textfile(textfile_path(settings["textfile_dir"], job))
+        if server is not None:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,179 @@
+"""
+Versioned schema migrations on top of the baseline tables in nati_data.schema.
+
+schema_version records every migration applied to a database; db_init.py
+runs the pending ones in version order after creating the tables. A schema
+change is a new entry at the end of MIGRATIONS, never an edit of an
+applied one.
+"""
+
+import re
+
+from nati_data.storage import translate_ddl, MARIADB, SQLITE
+
+SCHEMA_VERSION_DDL = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INT PRIMARY KEY,
+    description VARCHAR(255) NOT NULL,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+)
+"""
+
+# MariaDB's UUID type: 16 bytes on disk, read and written as the usual string
+UUID_TYPE_SINCE = (10, 7)
+
+
+def epg_bd_column(cursor, dialect):
+    # The EPG's bridge domain (fvRsBd), needed to join aci_epg to aci_bd
+    cursor.execute("ALTER TABLE aci_epg ADD COLUMN bd_id VARCHAR(100)")
+
+
+def index_exists(cursor, table, name):
+    cursor.execute(
+        "SELECT 1 FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s LIMIT 1",
+        (table, name)
+    )
+    return cursor.fetchone() is not None
+
+
+def create_index(cursor, dialect, name, table, columns):
+    # MySQL has no CREATE INDEX IF NOT EXISTS; MariaDB and SQLite do
+    if dialect == SQLITE:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+    elif not index_exists(cursor, table, name):
+        cursor.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+
+
+def drop_index(cursor, dialect, name, table):
+    if dialect == SQLITE:
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+    elif index_exists(cursor, table, name):
+        cursor.execute(f"ALTER TABLE {table} DROP INDEX {name}")
+
+
+def lookup_indexes(cursor, dialect):
+    for name, table, columns in (
+        ("idx_aci_node_serial", "aci_node", "serial"),
+        ("idx_network_device_device_type", "network_device", "device_type"),
+        # Covering: VRF -> its BDs without reading aci_bd rows
+        ("idx_aci_bd_vrf", "aci_bd", "fabric_uuid, tenant_id, vrf_id, bd_id, bd_name"),
+        # Covering: BD -> its EPGs, and the EPG side of EPG -> BD -> VRF
+        ("idx_aci_epg_bd", "aci_epg", "fabric_uuid, tenant_id, bd_id, epg_name"),
+        ("idx_aci_epg_name", "aci_epg", "epg_name, fabric_uuid, tenant_id, bd_id"),
+    ):
+        create_index(cursor, dialect, name, table, columns)
+
+
+def epg_name_index(cursor, dialect):
+    # idx_aci_epg_name leads with epg_name, so the baseline index only costs writes;
+    # it is named epg_name on MariaDB and as translate_ddl() names it on SQLite
+    drop_index(cursor, dialect, "idx_aci_epg_epg_name" if dialect == SQLITE else "epg_name", "aci_epg")
+
+
+def server_version(cursor):
+    """(major, minor) of a MariaDB server, None for MySQL."""
+    cursor.execute("SELECT VERSION() AS version")
+    version = cursor.fetchone()["version"]
+    match = re.match(r"(\d+)\.(\d+)", version)
+    if "mariadb" not in version.lower() or not match:
+        return None
+    return int(match.group(1)), int(match.group(2))
+
+
+def uuid_columns(cursor, dialect):
+    """
+    Store the CHAR(36) UUID columns as MariaDB's native UUID type. Keys,
+    foreign keys and their indexes shrink from 36 to 16 bytes per column
+    while every query keeps using UUID strings.
+    """
+    if dialect != MARIADB:
+        print("[=] UUID columns stay text on SQLite.")
+        return
+    version = server_version(cursor)
+    if version is None or version < UUID_TYPE_SINCE:
+        print("[=] UUID type needs MariaDB 10.7 or later; UUID columns stay CHAR(36).")
+        return
+
+    cursor.execute(
+        "SELECT table_name AS table_name, column_name AS column_name, is_nullable AS is_nullable "
+        "FROM information_schema.columns "
+        "WHERE table_schema = DATABASE() AND column_type = 'char(36)' "
+        "ORDER BY table_name, ordinal_position"
+    )
+    tables = {}
+    for row in cursor.fetchall():
+        null = "" if row["is_nullable"] == "YES" else " NOT NULL"
+        tables.setdefault(row["table_name"], []).append(f"MODIFY {row['column_name']} UUID{null}")
+
+    # Referencing and referenced columns change type one table at a time
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+    try:
+        for table, changes in tables.items():
+            cursor.execute(f"ALTER TABLE {table} {', '.join(changes)}")
+    finally:
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+
+
+# Coordination of sharded collection (nati_data.sharding); times are epoch seconds
+COLLECTOR_WORKER_DDL = """
+CREATE TABLE IF NOT EXISTS collector_worker (
+    kind VARCHAR(50) NOT NULL,
+    worker_id VARCHAR(255) NOT NULL,
+    expires_at DOUBLE NOT NULL,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (kind, worker_id)
+)
+"""
+
+COLLECTOR_LEASE_DDL = """
+CREATE TABLE IF NOT EXISTS collector_lease (
+    kind VARCHAR(50) NOT NULL,
+    shard INT NOT NULL,
+    owner VARCHAR(255),
+    expires_at DOUBLE NOT NULL DEFAULT 0,
+    finished_at DOUBLE NOT NULL DEFAULT 0,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (kind, shard)
+)
+"""
+
+
+def collector_leases(cursor, dialect):
+    for ddl in (COLLECTOR_WORKER_DDL, COLLECTOR_LEASE_DDL):
+        for statement in translate_ddl(ddl, dialect):
+            cursor.execute(statement)
+
+
+MIGRATIONS = (
+    (1, "aci_epg.bd_id for EPG to BD joins", epg_bd_column),
+    (2, "Lookup and covering indexes", lookup_indexes),
+    (3, "UUID columns as 16-byte UUID", uuid_columns),
+    (4, "Worker registrations and shard leases", collector_leases),
+    (5, "Drop the aci_epg (epg_name) index covered by idx_aci_epg_name", epg_name_index),
+)
+
+
+def applied_versions(cursor, dialect=MARIADB):
+    for statement in translate_ddl(SCHEMA_VERSION_DDL, dialect):
+        cursor.execute(statement)
+    cursor.execute("SELECT version FROM schema_version")
+    return {row["version"] for row in cursor.fetchall()}
+
+
+def migrate(conn, dialect=MARIADB, target=None):
+    """Apply the pending migrations up to `target` (all if None). Returns the versions applied."""
+    applied = []
+    with conn.cursor() as cursor:
+        done = applied_versions(cursor, dialect)
+        for version, description, apply in MIGRATIONS:
+            if version in done or (target is not None and version > target):
+                continue
+            print(f"[*] Schema migration {version}: {description}")
+            apply(cursor, dialect)
+            cursor.execute(
+                "INSERT INTO schema_version (version, description) VALUES (%s, %s)", (version, description)
+            )
+            conn.commit()
+            applied.append(version)
+    return applied
@@ -8,19 +8,168 @@ Documentation:
   https://ftp.opengear.com/download/opengear_appliances/OM/archive/19.Q4.0/doc/og-rest-api-specification-v2-2-ngcs.html
 """
 
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 import urllib3
+from requests.adapters import HTTPAdapter
+
+from nati_data import metrics
+from nati_data.cachefile import load_json, save_json, write_atomic
 
 # Disable "InsecureRequestWarning" when skipping TLS verification
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+RESPONSE_CACHE_FILE = "lighthouse_cache.json"
+DEFAULT_PER_PAGE = 100
+
+class ResponseCache:
+    """
+    GET responses stored with their ETag and Last-Modified validators, so
+    unchanged inventory is answered by a 304 instead of downloaded again.
+    """
+
+    def __init__(self, path=RESPONSE_CACHE_FILE):
+        self.path = path
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        self.entries = load_json(self.path, "response cache") or {}
+
+    def save(self):
+        with self.lock:
+            save_json(self.path, self.entries)
+
+    @staticmethod
+    def key(url, params):
+        return url + "?" + "&".join(f"{name}={value}" for name, value in sorted((params or {}).items()))
+
+    def headers(self, key):
+        """Conditional request headers for a cached response, if any."""
+        with self.lock:
+            entry = self.entries.get(key)
+        if not entry:
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def body(self, key):
+        with self.lock:
+            return self.entries[key]["body"]
+
+    def put(self, key, response, body):
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+        with self.lock:
+            self.entries[key] = {"etag": etag, "last_modified": last_modified, "body": body}
+
+class TokenStore:
+    """
+    Session tokens kept on disk between runs, encrypted with a Fernet key,
+    so short-lived invocations reuse a login instead of opening a new one.
+    Needs the optional `cryptography` package.
+    """
+
+    def __init__(self, path, key):
+        from cryptography.fernet import Fernet
+        self.path = path
+        self.fernet = Fernet(key)
+        self.lock = threading.Lock()
+
+    def _read(self):
+        from cryptography.fernet import InvalidToken
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "rb") as f:
+                return json.loads(self.fernet.decrypt(f.read()))
+        except (OSError, ValueError, InvalidToken) as e:
+            print(f"[!] Ignoring unreadable token store {self.path}: {e}")
+            return {}
+
+    def get(self, name):
+        with self.lock:
+            return self._read().get(name)
+
+    def put(self, name, token):
+        with self.lock:
+            tokens = self._read()
+            if token is None:
+                tokens.pop(name, None)
+            else:
+                tokens[name] = token
+            write_atomic(self.path, self.fernet.encrypt(json.dumps(tokens).encode()))
+
 class Lighthouse:
-    def __init__(self, base_url, username, password):
+    def __init__(self, base_url, username, password, cache=None, workers=8, token_store=None, pool_size=None):
+        """
+        `cache` is an optional ResponseCache for GETs; `workers` bounds the
+        requests in flight when pages and node ports are fetched concurrently.
+        `token_store` is an optional TokenStore that keeps the session token
+        across runs. Keep-alive connections are pooled up to `pool_size`,
+        by default one per worker.
+        """
         self.base_url = base_url.rstrip('/')
         self.username = username
         self.password = password
         self.session_token = None
         self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size or workers)
+        self.session.mount("https://", adapter)
+        self.cache = cache
+        self.workers = workers
+        self.token_store = token_store
+        self.lock = threading.Lock()
+        if token_store is not None:
+            token = token_store.get(self.token_name)
+            if token:
+                self.use_token(token)
+
+    @property
+    def token_name(self):
+        return f"{self.username}@{self.base_url}"
+
+    def use_token(self, token):
+        self.session_token = token
+        self.session.headers.update({"Authorization": "Token " + token})
+
+    def ensure_token(self):
+        with self.lock:
+            if not self.session_token:
+                self.authenticate()
+            return self.session_token
+
+    def reauthenticate(self, token):
+        """Log in again after `token` was rejected, unless another thread already has."""
+        with self.lock:
+            if self.session_token == token:
+                self.authenticate()
+
+    def request(self, method, path, **kwargs):
+        token = self.ensure_token()
+        url = f"https://{self.base_url}{path}"
+        with metrics.span("lighthouse_request", method=method):
+            response = self.session.request(method, url, verify=False, **kwargs)
+            if response.status_code == 401:
+                # Token expired server side, or a stored one outlived its session
+                self.reauthenticate(token)
+                response = self.session.request(method, url, verify=False, **kwargs)
+        if response.status_code == 304:
+            metrics.inc("lighthouse_not_modified_total")
+        else:
+            response.raise_for_status()
+        return response
 
     def authenticate(self):
         auth_url = f"https://{self.base_url}/api/v3.7/sessions"
@@ -28,40 +177,72 @@ class Lighthouse:
             "username": self.username,
             "password": self.password
         }
-        response = self.session.post(auth_url, json=payload, verify=False)
-        response.raise_for_status()
+        with metrics.span("lighthouse_login"):
+            response = self.session.post(auth_url, json=payload, verify=False)
+            response.raise_for_status()
 
         data = response.json()
         if data.get("state") == "authenticated":
-            self.session_token = data.get("session")
-            self.session.headers.update({"Authorization": "Token " + self.session_token})
+            self.use_token(data.get("session"))
+            if self.token_store is not None:
+                self.token_store.put(self.token_name, self.session_token)
             print(f"Authenticated to {self.base_url}")
         else:
             raise Exception("Authentication failed: state != 'authenticated'.")
 
     def get(self, path, params=None):
-        if not self.session_token:
-            self.authenticate()
-        url = f"https://{self.base_url}{path}"
-        response = self.session.get(url, params=params, verify=False)
-        response.raise_for_status()
-        return response.json()
+        if self.cache is None:
+            return self.request("GET", path, params=params).json()
+
+        key = self.cache.key(f"https://{self.base_url}{path}", params)
+        response = self.request("GET", path, params=params, headers=self.cache.headers(key))
+        if response.status_code == 304:
+            return self.cache.body(key)
+        body = response.json()
+        self.cache.put(key, response, body)
+        return body
 
     def post(self, path, data=None):
-        if not self.session_token:
-            self.authenticate()
-        url = f"https://{self.base_url}{path}"
-        response = self.session.post(url, json=data, verify=False)
-        response.raise_for_status()
-        return response.json()
+        return self.request("POST", path, json=data).json()
 
     def logout(self):
         if self.session_token:
             logout_url = f"https://{self.base_url}/api/v3.7/sessions/self"
             self.session.delete(logout_url, verify=False)
             self.session_token = None
+            if self.token_store is not None:
+                self.token_store.put(self.token_name, None)
             print(f"Logged out from {self.base_url}")
 
     def get_nodes(self):
         """Fetch node inventory from Lighthouse."""
-        return self.get("/api/v3.7/nodes")
+        return {"nodes": list(self.iter_nodes())}
+
+    def get_nodes_page(self, page, per_page=DEFAULT_PER_PAGE):
+        return self.get("/api/v3.7/nodes", params={"page": page, "per_page": per_page})
+
+    def iter_nodes(self, per_page=DEFAULT_PER_PAGE):
+        """
+        Yield every node, page by page. The first page tells how many pages
+        there are; the rest are then fetched concurrently and yielded in order.
+        """
+        first = self.get_nodes_page(1, per_page)
+        yield from first.get("nodes", [])
+        total_pages = first.get("meta", {}).get("total_pages", 1)
+        if total_pages <= 1:
+            return
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pages = pool.map(lambda page: self.get_nodes_page(page, per_page), range(2, total_pages + 1))
+            for data in pages:
+                yield from data.get("nodes", [])
+
+    def get_node_ports(self, node_id):
+        return self.get(f"/api/v3.7/nodes/{node_id}/ports").get("ports", [])
+
+    def get_nodes_with_ports(self, per_page=DEFAULT_PER_PAGE):
+        """All nodes, each with its "ports" list fetched through the worker pool."""
+        nodes = list(self.iter_nodes(per_page))
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for node, ports in zip(nodes, pool.map(lambda node: self.get_node_ports(node["id"]), nodes)):
+                node["ports"] = ports
+        return nodes
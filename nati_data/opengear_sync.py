@@ -0,0 +1,206 @@
+"""
+Opengear Lighthouse inventory sync into opengear_node and opengear_port.
+
+Each run diffs the Lighthouse inventory against the stored rows by
+content hash. Only new or changed rows are upserted and only vanished
+ones deleted, each table in bulk and all in one transaction, so
+reconciling thousands of console servers costs a handful of statements
+and a failed run leaves the stored inventory untouched.
+
+Nodes are linked to nati_site through a Lighthouse tag (site_tag) whose
+value is the site's site_id.
+"""
+
+import configparser
+import time
+import uuid
+
+from nati_data import metrics
+from nati_data.opengear import Lighthouse, ResponseCache, TokenStore, RESPONSE_CACHE_FILE, DEFAULT_PER_PAGE
+from nati_data.storage import (
+    BulkWriter, DEFAULT_CHUNK_SIZE, build_delete_in, build_upsert, chunked, load_db_config, row_hash
+)
+
+CONFIG_FILE = "nati.ini"
+
+NODE_COLUMNS = (
+    "node_uuid", "lighthouse", "node_id", "site_uuid", "name", "model", "serial_number",
+    "firmware_version", "mac_address", "lhvpn_address", "connection_status"
+)
+PORT_COLUMNS = ("node_uuid", "port_id", "label", "mode")
+
+
+def load_config():
+    config = configparser.ConfigParser()
+    config.read(CONFIG_FILE)
+
+    db_config = load_db_config(path=CONFIG_FILE)
+
+    lighthouse = {
+        "base_url": config["opengear"]["host"],
+        "username": config["opengear"]["og_uid"],
+        "password": config["opengear"]["og_pwd"],
+        "workers": config.getint("opengear", "workers", fallback=8)
+    }
+
+    sync = {
+        "per_page": config.getint("opengear", "per_page", fallback=DEFAULT_PER_PAGE),
+        "site_tag": config.get("opengear", "site_tag", fallback="Site"),
+        "response_cache": config.get("opengear", "response_cache", fallback=RESPONSE_CACHE_FILE),
+        "token_store": config.get("opengear", "token_store", fallback=""),
+        "token_key": config.get("opengear", "token_key", fallback=""),
+        "batch_size": config.getint("database", "batch_size", fallback=DEFAULT_CHUNK_SIZE)
+    }
+
+    return db_config, lighthouse, sync
+
+
+def node_tag(node, name):
+    for tag in node.get("tag_list", {}).get("tags", []):
+        if tag.get("name") == name:
+            return tag.get("value")
+    return None
+
+
+def node_row(node, node_uuid, lighthouse, site_uuid):
+    return (
+        node_uuid,
+        lighthouse,
+        node["id"],
+        site_uuid,
+        node.get("name") or node["id"],
+        node.get("model"),
+        node.get("serial_number"),
+        node.get("firmware_version"),
+        node.get("mac_address"),
+        node.get("lhvpn_address"),
+        node.get("connection_status") or node.get("status"),
+    )
+
+
+def port_row(port, node_uuid):
+    return (node_uuid, port["id"], port.get("label"), port.get("mode"))
+
+
+def diff_rows(stored, rows, columns, keys):
+    """
+    Compare `rows` (tuples ordered like `columns`) with `stored` (key
+    tuple -> row_hash). Returns (changed rows, keys of vanished rows).
+    """
+    key_index = [columns.index(key) for key in keys]
+    changed = []
+    seen = set()
+    for row in rows:
+        key = tuple(row[i] for i in key_index)
+        seen.add(key)
+        if stored.get(key) != row_hash(row):
+            changed.append(row)
+    return changed, [key for key in stored if key not in seen]
+
+
+def write_changes(writer, upserts, deletes):
+    """
+    Run `upserts` ((table, columns, keys, rows)) and then `deletes`
+    ((table, keys, rows)) in order, all in one transaction, so a failure
+    leaves the stored inventory as it was instead of half reconciled.
+    """
+    timings = []
+    with writer.transaction() as cursor:
+        for table, columns, keys, rows in upserts:
+            start = time.perf_counter()
+            sql = build_upsert(table, columns, keys, dialect=writer.dialect)
+            for chunk in chunked(rows, writer.chunk_size):
+                with metrics.span("db_write", table=table):
+                    cursor.executemany(sql, chunk)
+            timings.append((table, len(rows), time.perf_counter() - start))
+        for table, keys, rows in deletes:
+            start = time.perf_counter()
+            label = f"{table} (deleted)"
+            for chunk in chunked(rows, writer.chunk_size):
+                with metrics.span("db_write", table=label):
+                    cursor.execute(
+                        build_delete_in(table, keys, len(chunk), writer.dialect),
+                        [value for row in chunk for value in row]
+                    )
+            timings.append((label, len(rows), time.perf_counter() - start))
+    for label, count, elapsed in timings:
+        writer.record(label, count, elapsed)
+
+
+def sync_lighthouse(writer, lighthouse, nodes, site_tag="Site"):
+    """Reconcile the stored rows of one Lighthouse with `nodes` (each with "ports")."""
+    host = lighthouse.base_url
+    sites = {row["site_id"]: row["site_uuid"] for row in writer.query("SELECT site_id, site_uuid FROM nati_site")}
+
+    stored_nodes = writer.query(
+        f"SELECT {', '.join(NODE_COLUMNS)} FROM opengear_node WHERE lighthouse = %s", (host,)
+    )
+    node_uuids = {row["node_id"]: row["node_uuid"] for row in stored_nodes}
+    node_hashes = {(row["node_uuid"],): row_hash(row[column] for column in NODE_COLUMNS) for row in stored_nodes}
+
+    stored_ports = writer.query(
+        f"SELECT {', '.join('p.' + column for column in PORT_COLUMNS)} FROM opengear_port p "
+        "JOIN opengear_node n ON n.node_uuid = p.node_uuid WHERE n.lighthouse = %s", (host,)
+    )
+    port_hashes = {
+        (row["node_uuid"], row["port_id"]): row_hash(row[column] for column in PORT_COLUMNS)
+        for row in stored_ports
+    }
+
+    node_rows = []
+    port_rows = []
+    for node in nodes:
+        node_uuid = node_uuids.get(node["id"]) or str(uuid.uuid4())
+        node_rows.append(node_row(node, node_uuid, host, sites.get(node_tag(node, site_tag))))
+        port_rows.extend(port_row(port, node_uuid) for port in node.get("ports", []))
+
+    changed_nodes, stale_nodes = diff_rows(node_hashes, node_rows, NODE_COLUMNS, ("node_uuid",))
+    changed_ports, stale_ports = diff_rows(port_hashes, port_rows, PORT_COLUMNS, ("node_uuid", "port_id"))
+    # Ports of deleted nodes go with them (ON DELETE CASCADE)
+    gone = {key[0] for key in stale_nodes}
+    stale_ports = [key for key in stale_ports if key[0] not in gone]
+    if not nodes:
+        # An empty inventory is far likelier than a Lighthouse without nodes;
+        # never let it wipe the stored ones
+        print(f"[!] {host}: no nodes returned, keeping the stored ones.")
+        stale_nodes, stale_ports = [], []
+
+    write_changes(
+        writer,
+        upserts=[
+            ("opengear_node", NODE_COLUMNS, ("node_uuid",), changed_nodes),
+            ("opengear_port", PORT_COLUMNS, ("node_uuid", "port_id"), changed_ports),
+        ],
+        deletes=[
+            ("opengear_port", ("node_uuid", "port_id"), stale_ports),
+            ("opengear_node", ("node_uuid",), stale_nodes),
+        ],
+    )
+
+    print(f"[=] {host}: {len(node_rows)} nodes ({len(changed_nodes)} changed, {len(stale_nodes)} removed), "
+          f"{len(port_rows)} ports ({len(changed_ports)} changed, {len(stale_ports)} removed).")
+
+
+def main():
+    db_config, lighthouse_config, sync = load_config()
+
+    cache = ResponseCache(sync["response_cache"])
+    token_store = None
+    if sync["token_store"] and sync["token_key"]:
+        token_store = TokenStore(sync["token_store"], sync["token_key"])
+    lighthouse = Lighthouse(cache=cache, token_store=token_store, **lighthouse_config)
+
+    try:
+        with metrics.collector_run("opengear"):
+            nodes = lighthouse.get_nodes_with_ports(sync["per_page"])
+            with BulkWriter(db_config, chunk_size=sync["batch_size"]) as writer:
+                sync_lighthouse(writer, lighthouse, nodes, sync["site_tag"])
+                writer.report()
+    finally:
+        cache.save()
+        if token_store is None:
+            lighthouse.logout()
+
+
+if __name__ == "__main__":
+    main()
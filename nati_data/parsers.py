@@ -0,0 +1,164 @@
+"""
+Parsers for Cisco CLI output, registered per (platform, command).
+
+Platforms use the Netmiko device_type names. Every parser takes the raw
+command output and returns a typed record; fields the output does not
+carry are None.
+"""
+
+import re
+from collections import namedtuple
+
+VersionInfo = namedtuple("VersionInfo", "platform hostname model serial version uptime")
+
+PARSERS = {}
+
+
+def register(platform, command):
+    def decorator(func):
+        PARSERS[(platform, command)] = func
+        return func
+    return decorator
+
+
+def parse(platform, command, output):
+    try:
+        parser = PARSERS[(platform, command)]
+    except KeyError:
+        raise ValueError(f"No parser registered for '{command}' on {platform}") from None
+    return parser(output)
+
+
+def first_match(patterns, output):
+    for pattern in patterns:
+        match = pattern.search(output)
+        if match:
+            return match.group(1).strip()
+    return None
+
+
+NXOS_MARKER = re.compile(r"Cisco Nexus Operating System|NX-OS")
+IOS_XE_MARKER = re.compile(r"IOS[ -]XE")
+
+
+def detect_platform(show_version):
+    """Netmiko device_type for a device, judged from its `show version` output."""
+    if NXOS_MARKER.search(show_version):
+        return "cisco_nxos"
+    if IOS_XE_MARKER.search(show_version):
+        return "cisco_xe"
+    return "cisco_ios"
+
+
+IOS_UPTIME = re.compile(r"^(\S+) uptime is (.+)$", re.M)
+IOS_VERSION = re.compile(r"^Cisco IOS.*?Software.*?, Version ([^\s,]+)", re.M)
+IOS_MODEL = (
+    re.compile(r"^Model [Nn]umber\s*:\s*(\S+)", re.M),
+    re.compile(r"^[Cc]isco (\S+) \(.*?\) (?:processor|with)", re.M),
+)
+IOS_SERIAL = (
+    re.compile(r"^System [Ss]erial [Nn]umber\s*:\s*(\S+)", re.M),
+    re.compile(r"^Processor board ID (\S+)", re.M),
+)
+
+
+def parse_ios_show_version(output, platform):
+    uptime = IOS_UPTIME.search(output)
+    return VersionInfo(
+        platform=platform,
+        hostname=uptime.group(1) if uptime else None,
+        model=first_match(IOS_MODEL, output),
+        serial=first_match(IOS_SERIAL, output),
+        version=first_match((IOS_VERSION,), output),
+        uptime=uptime.group(2).strip() if uptime else None,
+    )
+
+
+@register("cisco_ios", "show version")
+def parse_cisco_ios_show_version(output):
+    return parse_ios_show_version(output, "cisco_ios")
+
+
+@register("cisco_xe", "show version")
+def parse_cisco_xe_show_version(output):
+    return parse_ios_show_version(output, "cisco_xe")
+
+
+NXOS_HOSTNAME = re.compile(r"^\s*Device name:\s*(\S+)", re.M)
+NXOS_VERSION = (
+    re.compile(r"^\s*NXOS:\s+version\s+(\S+)", re.M),
+    re.compile(r"^\s*system:\s+version\s+(\S+)", re.M),
+)
+NXOS_MODEL = re.compile(r"^\s*cisco (.+?)\s+[Cc]hassis", re.M)
+NXOS_SERIAL = re.compile(r"^\s*Processor [Bb]oard ID\s+(\S+)", re.M)
+NXOS_UPTIME = re.compile(r"^Kernel uptime is (.+)$", re.M)
+
+
+@register("cisco_nxos", "show version")
+def parse_cisco_nxos_show_version(output):
+    return VersionInfo(
+        platform="cisco_nxos",
+        hostname=first_match((NXOS_HOSTNAME,), output),
+        model=first_match((NXOS_MODEL,), output),
+        serial=first_match((NXOS_SERIAL,), output),
+        version=first_match(NXOS_VERSION, output),
+        uptime=first_match((NXOS_UPTIME,), output),
+    )
+
+
+InterfaceInfo = namedtuple("InterfaceInfo", "interface_id status protocol description bandwidth")
+InterfaceDescription = namedtuple("InterfaceDescription", "name description")
+
+INTERFACE_HEADER = re.compile(
+    r"^(\S+) is ((?:administratively )?(?:up|down|deleted))[^,\n]*(?:, line protocol is (\w+))?", re.M
+)
+INTERFACE_DESCRIPTION = re.compile(r"^\s+Description: (.*?)\s*$", re.M)
+INTERFACE_BANDWIDTH = re.compile(r"\bBW (\d+) Kbit")
+
+
+@register("cisco_ios", "show interfaces")
+@register("cisco_xe", "show interfaces")
+@register("cisco_nxos", "show interface")
+def parse_show_interfaces(output):
+    """One InterfaceInfo per interface block; bandwidth is in Kbit/s."""
+    headers = list(INTERFACE_HEADER.finditer(output))
+    interfaces = []
+    for header, following in zip(headers, headers[1:] + [None]):
+        block = output[header.end():following.start() if following else len(output)]
+        description = INTERFACE_DESCRIPTION.search(block)
+        bandwidth = INTERFACE_BANDWIDTH.search(block)
+        interfaces.append(InterfaceInfo(
+            interface_id=header.group(1),
+            status=header.group(2),
+            protocol=header.group(3),
+            description=(description.group(1) or None) if description else None,
+            bandwidth=int(bandwidth.group(1)) if bandwidth else None,
+        ))
+    return interfaces
+
+
+@register("cisco_ios", "show interfaces description")
+@register("cisco_xe", "show interfaces description")
+@register("cisco_nxos", "show interface description")
+def parse_show_interfaces_description(output):
+    """
+    Rows of the description table, with the abbreviated interface names.
+    The description column is located from each header line, since NX-OS
+    prints one table per interface type and "admin down" holds a space.
+    """
+    rows = []
+    column = None
+    for line in output.splitlines():
+        if not line.strip() or line.lstrip().startswith("---"):
+            continue
+        if "Description" in line and line.split()[0] in ("Interface", "Port"):
+            column = line.index("Description")
+            continue
+        if column is None:
+            continue
+        description = line[column:].strip()
+        rows.append(InterfaceDescription(
+            name=line.split()[0],
+            description=description if description and description != "--" else None,
+        ))
+    return rows
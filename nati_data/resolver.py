@@ -0,0 +1,84 @@
+"""
+DNS resolution stage for seedlist processing.
+
+Seeds are resolved concurrently before discovery starts, and every
+result is kept in an on-disk cache between runs. Failed lookups are
+cached too (for a shorter time) so a name that just timed out is not
+retried on every run.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from nati_data.cachefile import load_json, save_json
+
+DNS_CACHE_FILE = "dns_cache.json"
+DEFAULT_TTL = 3600
+DEFAULT_NEGATIVE_TTL = 300
+
+
+class DnsCache:
+    """Seed -> (ip, fqdn) with a per-entry expiry, persisted as JSON."""
+
+    def __init__(self, path=DNS_CACHE_FILE, ttl=DEFAULT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        entries = load_json(self.path, "DNS cache")
+        if entries is None:
+            return
+        now = time.time()
+        self.entries = {seed: entry for seed, entry in entries.items() if entry["expires"] > now}
+
+    def save(self):
+        with self.lock:
+            save_json(self.path, self.entries)
+
+    def get(self, seed):
+        """Cached (ip, fqdn) for `seed`, or None when missing or expired."""
+        with self.lock:
+            entry = self.entries.get(seed)
+        if entry is None or entry["expires"] <= time.time():
+            return None
+        return entry["ip"], entry["fqdn"]
+
+    def put(self, seed, ip, fqdn):
+        # A failed forward lookup, or a reverse lookup that found no name,
+        # is only trusted for the negative TTL
+        ttl = self.ttl if ip and fqdn else self.negative_ttl
+        with self.lock:
+            self.entries[seed] = {"ip": ip, "fqdn": fqdn, "expires": time.time() + ttl}
+
+
+def resolve_all(seeds, resolve, cache=None, workers=32):
+    """
+    Resolve every seed with `resolve(seed) -> (ip, fqdn)`, serving cached
+    answers first and looking up the rest concurrently. Returns a dict of
+    seed -> (ip, fqdn).
+    """
+    results = {}
+    misses = []
+    for seed in dict.fromkeys(seeds):
+        cached = cache.get(seed) if cache is not None else None
+        if cached is None:
+            misses.append(seed)
+        else:
+            results[seed] = cached
+
+    if misses:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for seed, (ip, fqdn) in zip(misses, pool.map(resolve, misses)):
+                results[seed] = (ip, fqdn)
+                if cache is not None:
+                    cache.put(seed, ip, fqdn)
+
+    if cache is not None:
+        cache.save()
+    print(f"[=] Resolved {len(results)} seeds ({len(results) - len(misses)} from cache).")
+    return results
@@ -0,0 +1,376 @@
+"""
+Long-running collection scheduler, replacing cron-driven full sweeps.
+
+Every collector becomes a job with its own interval, and the ACI classes
+become one job per class per fabric, e.g. nodes hourly and EPGs every
+five minutes ([scheduler] in nati.ini). Runs are spread out:
+
+- each job's first run falls at a random point of its first interval
+  (at most `spread` seconds in), so fabrics do not all start together,
+  and every later interval is stretched or shortened by up to `jitter`
+- a job still running or queued when it comes due again skips that turn
+- at most `workers` jobs run at once; due jobs beyond that wait in a
+  FIFO queue
+- an ACI class waits for its parent class (ACI_CLASS_PARENTS) to have
+  succeeded once on the same fabric, so first runs keep foreign keys intact
+
+The process keeps its APIC sessions, database pool, SSH session pool and
+DNS/credential caches between runs, so none of them is rebuilt per run.
+The fabric list is reloaded every `fabric_refresh` seconds.
+
+    python -m nati_data.scheduler
+"""
+
+import configparser
+import heapq
+import random
+import signal
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from nati_data import metrics
+from nati_data.storage import BulkWriter, DEFAULT_CHUNK_SIZE, close_pools, load_db_config
+
+CONFIG_FILE = "nati.ini"
+
+# Seconds between runs of each job; 0 disables it
+DEFAULT_INTERVALS = {
+    "aci_tenants": 900,
+    "aci_nodes": 3600,
+    "aci_vrfs": 900,
+    "aci_aps": 900,
+    "aci_bds": 300,
+    "aci_epgs": 300,
+    "discovery": 86400,
+    "interfaces": 3600,
+    "opengear": 900,
+    "forward": 0,
+}
+
+ACI_JOBS = {
+    "aci_tenants": "fvTenant",
+    "aci_nodes": "fabricNode",
+    "aci_vrfs": "fvCtx",
+    "aci_aps": "fvAp",
+    "aci_bds": "fvBD",
+    "aci_epgs": "fvAEPg",
+}
+
+# Seconds before a job whose parent has not succeeded yet is looked at again
+DEPENDENCY_RETRY = 10
+
+
+def load_config(path=CONFIG_FILE):
+    config = configparser.ConfigParser()
+    config.read(path)
+    return {
+        "workers": config.getint("scheduler", "workers", fallback=4),
+        "jitter": config.getfloat("scheduler", "jitter", fallback=0.1),
+        "spread": config.getint("scheduler", "spread", fallback=300),
+        "fabric_refresh": config.getint("scheduler", "fabric_refresh", fallback=600),
+        "intervals": {
+            name: config.getint("scheduler", name, fallback=default) for name, default in DEFAULT_INTERVALS.items()
+        },
+        "sections": set(config.sections()),
+    }
+
+
+class Job:
+    def __init__(self, name, interval, run, after=None):
+        """`run()` does one collection; `after` names a job that must have succeeded first."""
+        self.name = name
+        self.interval = interval
+        self.run = run
+        self.after = after
+
+
+class Scheduler:
+    def __init__(self, workers=4, jitter=0.1, spread=300, textfile=None):
+        """`textfile`, if set, is rewritten with every metric after each job."""
+        self.workers = workers
+        self.jitter = jitter
+        self.spread = spread
+        self.textfile = textfile
+        self.jobs = {}
+        self.due = []  # heap of (due time, sequence, job name)
+        self.sequence = 0
+        self.queue = deque()
+        self.queued = set()
+        self.running = set()
+        self.succeeded = set()
+        self.cond = threading.Condition()
+        self.stop_event = threading.Event()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+
+    def add(self, job):
+        """Schedule `job`, first due at a random point of min(interval, spread) from now."""
+        with self.cond:
+            self.jobs[job.name] = job
+            self._push(job.name, time.monotonic() + random.uniform(0, min(job.interval, self.spread)))
+            self.cond.notify()
+
+    def remove(self, name):
+        with self.cond:
+            self.jobs.pop(name, None)
+            self.succeeded.discard(name)
+
+    def _push(self, name, due):
+        self.sequence += 1
+        heapq.heappush(self.due, (due, self.sequence, name))
+
+    def _next_interval(self, job):
+        return job.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _take_due(self, now):
+        while self.due and self.due[0][0] <= now:
+            due, sequence, name = heapq.heappop(self.due)
+            job = self.jobs.get(name)
+            if job is None:
+                # Removed since it was scheduled
+                continue
+            if job.after and job.after not in self.succeeded:
+                self._push(name, now + DEPENDENCY_RETRY)
+                continue
+            self._push(name, now + self._next_interval(job))
+            if name in self.running or name in self.queued:
+                metrics.inc("scheduler_skipped_total", job=name)
+                print(f"[=] {name} is still running or queued; skipping this turn.")
+                continue
+            self.queue.append(job)
+            self.queued.add(name)
+
+    def _dispatch(self):
+        while self.queue and len(self.running) < self.workers:
+            job = self.queue.popleft()
+            self.queued.discard(job.name)
+            self.running.add(job.name)
+            self.executor.submit(self._execute, job)
+        metrics.set_gauge("scheduler_queued_jobs", len(self.queue))
+        metrics.set_gauge("scheduler_running_jobs", len(self.running))
+
+    def _execute(self, job):
+        start = time.perf_counter()
+        success = False
+        try:
+            with metrics.span("scheduler_job", job=job.name):
+                job.run()
+            success = True
+            with self.cond:
+                self.succeeded.add(job.name)
+        except Exception as e:
+            print(f"[!] Job {job.name} failed: {e}")
+        finally:
+            metrics.record_run(job.name, time.perf_counter() - start, success)
+            self._write_textfile()
+            with self.cond:
+                self.running.discard(job.name)
+                self.cond.notify()
+
+    def _write_textfile(self):
+        if not self.textfile:
+            return
+        try:
+            metrics.write_textfile(self.textfile)
+        except OSError as e:
+            print(f"[!] Failed to write metrics to {self.textfile}: {e}")
+
+    def run(self):
+        """Run due jobs until stop() is called, then wait for the running ones."""
+        with self.cond:
+            while not self.stop_event.is_set():
+                now = time.monotonic()
+                self._take_due(now)
+                self._dispatch()
+                timeout = self.due[0][0] - now if self.due else 60
+                self.cond.wait(max(0.0, min(timeout, 60)))
+        self.executor.shutdown(wait=True)
+
+    def stop(self, *args):
+        self.stop_event.set()
+        with self.cond:
+            self.cond.notify()
+
+
+class AciJobs:
+    """
+    One job per enabled ACI class per fabric, named like aci_epgs.<fabric>;
+    refresh() reloads the fabric list. Classes are always queried one by
+    one here, whatever query_mode says, since each has its own interval.
+    """
+
+    def __init__(self, scheduler, intervals):
+        # Imported only when ACI jobs are enabled: cisco_aci reads its configuration on import
+        from nati_data import cisco_aci
+        self.aci = cisco_aci
+        self.scheduler = scheduler
+        self.intervals = {name: interval for name, interval in intervals.items() if name in ACI_JOBS and interval > 0}
+        self.job_names = {class_name: name for name, class_name in ACI_JOBS.items() if name in self.intervals}
+        self.jobs = set()
+
+    def job_name(self, class_name, fabric):
+        return f"{self.job_names[class_name]}.{fabric['fabric_name']}"
+
+    def class_job(self, fabric, class_name):
+        aci = self.aci
+        fetch, insert = aci.ACI_CLASSES[class_name]
+
+        def run():
+            with BulkWriter(aci.db_config, chunk_size=aci.batch_size) as writer:
+                marks = aci.load_high_water_marks(writer)
+                aci.sync_aci_class(writer, fabric, class_name, fetch, insert, marks)
+        return run
+
+    def refresh(self):
+        """Add jobs for new fabrics and drop those of deleted ones."""
+        with BulkWriter(self.aci.db_config) as writer:
+            fabrics = self.aci.get_aci_fabrics(writer)
+        wanted = set()
+        for fabric in fabrics:
+            for class_name in self.job_names:
+                name = self.job_name(class_name, fabric)
+                wanted.add(name)
+                if name in self.jobs:
+                    continue
+                parent = self.aci.ACI_CLASS_PARENTS.get(class_name)
+                after = self.job_name(parent, fabric) if parent in self.job_names else None
+                interval = self.intervals[self.job_names[class_name]]
+                self.scheduler.add(Job(name, interval, self.class_job(fabric, class_name), after))
+        for name in self.jobs - wanted:
+            self.scheduler.remove(name)
+        self.jobs = wanted
+        print(f"[=] Scheduling {len(self.job_names)} ACI classes on {len(fabrics)} fabrics.")
+
+
+class CliJobs:
+    """Discovery and interface collection sharing one SSH session pool and the DNS/credential caches."""
+
+    def __init__(self):
+        from nati_data import cisco_cli, cisco_interfaces
+        from nati_data.credentials import CredentialCache
+        from nati_data.resolver import DnsCache
+
+        self.cli = cisco_cli
+        self.interfaces = cisco_interfaces
+        self.fallback, self.db_config, self.discovery, self.dns, sessions, credential_cache = cisco_cli.load_config()
+        self.batch_size = self.discovery.pop("batch_size")
+        self.interface_settings = cisco_interfaces.load_interface_config()
+        self.dns_cache = DnsCache(self.dns["path"], self.dns["ttl"], self.dns["negative_ttl"])
+        self.cred_cache = CredentialCache(**credential_cache)
+        self.pool = cisco_cli.create_session_pool(**sessions)
+
+    def run_discovery(self, seed_hosts=None):
+        if seed_hosts is None:
+            # Re-read every run, so seedlist edits need no restart
+            seed_hosts = self.cli.load_seedlist()
+        if not seed_hosts:
+            return
+        try:
+            with BulkWriter(self.db_config, chunk_size=self.batch_size) as writer:
+                results = self.cli.run_discovery(
+                    writer, seed_hosts, self.pool, self.cred_cache, self.dns_cache, self.fallback,
+                    dns_workers=self.dns["workers"], **self.discovery
+                )
+        finally:
+            self.cred_cache.save()
+        self.cli.print_summary(results)
+
+    def run_interfaces(self, devices=None):
+        try:
+            with BulkWriter(self.db_config, chunk_size=self.batch_size) as writer:
+                results = self.interfaces.run_interfaces(
+                    writer, self.pool, self.cred_cache, self.fallback, devices=devices, **self.interface_settings
+                )
+        finally:
+            self.cred_cache.save()
+        self.interfaces.print_summary(results)
+
+    def close(self):
+        self.pool.close_all()
+        self.cred_cache.save()
+
+
+class OpengearJob:
+    """Lighthouse sync keeping its session token and response cache across runs."""
+
+    def __init__(self):
+        from nati_data import opengear_sync
+        from nati_data.opengear import Lighthouse, ResponseCache, TokenStore
+
+        self.sync = opengear_sync
+        self.db_config, lighthouse, self.settings = opengear_sync.load_config()
+        self.cache = ResponseCache(self.settings["response_cache"])
+        self.token_store = None
+        if self.settings["token_store"] and self.settings["token_key"]:
+            self.token_store = TokenStore(self.settings["token_store"], self.settings["token_key"])
+        self.lighthouse = Lighthouse(cache=self.cache, token_store=self.token_store, **lighthouse)
+
+    def run(self):
+        try:
+            nodes = self.lighthouse.get_nodes_with_ports(self.settings["per_page"])
+            with BulkWriter(self.db_config, chunk_size=self.settings["batch_size"]) as writer:
+                self.sync.sync_lighthouse(writer, self.lighthouse, nodes, self.settings["site_tag"])
+        finally:
+            self.cache.save()
+
+    def close(self):
+        if self.token_store is None:
+            self.lighthouse.logout()
+
+
+def run_forward():
+    from nati_data.forward import forward
+
+    config = configparser.ConfigParser()
+    config.read(CONFIG_FILE)
+    batch_size = config.getint("forward", "batch_size", fallback=DEFAULT_CHUNK_SIZE)
+    with BulkWriter(load_db_config("database"), chunk_size=batch_size) as source, \
+            BulkWriter(load_db_config("forward"), chunk_size=batch_size) as target:
+        forward(source, target)
+
+
+def main():
+    settings = load_config()
+    intervals = settings["intervals"]
+    textfile_dir = metrics.load_config()["textfile_dir"]
+    # The daemon never finishes a run, so collector_run() would only write this at shutdown
+    textfile = metrics.textfile_path(textfile_dir, "scheduler") if textfile_dir else None
+    scheduler = Scheduler(settings["workers"], settings["jitter"], settings["spread"], textfile)
+    closers = []
+
+    if any(intervals[name] > 0 for name in ACI_JOBS):
+        aci_jobs = AciJobs(scheduler, intervals)
+        aci_jobs.refresh()
+        scheduler.add(Job("aci_fabrics", settings["fabric_refresh"], aci_jobs.refresh))
+        closers.append(aci_jobs.aci.close_apic_sessions)
+    if "ciscocli" in settings["sections"] and (intervals["discovery"] > 0 or intervals["interfaces"] > 0):
+        cli_jobs = CliJobs()
+        if intervals["discovery"] > 0:
+            scheduler.add(Job("discovery", intervals["discovery"], cli_jobs.run_discovery))
+        if intervals["interfaces"] > 0:
+            scheduler.add(Job("interfaces", intervals["interfaces"], cli_jobs.run_interfaces))
+        closers.append(cli_jobs.close)
+    if "opengear" in settings["sections"] and intervals["opengear"] > 0:
+        opengear_job = OpengearJob()
+        scheduler.add(Job("opengear", intervals["opengear"], opengear_job.run))
+        closers.append(opengear_job.close)
+    if "forward" in settings["sections"] and intervals["forward"] > 0:
+        scheduler.add(Job("forward", intervals["forward"], run_forward))
+
+    # docker stop sends SIGTERM; let running jobs finish
+    signal.signal(signal.SIGTERM, scheduler.stop)
+    signal.signal(signal.SIGINT, scheduler.stop)
+    print(f"[*] Scheduler started with {len(scheduler.jobs)} jobs and {settings['workers']} workers.")
+    try:
+        with metrics.collector_run("scheduler"):
+            scheduler.run()
+    finally:
+        for close in closers:
+            close()
+        close_pools()
+    print("[=] Scheduler stopped.")
+
+
+if __name__ == "__main__":
+    main()
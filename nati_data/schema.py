@@ -0,0 +1,348 @@
+"""
+Table definitions, in MariaDB DDL (see storage.translate_ddl for SQLite).
+
+This is the baseline schema created by db_init.py; later changes are
+versioned migrations in nati_data.migrations.
+"""
+
+# SQL table creation commands - core NATI module
+nati_tables = [
+"""
+CREATE TABLE IF NOT EXISTS nati_org (
+    org_uuid CHAR(36) PRIMARY KEY,
+    org_name VARCHAR(100) NOT NULL UNIQUE,
+    description TEXT,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+""",
+"""
+CREATE TABLE IF NOT EXISTS nati_bu (
+    bu_uuid CHAR(36) PRIMARY KEY,
+    org_uuid CHAR(36) NOT NULL,
+    bu_name VARCHAR(100) NOT NULL,
+    description TEXT,
+    UNIQUE (org_uuid, bu_name),
+    FOREIGN KEY (org_uuid) REFERENCES nati_org(org_uuid) ON DELETE CASCADE,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+""",
+"""
+CREATE TABLE IF NOT EXISTS nati_env (
+    env_uuid CHAR(36) PRIMARY KEY,
+    env_name VARCHAR(50) NOT NULL UNIQUE,
+    description TEXT,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+""",
+"""
+CREATE TABLE IF NOT EXISTS nati_region (
+    region_uuid CHAR(36) PRIMARY KEY,
+    region_id VARCHAR(20) UNIQUE,
+    region_name VARCHAR(100) NOT NULL UNIQUE,
+    type ENUM('physical', 'cloud', 'logical') DEFAULT 'physical',
+    country_code CHAR(2),
+    description TEXT,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+""",
+"""
+CREATE TABLE IF NOT EXISTS nati_site (
+    site_uuid CHAR(36) PRIMARY KEY,
+    region_uuid CHAR(36) NOT NULL,
+    bu_uuid CHAR(36),
+    env_uuid CHAR(36),
+    site_id VARCHAR(20) UNIQUE,
+    site_name VARCHAR(150) NOT NULL,
+    site_type ENUM('datacenter', 'branch', 'lab', 'cloud', 'cnf', 'office', 'colo', 'virtual') DEFAULT 'datacenter',
+    address VARCHAR(255),
+    city VARCHAR(100),
+    state VARCHAR(50),
+    postal_code VARCHAR(20),
+    country VARCHAR(100),
+    latitude DECIMAL(10,7),
+    longitude DECIMAL(10,7),
+    description TEXT,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (region_uuid) REFERENCES nati_region(region_uuid)
+);
+""",
+"""
+CREATE TABLE IF NOT EXISTS nati_location (
+    location_uuid CHAR(36) PRIMARY KEY,
+    location_id VARCHAR(20) UNIQUE,
+    location_name VARCHAR(150) NOT NULL,
+    location_type ENUM(
+        'rack', 'room', 'floor', 'vpc', 'az',
+        'namespace', 'k8s_cluster', 'segment',
+        'logical', 'other', 'site', 'office'
+    ) DEFAULT 'site',
+    description TEXT,
+    virtual BOOLEAN DEFAULT FALSE,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+""",
+"""
+CREATE TABLE IF NOT EXISTS nati_location_site_map (
+    location_uuid CHAR(36),
+    site_uuid CHAR(36),
+    PRIMARY KEY (location_uuid, site_uuid),
+    FOREIGN KEY (location_uuid) REFERENCES nati_location(location_uuid) ON DELETE CASCADE,
+    FOREIGN KEY (site_uuid) REFERENCES nati_site(site_uuid) ON DELETE CASCADE,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+""",
+"""
+CREATE TABLE IF NOT EXISTS nati_config (
+    config_module VARCHAR(100) NOT NULL,
+    config_key VARCHAR(100) NOT NULL,
+    config_value TEXT NOT NULL,
+    PRIMARY KEY (config_module, config_key),
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+""",
+"""
+CREATE TABLE IF NOT EXISTS nati_user (
+    user_uuid CHAR(36) PRIMARY KEY,
+    username VARCHAR(100) NOT NULL UNIQUE,
+    full_name VARCHAR(150),
+    email VARCHAR(150) UNIQUE,
+    password_hash VARCHAR(255) NOT NULL,
+    active BOOLEAN DEFAULT TRUE,
+    source VARCHAR(50) DEFAULT 'local',
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX (username),
+    INDEX (email)
+);
+""",
+"""
+CREATE TABLE IF NOT EXISTS nati_role (
+    role_uuid CHAR(36) PRIMARY KEY,
+    role_name VARCHAR(100) NOT NULL UNIQUE,
+    description TEXT,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX (role_name)
+);
+""",
+"""
+CREATE TABLE IF NOT EXISTS nati_user_role (
+    user_uuid CHAR(36) NOT NULL,
+    role_uuid CHAR(36) NOT NULL,
+    assigned_by VARCHAR(100),
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_uuid, role_uuid),
+    FOREIGN KEY (user_uuid) REFERENCES nati_user(user_uuid) ON DELETE CASCADE,
+    FOREIGN KEY (role_uuid) REFERENCES nati_role(role_uuid) ON DELETE CASCADE
+);
+""",
+"""
+CREATE TABLE IF NOT EXISTS nati_api_key (
+    key_id CHAR(36) PRIMARY KEY,
+    label VARCHAR(100),
+    api_key_hash CHAR(64),
+    active BOOLEAN DEFAULT TRUE,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+""",
+"""
+CREATE TABLE IF NOT EXISTS nati_credential (
+    cred_uuid CHAR(36) PRIMARY KEY,
+    username TEXT NOT NULL,
+    password TEXT NOT NULL,
+    description TEXT,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+"""
+]
+
+# SQL table creation commands - network module
+network_tables = [
+"""
+CREATE TABLE IF NOT EXISTS network_device (
+    device_uuid CHAR(36) PRIMARY KEY,
+    hostname VARCHAR(100) NOT NULL,
+    fqdn VARCHAR(255),
+    ip_address VARCHAR(45),
+    location VARCHAR(100),
+    device_type VARCHAR(50),
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX (hostname),
+    INDEX (fqdn),
+    INDEX (ip_address)
+);
+""",
+"""
+CREATE TABLE IF NOT EXISTS network_interface (
+    interface_uuid CHAR(36) PRIMARY KEY,
+    device_uuid CHAR(36) NOT NULL,
+    interface_id VARCHAR(100) NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    description VARCHAR(255),
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (device_uuid) REFERENCES network_device(device_uuid) ON DELETE CASCADE,
+    UNIQUE (device_uuid, interface_id),
+    INDEX (name)
+);
+""",
+"""
+CREATE TABLE IF NOT EXISTS network_circuit (
+    circuit_uuid CHAR(36) PRIMARY KEY,
+    interface_uuid CHAR(36) NOT NULL,
+    circuit_id VARCHAR(100) NOT NULL UNIQUE,
+    provider VARCHAR(100),
+    bandwidth VARCHAR(50),
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (interface_uuid) REFERENCES network_interface(interface_uuid) ON DELETE CASCADE,
+    INDEX (provider)
+);
+"""
+]
+
+# SQL table creation commands - Cisco ACI module
+aci_tables = [
+"""
+CREATE TABLE IF NOT EXISTS aci_fabric (
+    fabric_uuid CHAR(36) PRIMARY KEY,
+    site_uuid CHAR(36) NOT NULL,
+    fabric_name VARCHAR(50) NOT NULL,
+    url VARCHAR(255) NOT NULL,
+    host VARCHAR(100) NOT NULL,
+    username VARCHAR(100) NOT NULL,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE (site_uuid, fabric_name),
+    FOREIGN KEY (site_uuid) REFERENCES nati_site(site_uuid) ON DELETE CASCADE
+);
+""",
+"""
+CREATE TABLE IF NOT EXISTS aci_tenant (
+    fabric_uuid CHAR(36) NOT NULL,
+    tenant_dn VARCHAR(100) NOT NULL,
+    tenant_id VARCHAR(100) NOT NULL,
+    tenant_name VARCHAR(100) NOT NULL,
+    description VARCHAR(255),
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (fabric_uuid, tenant_id),
+    FOREIGN KEY (fabric_uuid) REFERENCES aci_fabric(fabric_uuid) ON DELETE CASCADE
+);
+""",
+"""
+CREATE TABLE IF NOT EXISTS aci_vrf (
+    fabric_uuid CHAR(36) NOT NULL,
+    tenant_id VARCHAR(100) NOT NULL,
+    vrf_id VARCHAR(100) NOT NULL,
+    vrf_name VARCHAR(100) NOT NULL,
+    description VARCHAR(255),
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (fabric_uuid, tenant_id, vrf_id),
+    FOREIGN KEY (fabric_uuid, tenant_id) REFERENCES aci_tenant(fabric_uuid, tenant_id) ON DELETE CASCADE,
+    INDEX (vrf_name)
+);
+""",
+"""
+CREATE TABLE IF NOT EXISTS aci_bd (
+    fabric_uuid CHAR(36) NOT NULL,
+    tenant_id VARCHAR(100) NOT NULL,
+    bd_id VARCHAR(100) NOT NULL,
+    bd_name VARCHAR(100) NOT NULL,
+    vrf_id VARCHAR(100),
+    subnet VARCHAR(50),
+    description VARCHAR(255),
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (fabric_uuid, tenant_id, bd_id),
+    FOREIGN KEY (fabric_uuid, tenant_id) REFERENCES aci_tenant(fabric_uuid, tenant_id) ON DELETE CASCADE,
+    FOREIGN KEY (fabric_uuid, tenant_id, vrf_id)
+        REFERENCES aci_vrf(fabric_uuid, tenant_id, vrf_id) ON DELETE RESTRICT,
+    INDEX (bd_name),
+    INDEX (subnet)
+);
+""",
+"""
+CREATE TABLE IF NOT EXISTS aci_ap (
+    fabric_uuid CHAR(36) NOT NULL,
+    tenant_id VARCHAR(100) NOT NULL,
+    ap_id VARCHAR(100) NOT NULL,
+    ap_name VARCHAR(100) NOT NULL,
+    description VARCHAR(255),
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (fabric_uuid, tenant_id, ap_id),
+    FOREIGN KEY (fabric_uuid, tenant_id) REFERENCES aci_tenant(fabric_uuid, tenant_id) ON DELETE CASCADE,
+    INDEX (ap_name)
+);
+""",
+"""
+CREATE TABLE IF NOT EXISTS aci_epg (
+    fabric_uuid CHAR(36) NOT NULL,
+    tenant_id VARCHAR(100) NOT NULL,
+    ap_id VARCHAR(100) NOT NULL,
+    epg_id VARCHAR(100) NOT NULL,
+    epg_name VARCHAR(100) NOT NULL,
+    description VARCHAR(255),
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (fabric_uuid, tenant_id, ap_id, epg_id),
+    FOREIGN KEY (fabric_uuid, tenant_id, ap_id)
+        REFERENCES aci_ap(fabric_uuid, tenant_id, ap_id) ON DELETE CASCADE
+);
+""",
+"""
+CREATE TABLE IF NOT EXISTS aci_node (
+    fabric_uuid CHAR(36) NOT NULL,
+    node_id VARCHAR(100) NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    role VARCHAR(50) NOT NULL,
+    serial VARCHAR(100),
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (fabric_uuid, node_id),
+    FOREIGN KEY (fabric_uuid) REFERENCES aci_fabric(fabric_uuid) ON DELETE CASCADE,
+    INDEX (name),
+    INDEX (role)
+);
+""",
+"""
+CREATE TABLE IF NOT EXISTS aci_sync_state (
+    fabric_uuid CHAR(36) NOT NULL,
+    class_name VARCHAR(50) NOT NULL,
+    high_water_mark VARCHAR(40) NOT NULL,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (fabric_uuid, class_name),
+    FOREIGN KEY (fabric_uuid) REFERENCES aci_fabric(fabric_uuid) ON DELETE CASCADE
+);
+"""
+]
+
+# SQL table creation commands - Opengear Lighthouse module
+opengear_tables = [
+"""
+CREATE TABLE IF NOT EXISTS opengear_node (
+    node_uuid CHAR(36) PRIMARY KEY,
+    lighthouse VARCHAR(100) NOT NULL,
+    node_id VARCHAR(50) NOT NULL,
+    site_uuid CHAR(36),
+    name VARCHAR(100) NOT NULL,
+    model VARCHAR(50),
+    serial_number VARCHAR(50),
+    firmware_version VARCHAR(50),
+    mac_address VARCHAR(17),
+    lhvpn_address VARCHAR(45),
+    connection_status VARCHAR(20),
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE (lighthouse, node_id),
+    FOREIGN KEY (site_uuid) REFERENCES nati_site(site_uuid) ON DELETE SET NULL,
+    INDEX (name),
+    INDEX (serial_number)
+);
+""",
+"""
+CREATE TABLE IF NOT EXISTS opengear_port (
+    node_uuid CHAR(36) NOT NULL,
+    port_id VARCHAR(50) NOT NULL,
+    label VARCHAR(100),
+    mode VARCHAR(30),
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (node_uuid, port_id),
+    FOREIGN KEY (node_uuid) REFERENCES opengear_node(node_uuid) ON DELETE CASCADE,
+    INDEX (label)
+);
+"""
+]
+
+# Parents before children
+TABLES = nati_tables + network_tables + aci_tables + opengear_tables
@@ -0,0 +1,351 @@
+"""
+Sharded collection across processes and hosts.
+
+JSON decoding, DN parsing and CLI output parsing are CPU-bound, so
+threads of one process share a single core. Here the fabrics of
+aci_fabric, the seedlist and the devices of network_device are split
+between worker processes instead: several per host (--processes), in
+several collector containers, or both.
+
+- every item hashes to one of `shards` fixed shards
+- workers register in collector_worker and renew that every
+  lease_ttl / 3 seconds; a consistent-hash ring of the live workers names
+  each shard's owner, so a worker joining or leaving moves only its share
+  of the shards
+- the owner takes the shard's lease in collector_lease before collecting
+  it and gives it back afterwards, so two workers whose views of the ring
+  differ for a moment never collect the same shard
+- finished_at records the last complete collection; a shard is collected
+  again once `interval` seconds have passed
+
+When a worker dies, its registration and any lease it held expire after
+lease_ttl seconds. The ring then drops it and the surviving owners pick
+up its shards on their next pass.
+
+    python -m nati_data.sharding aci --processes 4
+    python -m nati_data.sharding discovery --once
+
+Expiry times are epoch seconds from each worker's clock, so collector
+hosts need synchronised clocks; lease_ttl leaves room for small skew.
+"""
+
+import argparse
+import bisect
+import configparser
+import hashlib
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from contextlib import nullcontext
+
+from nati_data import metrics
+from nati_data.storage import BulkWriter, DEFAULT_CHUNK_SIZE, close_pools, load_db_config
+
+CONFIG_FILE = "nati.ini"
+
+# Points per worker on the ring; more points even out the shares
+DEFAULT_VNODES = 64
+
+
+def load_config(path=CONFIG_FILE):
+    config = configparser.ConfigParser()
+    config.read(path)
+    return {
+        "shards": config.getint("sharding", "shards", fallback=64),
+        "vnodes": config.getint("sharding", "vnodes", fallback=DEFAULT_VNODES),
+        "lease_ttl": config.getint("sharding", "lease_ttl", fallback=120),
+        "interval": config.getint("sharding", "interval", fallback=900),
+        "settle": config.getint("sharding", "settle", fallback=10),
+        "processes": config.getint("sharding", "processes", fallback=1),
+        "batch_size": config.getint("database", "batch_size", fallback=DEFAULT_CHUNK_SIZE),
+    }
+
+
+def ring_hash(value):
+    # Stable across processes and hosts, unlike hash()
+    return int.from_bytes(hashlib.md5(str(value).encode()).digest()[:8], "big")
+
+
+def shard_of(key, shards):
+    return ring_hash(key) % shards
+
+
+class HashRing:
+    """Consistent-hash ring placing each member at `vnodes` points."""
+
+    def __init__(self, members, vnodes=DEFAULT_VNODES):
+        self.points = sorted((ring_hash(f"{member}#{i}"), member) for member in members for i in range(vnodes))
+        self.hashes = [point for point, member in self.points]
+
+    def owner(self, key):
+        if not self.points:
+            return None
+        index = bisect.bisect(self.hashes, ring_hash(key)) % len(self.points)
+        return self.points[index][1]
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class ShardWorker:
+    """One worker's registration and shard leases for collector `kind`."""
+
+    def __init__(self, writer, kind, worker_id, shards=64, lease_ttl=120, vnodes=DEFAULT_VNODES):
+        self.writer = writer
+        self.kind = kind
+        self.worker_id = worker_id
+        self.shards = shards
+        self.lease_ttl = lease_ttl
+        self.vnodes = vnodes
+        self.held = set()
+        self.lock = threading.Lock()
+
+    def register(self):
+        # No-op update: only the lease rows still missing are created
+        self.writer.upsert(
+            "collector_lease", ("kind", "shard"), [(self.kind, shard) for shard in range(self.shards)],
+            keys=("kind", "shard"), update=("shard",), label="collector_lease (created)"
+        )
+        self.heartbeat()
+
+    def heartbeat(self):
+        """Renew the registration and every lease held."""
+        expires_at = time.time() + self.lease_ttl
+        self.writer.upsert(
+            "collector_worker", ("kind", "worker_id", "expires_at"), [(self.kind, self.worker_id, expires_at)],
+            keys=("kind", "worker_id")
+        )
+        with self.lock:
+            if not self.held:
+                return
+        self.writer.execute(
+            "UPDATE collector_lease SET expires_at = %s WHERE kind = %s AND owner = %s",
+            (expires_at, self.kind, self.worker_id)
+        )
+
+    def deregister(self):
+        self.writer.execute(
+            "UPDATE collector_lease SET owner = NULL, expires_at = 0 WHERE kind = %s AND owner = %s",
+            (self.kind, self.worker_id)
+        )
+        self.writer.execute(
+            "DELETE FROM collector_worker WHERE kind = %s AND worker_id = %s", (self.kind, self.worker_id)
+        )
+
+    def members(self):
+        rows = self.writer.query(
+            "SELECT worker_id FROM collector_worker WHERE kind = %s AND expires_at > %s", (self.kind, time.time())
+        )
+        return {row["worker_id"] for row in rows} | {self.worker_id}
+
+    def assigned(self):
+        """Shards the ring of live workers gives this worker."""
+        ring = HashRing(self.members(), self.vnodes)
+        return [shard for shard in range(self.shards) if ring.owner(shard) == self.worker_id]
+
+    def claim(self, shard, due_before):
+        """Lease `shard` if it is free and was last finished before `due_before`."""
+        now = time.time()
+        claimed = self.writer.execute(
+            "UPDATE collector_lease SET owner = %s, expires_at = %s "
+            "WHERE kind = %s AND shard = %s AND finished_at <= %s "
+            "AND (owner IS NULL OR owner = %s OR expires_at < %s)",
+            (self.worker_id, now + self.lease_ttl, self.kind, shard, due_before, self.worker_id, now)
+        ) == 1
+        if claimed:
+            with self.lock:
+                self.held.add(shard)
+        return claimed
+
+    def release(self, shard, finished):
+        finished_sql = ", finished_at = %s" if finished else ""
+        params = (time.time(),) if finished else ()
+        self.writer.execute(
+            f"UPDATE collector_lease SET owner = NULL, expires_at = 0{finished_sql} "
+            "WHERE kind = %s AND shard = %s AND owner = %s",
+            params + (self.kind, shard, self.worker_id)
+        )
+        with self.lock:
+            self.held.discard(shard)
+
+    def run_pass(self, job, due_before, stop_event):
+        """Collect every due shard assigned to this worker; returns the number collected."""
+        self.heartbeat()
+        by_shard = {}
+        for key, item in job.keys().items():
+            by_shard.setdefault(shard_of(key, self.shards), []).append(item)
+        collected = 0
+        for shard in self.assigned():
+            if stop_event.is_set():
+                break
+            items = by_shard.get(shard)
+            if not items or not self.claim(shard, due_before):
+                continue
+            finished = False
+            try:
+                with metrics.span("shard_collect", kind=self.kind):
+                    job.collect(items)
+                finished = True
+                collected += 1
+            except Exception as e:
+                print(f"[!] {self.kind} shard {shard} failed: {e}")
+            finally:
+                self.release(shard, finished)
+        metrics.inc("shards_collected_total", collected, kind=self.kind)
+        return collected
+
+
+class AciShards:
+    """Shards keyed by fabric_uuid, collected with collect_aci_concurrent()."""
+
+    def __init__(self, writer):
+        # cisco_aci reads its configuration on import
+        from nati_data import cisco_aci
+        self.aci = cisco_aci
+        self.writer = writer
+
+    def keys(self):
+        return {fabric['fabric_uuid']: fabric for fabric in self.aci.get_aci_fabrics(self.writer)}
+
+    def collect(self, fabrics):
+        self.aci.collect_aci_concurrent(self.writer, fabrics=fabrics)
+
+    def close(self):
+        self.aci.close_apic_sessions()
+
+
+class DiscoveryShards:
+    """Shards keyed by seedlist entry."""
+
+    def __init__(self, writer):
+        from nati_data import cisco_cli
+        from nati_data.scheduler import CliJobs
+        self.cli = cisco_cli
+        self.jobs = CliJobs()
+
+    def keys(self):
+        return {seed: (seed, site) for seed, site in self.cli.load_seedlist()}
+
+    def collect(self, seed_hosts):
+        self.jobs.run_discovery(seed_hosts)
+
+    def close(self):
+        self.jobs.close()
+
+
+class InterfaceShards:
+    """Shards keyed by network_device.device_uuid."""
+
+    def __init__(self, writer):
+        from nati_data import cisco_interfaces
+        from nati_data.scheduler import CliJobs
+        self.interfaces = cisco_interfaces
+        self.writer = writer
+        self.jobs = CliJobs()
+
+    def keys(self):
+        return {device["device_uuid"]: device for device in self.interfaces.load_devices(self.writer)}
+
+    def collect(self, devices):
+        self.jobs.run_interfaces(devices)
+
+    def close(self):
+        self.jobs.close()
+
+
+SHARDED_JOBS = {
+    "aci": AciShards,
+    "discovery": DiscoveryShards,
+    "interfaces": InterfaceShards,
+}
+
+
+def heartbeat_loop(worker, stop_event):
+    while not stop_event.wait(worker.lease_ttl / 3):
+        try:
+            worker.heartbeat()
+        except Exception as e:
+            print(f"[!] Heartbeat of {worker.worker_id} failed: {e}")
+
+
+def run_worker(kind, settings, once=False, export_metrics=True):
+    """
+    One worker: register, wait `settle` seconds for the other workers to
+    register too, then collect the shards the ring assigns to it, every
+    lease_ttl seconds until stopped (or a single pass with `once`).
+    """
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *args: stop_event.set())
+
+    writer = BulkWriter(load_db_config(path=CONFIG_FILE), chunk_size=settings["batch_size"])
+    job = SHARDED_JOBS[kind](writer)
+    worker = ShardWorker(
+        writer, kind, worker_name(), settings["shards"], settings["lease_ttl"], settings["vnodes"]
+    )
+    worker.register()
+    heartbeat = threading.Thread(target=heartbeat_loop, args=(worker, stop_event), daemon=True)
+    heartbeat.start()
+    start = time.time()
+    try:
+        # Worker processes of one host would all claim the same port and textfile
+        with metrics.collector_run(f"{kind}_shards") if export_metrics else nullcontext():
+            stop_event.wait(settings["settle"])
+            while not stop_event.is_set():
+                # A single pass leaves shards another worker finished during this run alone
+                due_before = start if once else time.time() - settings["interval"]
+                collected = worker.run_pass(job, due_before, stop_event)
+                print(f"[=] {worker.worker_id}: collected {collected} {kind} shards.")
+                if once:
+                    break
+                stop_event.wait(settings["lease_ttl"])
+    finally:
+        stop_event.set()
+        heartbeat.join()
+        worker.deregister()
+        job.close()
+        close_pools()
+
+
+def run_pool(kind, settings, processes, once=False):
+    """Run `processes` workers on this host, each in its own interpreter."""
+    # spawn: no forked database or SSH connections shared with the parent
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(target=run_worker, args=(kind, settings, once, False), name=f"{kind}-{index}")
+        for index in range(processes)
+    ]
+    for process in workers:
+        process.start()
+    # docker stop only signals the parent; pass it on so workers release their leases
+    signal.signal(signal.SIGTERM, lambda *args: [process.terminate() for process in workers])
+    try:
+        for process in workers:
+            process.join()
+    except KeyboardInterrupt:
+        # The workers got the SIGINT too and release their leases
+        for process in workers:
+            process.join()
+
+
+def main():
+    settings = load_config()
+    parser = argparse.ArgumentParser(description="Sharded collection across processes and hosts.")
+    parser.add_argument("kind", choices=sorted(SHARDED_JOBS))
+    parser.add_argument("--processes", type=int, default=settings["processes"],
+                        help="worker processes on this host")
+    parser.add_argument("--once", action="store_true", help="one pass over the assigned shards, then exit")
+    args = parser.parse_args()
+
+    if args.processes > 1:
+        run_pool(args.kind, settings, args.processes, args.once)
+    else:
+        run_worker(args.kind, settings, args.once)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Pool of logged-in Netmiko sessions shared by the CLI collectors.
+
+Sessions are keyed by host and username, so every collector that needs
+the same device reuses one login instead of opening its own. Open
+sessions, idle ones included, are capped per device to stay within the
+device's VTY lines.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from nati_data import metrics
+
+
+def send_command(conn, command):
+    """conn.send_command(command), timed as ssh_command."""
+    with metrics.span("ssh_command", command=command):
+        return conn.send_command(command)
+
+
+class SessionPool:
+    def __init__(self, connect, max_per_device=2, idle_timeout=300, max_idle=64):
+        """
+        `connect(host, username, password)` returns a live Netmiko
+        connection; it returns None or raises when the device cannot be
+        reached or rejects the login.
+        """
+        self.connect = connect
+        self.max_per_device = max_per_device
+        self.idle_timeout = idle_timeout
+        self.max_idle = max_idle
+        self.idle = {}
+        self.open = {}
+        self.cond = threading.Condition()
+
+    @contextmanager
+    def session(self, host, username, password):
+        conn = self.acquire(host, username, password)
+        try:
+            yield conn
+        except Exception:
+            # The session may be mid-command or dead; never hand it out again
+            self.release(host, username, conn, broken=True)
+            raise
+        self.release(host, username, conn)
+
+    def run_commands(self, host, username, password, commands):
+        """Run several commands over one login; returns {command: output}."""
+        with self.session(host, username, password) as conn:
+            return {command: send_command(conn, command) for command in commands}
+
+    def acquire(self, host, username, password):
+        key = (host, username)
+        stale = []
+        with self.cond:
+            stale.extend(self._expired())
+            if stale:
+                self.cond.notify_all()
+            while True:
+                if self.idle.get(key):
+                    conn, last_used = self.idle[key].pop()
+                    break
+                if self.open.get(host, 0) < self.max_per_device:
+                    self.open[host] = self.open.get(host, 0) + 1
+                    conn = None
+                    break
+                # Free a line held by an idle session with another credential
+                victim = self._pop_idle(host)
+                if victim is not None:
+                    stale.append(victim)
+                    conn = None
+                    break
+                self.cond.wait()
+        self._close(stale)
+
+        if conn is not None:
+            if conn.is_alive():
+                return conn
+            self._close([conn])
+        try:
+            conn = self.connect(host, username, password)
+        except Exception as e:
+            # Callers tell a rejected login from an unreachable device by __cause__
+            self._forget(host)
+            raise ConnectionError(f"could not connect to {host}: {e}") from e
+        if conn is None:
+            self._forget(host)
+            raise ConnectionError(f"could not connect to {host}")
+        return conn
+
+    def release(self, host, username, conn, broken=False):
+        if broken:
+            self._close([conn])
+            self._forget(host)
+            return
+        evicted = []
+        with self.cond:
+            self.idle.setdefault((host, username), []).append((conn, time.monotonic()))
+            evicted.extend(self._over_capacity())
+            self.cond.notify_all()
+        self._close(evicted)
+
+    def close_all(self):
+        with self.cond:
+            sessions = [conn for idle in self.idle.values() for conn, last_used in idle]
+            self.idle.clear()
+            self.open.clear()
+            self.cond.notify_all()
+        self._close(sessions)
+
+    def _forget(self, host):
+        with self.cond:
+            self.open[host] -= 1
+            self.cond.notify_all()
+
+    def _pop_idle(self, host):
+        for (idle_host, username), idle in self.idle.items():
+            if idle_host == host and idle:
+                return idle.pop(0)[0]
+        return None
+
+    def _expired(self):
+        """Idle sessions past idle_timeout; the caller holds the lock."""
+        cutoff = time.monotonic() - self.idle_timeout
+        expired = []
+        for (host, username), idle in self.idle.items():
+            while idle and idle[0][1] < cutoff:
+                expired.append(idle.pop(0)[0])
+                self.open[host] -= 1
+        return expired
+
+    def _over_capacity(self):
+        """Oldest idle sessions beyond max_idle; the caller holds the lock."""
+        idle = sorted(
+            ((last_used, key, conn) for key, sessions in self.idle.items() for conn, last_used in sessions),
+            key=lambda item: item[0],
+        )
+        evicted = []
+        for last_used, (host, username), conn in idle[:max(0, len(idle) - self.max_idle)]:
+            self.idle[(host, username)].remove((conn, last_used))
+            self.open[host] -= 1
+            evicted.append(conn)
+        return evicted
+
+    def _close(self, sessions):
+        for conn in sessions:
+            try:
+                conn.disconnect()
+            except Exception:
+                pass
@@ -0,0 +1,617 @@
+"""
+Shared database helpers for the NATI collectors.
+
+BulkWriter writes rows in chunks with multi-row upserts, committing once
+per table per call: every chunk of a call streams through one transaction.
+
+Two backends sit behind the same code path, chosen by [database] type:
+MariaDB/MySQL through pymysql, and SQLite (WAL mode) for edge collectors.
+SQL is written once, MySQL style with %s placeholders; connect() hands
+out SQLite connections that accept it, and the few statements whose
+syntax differs (upserts, composite-key deletes, DDL) are built per dialect.
+
+Connections come from one ConnectionPool per database, shared by every
+writer in the process. Checkouts are health-checked, and transactions
+that fail on lock waits, deadlocks or dropped connections are retried.
+"""
+
+import configparser
+import hashlib
+import random
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+import pymysql
+
+from nati_data import metrics
+
+DEFAULT_CHUNK_SIZE = 1000
+
+CONFIG_FILE = "nati.ini"
+
+MARIADB = "mariadb"
+SQLITE = "sqlite"
+
+# Catch this rather than pymysql.MySQLError so either backend's errors match
+DatabaseError = (pymysql.MySQLError, sqlite3.Error)
+
+DEFAULT_POOL_SIZE = 8
+
+# MariaDB errors worth retrying: lock wait timeout, deadlock, server gone away, lost connection
+TRANSIENT_ERRORS = {1205, 1213, 2006, 2013}
+DISCONNECT_ERRORS = {2006, 2013}
+RETRY_ATTEMPTS = 3
+RETRY_BACKOFF = 0.2
+
+# Connections idle for longer than this are pinged before reuse
+PING_AFTER = 30
+
+# Settings in db_config that are ours rather than the driver's
+POOL_SETTINGS = ("type", "filename", "hosts", "pool_size", "pool_timeout")
+
+
+def chunked(rows, size):
+    """Yield lists of at most `size` items from any iterable."""
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def row_hash(values):
+    """Content hash of a row; None and '' hash alike, as do 1 and '1'."""
+    text = "\x1f".join("" if value is None else str(value) for value in values)
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+
+def db_type(db_config):
+    kind = (db_config.get("type") or MARIADB).lower()
+    return SQLITE if kind == SQLITE else MARIADB
+
+
+def load_db_config(section="database", path=CONFIG_FILE):
+    """Connection settings for connect() from a nati.ini section."""
+    config = configparser.ConfigParser()
+    config.read(path)
+    db = config[section]
+    pool = {
+        "pool_size": db.getint("pool_size", DEFAULT_POOL_SIZE),
+        "pool_timeout": db.getfloat("pool_timeout", 30.0)
+    }
+    if db_type(db) == SQLITE:
+        return {"type": SQLITE, "filename": db.get("filename", "nati.db"), **pool}
+    return {
+        **pool,
+        "type": MARIADB,
+        # `hosts` lists servers to pick from; connect() takes a reachable one
+        "host": db.get("host"),
+        "hosts": db.get("hosts"),
+        "port": int(db["port"]),
+        "user": db["username"],
+        "password": db["password"],
+        "database": db["database"],
+        "cursorclass": pymysql.cursors.DictCursor
+    }
+
+
+def get_workers(config, section, option, fallback):
+    """A worker count from nati.ini; below 1 a scheduler would never start a task."""
+    workers = config.getint(section, option, fallback=fallback)
+    if workers < 1:
+        raise ValueError(f"[{section}] {option} must be at least 1, not {workers}")
+    return workers
+
+
+FORMAT_PLACEHOLDER = re.compile(r"%([s%])")
+
+
+def qmark(sql):
+    """Rewrite %s placeholders (and %% escapes) for sqlite3."""
+    return FORMAT_PLACEHOLDER.sub(lambda match: "?" if match.group(1) == "s" else "%", sql)
+
+
+def dict_factory(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+class SQLiteCursor:
+    """sqlite3 cursor taking %s placeholders and usable as a context manager, like pymysql's."""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def rowcount(self):
+        return self.cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self.cursor.lastrowid
+
+    def execute(self, sql, params=None):
+        self.cursor.execute(qmark(sql), params or ())
+        return self.cursor.rowcount
+
+    def executemany(self, sql, rows):
+        self.cursor.executemany(qmark(sql), rows)
+        return self.cursor.rowcount
+
+    def fetchone(self):
+        return self.cursor.fetchone()
+
+    def fetchmany(self, size):
+        return self.cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    def close(self):
+        self.cursor.close()
+
+
+class SQLiteConnection:
+    """SQLite database in WAL mode whose rows come back as dicts, like DictCursor's."""
+
+    def __init__(self, filename, timeout=30):
+        self.conn = sqlite3.connect(filename, timeout=timeout, check_same_thread=False)
+        self.conn.row_factory = dict_factory
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.open = True
+
+    def cursor(self):
+        return SQLiteCursor(self.conn.cursor())
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    def ping(self, reconnect=False):
+        self.conn.execute("SELECT 1")
+
+    def close(self):
+        self.conn.close()
+        self.open = False
+
+
+def connect(db_config):
+    """DB-API connection for `db_config`; both backends take %s placeholders."""
+    if db_type(db_config) == SQLITE:
+        return SQLiteConnection(db_config.get("filename") or "nati.db")
+    settings = {key: value for key, value in db_config.items() if key not in POOL_SETTINGS}
+    hosts = db_config.get("hosts")
+    if not hosts:
+        return pymysql.connect(**settings)
+    return connect_any(settings, hosts)
+
+
+def connect_any(settings, hosts):
+    """Connection to one of the servers in `hosts`, tried in random order until one answers."""
+    candidates = [host for host in re.split(r"[,\s]+", hosts) if host]
+    random.shuffle(candidates)
+    error = None
+    for host in candidates:
+        try:
+            return pymysql.connect(**dict(settings, host=host))
+        except pymysql.err.OperationalError as e:
+            print(f"[!] Database server {host} unreachable: {e}")
+            error = e
+    raise error
+
+
+def error_code(error):
+    return error.args[0] if error.args and isinstance(error.args[0], int) else None
+
+
+def is_transient(error):
+    if isinstance(error, sqlite3.OperationalError):
+        return "locked" in str(error) or "busy" in str(error)
+    return error_code(error) in TRANSIENT_ERRORS
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of at most `max_size` connections to one database.
+    A checkout waits up to `timeout` seconds for a free connection.
+    """
+
+    def __init__(self, db_config, max_size=DEFAULT_POOL_SIZE, timeout=30.0):
+        self.db_config = db_config
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle = []
+        self.size = 0
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self.cond:
+            while not self.idle and self.size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"no free database connection after {self.timeout}s")
+                self.cond.wait(remaining)
+            if self.idle:
+                conn, released_at = self.idle.pop()
+            else:
+                self.size += 1
+                conn = None
+        if conn is not None and time.monotonic() - released_at > PING_AFTER:
+            try:
+                conn.ping(reconnect=False)
+            except Exception:
+                self._discard(conn)
+                conn = None
+                with self.cond:
+                    self.size += 1
+        if conn is None:
+            try:
+                conn = connect(self.db_config)
+            except Exception:
+                self._forget()
+                raise
+        return conn
+
+    def release(self, conn, broken=False):
+        if broken:
+            self._discard(conn)
+            return
+        with self.cond:
+            self.idle.append((conn, time.monotonic()))
+            self.cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except DatabaseError as e:
+            self.release(conn, broken=error_code(e) in DISCONNECT_ERRORS)
+            raise
+        except BaseException:
+            self.release(conn)
+            raise
+        self.release(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Cursor on a pooled connection; commits on success, rolls back on error."""
+        with self.connection() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    yield cursor
+                conn.commit()
+            except BaseException as e:
+                if not (isinstance(e, DatabaseError) and error_code(e) in DISCONNECT_ERRORS):
+                    conn.rollback()
+                raise
+
+    def run(self, work, attempts=RETRY_ATTEMPTS):
+        """
+        Return work(cursor), run in its own transaction. Lock waits,
+        deadlocks and lost connections roll back and run it again.
+        """
+        for attempt in range(attempts):
+            try:
+                with self.transaction() as cursor:
+                    return work(cursor)
+            except DatabaseError as e:
+                if attempt == attempts - 1 or not is_transient(e):
+                    raise
+                metrics.inc("db_retries_total")
+                print(f"[!] Retrying transaction after transient error: {e}")
+                time.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+    def close_all(self):
+        with self.cond:
+            idle = [conn for conn, released_at in self.idle]
+            self.idle.clear()
+            self.size -= len(idle)
+            self.cond.notify_all()
+        for conn in idle:
+            conn.close()
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._forget()
+
+    def _forget(self):
+        with self.cond:
+            self.size -= 1
+            self.cond.notify()
+
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+def get_pool(db_config):
+    """The process-wide pool for the database `db_config` points at."""
+    key = tuple(sorted((name, str(value)) for name, value in db_config.items()))
+    with pools_lock:
+        if key not in pools:
+            pools[key] = ConnectionPool(
+                db_config,
+                max_size=int(db_config.get("pool_size") or DEFAULT_POOL_SIZE),
+                timeout=float(db_config.get("pool_timeout") or 30.0),
+            )
+        return pools[key]
+
+
+def close_pools():
+    with pools_lock:
+        for pool in pools.values():
+            pool.close_all()
+
+
+def transaction(db_config):
+    """Context-managed transaction on a pooled connection to `db_config`; yields a cursor."""
+    return get_pool(db_config).transaction()
+
+
+def build_upsert(table, columns, keys, update=None, dialect=MARIADB):
+    if update is None:
+        update = [column for column in columns if column not in keys]
+    placeholders = ", ".join(["%s"] * len(columns))
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+    if dialect == SQLITE:
+        if update:
+            assignments = ", ".join(f"{column}=excluded.{column}" for column in update)
+            sql += f" ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {assignments}"
+        else:
+            sql += f" ON CONFLICT ({', '.join(keys)}) DO NOTHING"
+    elif update:
+        assignments = ", ".join(f"{column}=VALUES({column})" for column in update)
+        sql += f" ON DUPLICATE KEY UPDATE {assignments}"
+    return sql
+
+
+def build_in(keys, count, dialect=MARIADB):
+    """Condition matching `count` rows on `keys`; SQLite wants a VALUES list for row values."""
+    if len(keys) == 1:
+        return f"{keys[0]} IN ({', '.join(['%s'] * count)})"
+    row = f"({', '.join(['%s'] * len(keys))})"
+    rows = ", ".join([row] * count)
+    if dialect == SQLITE:
+        rows = f"VALUES {rows}"
+    return f"({', '.join(keys)}) IN ({rows})"
+
+
+def build_delete_in(table, keys, count, dialect=MARIADB):
+    """DELETE of `count` rows matched on `keys`."""
+    return f"DELETE FROM {table} WHERE {build_in(keys, count, dialect)}"
+
+
+CREATE_TABLE = re.compile(r"^\s*(CREATE TABLE IF NOT EXISTS (\w+)\s*)\((.*)\)\s*;?\s*$", re.S)
+ON_UPDATE_TIMESTAMP = re.compile(r"(\w+)( TIMESTAMP[^,]*?) ON UPDATE CURRENT_TIMESTAMP")
+ENUM_TYPE = re.compile(r"\bENUM\s*\(.*?\)", re.S)
+TABLE_CONSTRAINT = re.compile(r"^(PRIMARY KEY|UNIQUE|FOREIGN KEY|CONSTRAINT|CHECK)\b", re.I)
+INDEX_CLAUSE = re.compile(r"^(?:INDEX|KEY)\s*(?:\w+\s*)?\(([^)]*)\)$", re.I)
+
+
+def split_definitions(body):
+    """Split a CREATE TABLE body on its top-level commas."""
+    items = []
+    depth = 0
+    current = ""
+    for char in body:
+        if char == "," and depth == 0:
+            items.append(current.strip())
+            current = ""
+            continue
+        depth += (char == "(") - (char == ")")
+        current += char
+    if current.strip():
+        items.append(current.strip())
+    return items
+
+
+def translate_ddl(sql, dialect=MARIADB):
+    """
+    Statements creating the table in `sql` (MariaDB DDL) on `dialect`.
+    For SQLite, ENUMs become TEXT, ON UPDATE CURRENT_TIMESTAMP becomes a
+    trigger, columns are moved ahead of table constraints and inline INDEX
+    clauses become CREATE INDEX statements.
+    """
+    if dialect != SQLITE:
+        return [sql]
+    head, table, body = CREATE_TABLE.match(sql).groups()
+    touch = ON_UPDATE_TIMESTAMP.search(body)
+    body = ON_UPDATE_TIMESTAMP.sub(r"\1\2", ENUM_TYPE.sub("TEXT", body))
+    columns, constraints, indexes = [], [], []
+    for item in split_definitions(body):
+        index = INDEX_CLAUSE.match(item)
+        if index:
+            indexes.append([column.strip() for column in index.group(1).split(",")])
+        elif TABLE_CONSTRAINT.match(item):
+            constraints.append(item)
+        else:
+            columns.append(item)
+    definitions = ",\n    ".join(columns + constraints)
+    statements = [f"{head.strip()} (\n    {definitions}\n)"]
+    for index_columns in indexes:
+        statements.append(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_{'_'.join(index_columns)} "
+            f"ON {table} ({', '.join(index_columns)})"
+        )
+    if touch:
+        column = touch.group(1)
+        statements.append(
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_{column} AFTER UPDATE ON {table} "
+            f"FOR EACH ROW WHEN NEW.{column} = OLD.{column} BEGIN "
+            f"UPDATE {table} SET {column} = CURRENT_TIMESTAMP WHERE rowid = NEW.rowid; END"
+        )
+    return statements
+
+
+def retry_attempts(rows):
+    """Attempts ConnectionPool.run() may make for a write of `rows`; an iterator cannot be replayed."""
+    return RETRY_ATTEMPTS if isinstance(rows, (list, tuple)) else 1
+
+
+class BulkWriter:
+    """
+    Bulk writes for one collection run. Every call checks a connection out
+    of the shared pool for the duration of its transaction, so a writer
+    can be used from several threads.
+    """
+
+    def __init__(self, db_config, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.db_config = db_config
+        self.dialect = db_type(db_config)
+        self.chunk_size = chunk_size
+        self.pool = get_pool(db_config)
+        self.stats = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """Connections belong to the pool; see close_pools()."""
+
+    def transaction(self):
+        return self.pool.transaction()
+
+    def execute(self, sql, params=None):
+        """Run one statement in its own transaction; returns the affected row count."""
+        def work(cursor):
+            cursor.execute(sql, params)
+            return cursor.rowcount
+        return self.pool.run(work)
+
+    def query(self, sql, params=None):
+        def work(cursor):
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+        return self.pool.run(work)
+
+    def iter_query(self, sql, params=None):
+        """Rows of `sql`, fetched `chunk_size` at a time instead of all at once."""
+        with self.pool.transaction() as cursor:
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(self.chunk_size)
+                if not rows:
+                    return
+                yield from rows
+
+    def changed_rows(self, cursor, table, columns, keys, where, chunk):
+        """
+        The rows of `chunk` whose stored row (among those matching the
+        {column: value} filter `where`) has different content or is missing.
+        Only the chunk's own keys are read back, so the cost follows the
+        rows written rather than the size of the table.
+        """
+        key_index = [columns.index(key) for key in keys]
+        chunk_keys = [tuple(row[i] for i in key_index) for row in chunk]
+        clause = " AND ".join(f"{column} = %s" for column in where)
+        cursor.execute(
+            f"SELECT {', '.join(columns)} FROM {table} "
+            f"WHERE {clause} AND {build_in(keys, len(chunk_keys), self.dialect)}",
+            (*where.values(), *(value for key in chunk_keys for value in key))
+        )
+        stored = {
+            tuple(row[key] for key in keys): row_hash(row[column] for column in columns)
+            for row in cursor.fetchall()
+        }
+        return [row for key, row in zip(chunk_keys, chunk) if stored.get(key) != row_hash(row)]
+
+    def upsert(self, table, columns, rows, keys, update=None, label=None, skip_unchanged=None, then=()):
+        """
+        Upsert `rows` (tuples ordered like `columns`) in chunks of
+        `chunk_size`, all in one transaction. Returns the number of rows
+        written.
+
+        `skip_unchanged` is an optional {column: value} filter selecting the
+        stored rows to compare against; rows whose content is unchanged are
+        not written at all.
+
+        `then` holds (sql, params) statements run in the same transaction
+        after the last chunk, e.g. a DELETE of rows that were not upserted.
+        """
+        sql = build_upsert(table, columns, keys, update, self.dialect)
+        select = None
+        if skip_unchanged:
+            def select(cursor, chunk):
+                return self.changed_rows(cursor, table, columns, keys, skip_unchanged, chunk)
+        return self.execute_batches(sql, rows, label or table, then=then, select=select)
+
+    def delete(self, table, keys, rows, label=None):
+        """
+        Delete the rows whose `keys` match each tuple in `rows`, with one
+        DELETE ... IN statement per chunk, all in one transaction.
+        """
+        start = time.perf_counter()
+        label = label or f"{table} (deleted)"
+
+        def work(cursor):
+            count = 0
+            for chunk in chunked(rows, self.chunk_size):
+                params = [value for row in chunk for value in row]
+                with metrics.span("db_write", table=label):
+                    cursor.execute(build_delete_in(table, keys, len(chunk), self.dialect), params)
+                count += len(chunk)
+            return count
+
+        count = self.pool.run(work, retry_attempts(rows))
+        self.record(label, count, time.perf_counter() - start)
+        return count
+
+    def execute_batches(self, sql, rows, label, start=None, then=(), select=None):
+        """
+        executemany() `sql` over `rows` one chunk at a time, then run the
+        `then` statements, all in one transaction; only the current chunk
+        is held in memory. `select(cursor, chunk)`, if given, picks the
+        rows of each chunk to write. A transient error replays the whole
+        call when `rows` is a list or tuple. An iterator is spent by then,
+        so its error is raised and the next run writes the rows again.
+        """
+        start = start or time.perf_counter()
+
+        def work(cursor):
+            count = 0
+            for chunk in chunked(rows, self.chunk_size):
+                with metrics.span("db_write", table=label):
+                    if select:
+                        chunk = select(cursor, chunk)
+                    if chunk:
+                        cursor.executemany(sql, chunk)
+                count += len(chunk)
+            for statement, params in then:
+                cursor.execute(statement, params)
+            return count
+
+        count = self.pool.run(work, retry_attempts(rows))
+        self.record(label, count, time.perf_counter() - start)
+        return count
+
+    def record(self, label, count, elapsed):
+        metrics.inc("db_rows_total", count, table=label)
+        total_rows, total_time = self.stats.get(label, (0, 0.0))
+        self.stats[label] = (total_rows + count, total_time + elapsed)
+
+    def report(self):
+        for label, (count, elapsed) in self.stats.items():
+            rate = count / elapsed if elapsed > 0 else 0.0
+            print(f"[=] {label}: {count} rows in {elapsed:.2f}s ({rate:.0f} rows/s)")
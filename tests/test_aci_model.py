@@ -0,0 +1,40 @@
+"""
+ACI MOs decoded into the named tuples of nati_data.aci_model.
+"""
+
+from nati_data import aci_model
+
+
+def relation(class_name, target):
+    return [{class_name: {"attributes": {"tDn": target}}}]
+
+
+def test_dn_parts_share_interned_parents():
+    first = aci_model.dn_parts("uni/tn-common/ap-app/epg-web")
+    second = aci_model.dn_parts("uni/tn-common/ap-app/epg-db")
+    assert first == ("uni", "tn-common", "ap-app", "epg-web")
+    assert all(a is b for a, b in zip(first[:3], second[:3]))
+
+
+def test_epg_and_bd_references_in_their_tenant():
+    epg = aci_model.epg_info(
+        {"dn": "uni/tn-t1/ap-a1/epg-e1", "name": "e1"}, relation("fvRsBd", "uni/tn-t1/BD-b1")
+    )
+    assert epg == aci_model.Epg("epg-e1", "e1", "tn-t1", "ap-a1", "", "BD-b1")
+    bd = aci_model.bd_info({"dn": "uni/tn-t1/BD-b1", "name": "b1"}, relation("fvRsCtx", "uni/tn-t1/ctx-v1"))
+    assert bd == aci_model.Bd("BD-b1", "b1", "tn-t1", "", "ctx-v1")
+
+
+def test_references_outside_the_tenant_are_dropped():
+    # Resolved from tenant common: the tables have no row to reference in tn-t1
+    bd = aci_model.bd_info({"dn": "uni/tn-t1/BD-b1", "name": "b1"}, relation("fvRsCtx", "uni/tn-common/ctx-v1"))
+    assert bd.vrf is None
+    epg = aci_model.epg_info(
+        {"dn": "uni/tn-t1/ap-a1/epg-e1", "name": "e1"}, relation("fvRsBd", "uni/tn-common/BD-default")
+    )
+    assert epg.bd is None
+
+
+def test_missing_references_are_none():
+    assert aci_model.bd_info({"dn": "uni/tn-t1/BD-b1", "name": "b1"}).vrf is None
+    assert aci_model.epg_info({"dn": "uni/tn-t1/ap-a1/epg-e1", "name": "e1"}, relation("fvRsBd", "")).bd is None
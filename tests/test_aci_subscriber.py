@@ -0,0 +1,285 @@
+"""
+FabricSubscriber against a fake APIC session and event websocket:
+subscribe, refresh (also while the resync runs) and event handling.
+"""
+
+import json
+import queue
+import threading
+import time
+
+import pytest
+
+websocket = pytest.importorskip("websocket")
+
+FABRIC = {"fabric_uuid": "3f1c6a52-3d4e-4a5b-9c0d-1e2f3a4b5c6d", "fabric_name": "lab", "host": "apic.lab"}
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.messages = queue.Queue()
+        self.closed = False
+
+    def send_event(self, class_name, **attributes):
+        self.messages.put(json.dumps({"imdata": [{class_name: {"attributes": attributes}}]}))
+
+    def recv(self):
+        if self.closed:
+            raise websocket.WebSocketConnectionClosedException("closed")
+        try:
+            return self.messages.get(timeout=0.05)
+        except queue.Empty:
+            raise websocket.WebSocketTimeoutException("timed out")
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    """The ApicSession calls FabricSubscriber makes; MOs it re-reads come from `mos` (dn -> class, body)."""
+
+    def __init__(self, fail_refreshes=0):
+        self.sockets = []
+        self.subscribed = []
+        self.refreshes = []
+        self.fail_refreshes = fail_refreshes
+        self.mos = {}
+
+    def open_websocket(self, timeout=None):
+        self.sockets.append(FakeWebSocket())
+        return self.sockets[-1]
+
+    def subscribe(self, class_name):
+        self.subscribed.append(class_name)
+        return f"sub-{class_name}"
+
+    def refresh_subscription(self, subscription_id):
+        if self.fail_refreshes:
+            self.fail_refreshes -= 1
+            raise ConnectionError("subscription refresh rejected")
+        self.refreshes.append((time.monotonic(), subscription_id))
+
+    def get(self, path, params=None):
+        dn = path[len("/api/node/mo/"):-len(".json")]
+        if dn not in self.mos:
+            return {"imdata": []}
+        class_name, body = self.mos[dn]
+        if not (params or {}).get("rsp-subtree"):
+            body = {"attributes": body["attributes"]}
+        return {"imdata": [{class_name: body}]}
+
+
+class FakeWriter:
+    """Records writes; `stored` maps table -> rows iter_query() returns."""
+
+    def __init__(self, *args, **kwargs):
+        self.upserts = []
+        self.deletes = []
+        self.stored = {}
+
+    def iter_query(self, sql, params=None):
+        table = sql.split(" FROM ")[1].split()[0]
+        return iter(self.stored.get(table, []))
+
+    def upsert(self, table, columns, rows, keys, **kwargs):
+        self.upserts.append((table, list(rows)))
+
+    def delete(self, table, keys, rows, label=None):
+        self.deletes.append((table, list(rows)))
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def subscriber_module(tmp_path, monkeypatch):
+    # cisco_aci reads nati.ini from the working directory when imported
+    (tmp_path / "nati.ini").write_text(f"[database]\ntype = sqlite\nfilename = {tmp_path / 'nati.db'}\n")
+    monkeypatch.chdir(tmp_path)
+    from nati_data import aci_subscriber
+    monkeypatch.setattr(aci_subscriber, "BulkWriter", FakeWriter)
+    monkeypatch.setattr(aci_subscriber, "refresh_interval", 0.05)
+    return aci_subscriber
+
+
+def make_subscriber(module, monkeypatch, session, tasks=None):
+    monkeypatch.setattr(module.cisco_aci, "get_apic_session", lambda host: session)
+    monkeypatch.setattr(module.cisco_aci, "aci_tasks", lambda: tasks or {})
+    return module.FabricSubscriber(FABRIC, threading.Event())
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_subscriptions_are_refreshed_while_resync_runs(subscriber_module, monkeypatch):
+    session = FakeSession()
+    resync_ended = []
+
+    def slow_fetch(fabric, sync):
+        # A resync outlasting several refresh intervals
+        time.sleep(0.4)
+        return iter(())
+
+    def insert(writer, infos, fabric_uuid):
+        list(infos)
+        resync_ended.append(time.monotonic())
+
+    subscriber = make_subscriber(subscriber_module, monkeypatch, session, {"fvTenant": (slow_fetch, insert)})
+    subscriber.connect()
+    try:
+        assert sorted(session.subscribed) == sorted(subscriber_module.SUBSCRIBED_CLASSES)
+        during_resync = {sid for at, sid in session.refreshes if at < resync_ended[0]}
+        assert during_resync == set(subscriber.subscriptions)
+    finally:
+        subscriber.disconnect()
+    count = len(session.refreshes)
+    time.sleep(0.15)
+    assert len(session.refreshes) == count, "refresh thread outlived the connection"
+
+
+def epg_mo(name, descr, bd_name):
+    return "fvAEPg", {
+        "attributes": {"dn": f"uni/tn-t1/ap-a1/epg-{name}", "name": name, "descr": descr},
+        "children": [{"fvRsBd": {"attributes": {"tnFvBDName": bd_name, "tDn": f"uni/tn-t1/BD-{bd_name}"}}}],
+    }
+
+
+def bd_mo(name, vrf_dn):
+    return "fvBD", {
+        "attributes": {"dn": f"uni/tn-t1/BD-{name}", "name": name},
+        "children": [{"fvRsCtx": {"attributes": {"tDn": vrf_dn}}}],
+    }
+
+
+def test_resync_deletes_objects_gone_while_disconnected(subscriber_module, monkeypatch):
+    from nati_data.aci_model import ap_info, epg_info, tenant_info
+
+    def fetch_tenants(fabric, sync):
+        yield tenant_info({"dn": "uni/tn-t1", "name": "t1"})
+
+    def fetch_epgs(fabric, sync):
+        yield epg_info({"dn": "uni/tn-t1/ap-a1/epg-e1", "name": "e1"})
+
+    def fetch_aps(fabric, sync):
+        # An empty class is never pruned
+        return iter(())
+
+    def insert(writer, infos, fabric_uuid):
+        list(infos)
+
+    session = FakeSession()
+    tasks = {"fvTenant": (fetch_tenants, insert), "fvAp": (fetch_aps, insert), "fvAEPg": (fetch_epgs, insert)}
+    subscriber = make_subscriber(subscriber_module, monkeypatch, session, tasks)
+    writer = subscriber.writer
+    writer.stored = {
+        "aci_tenant": [{"tenant_id": "tn-t1"}, {"tenant_id": "tn-gone"}],
+        "aci_ap": [{"tenant_id": "tn-t1", "ap_id": "ap-a1"}],
+        "aci_epg": [
+            {"tenant_id": "tn-t1", "ap_id": "ap-a1", "epg_id": "epg-e1"},
+            {"tenant_id": "tn-t1", "ap_id": "ap-a1", "epg_id": "epg-gone"},
+        ],
+    }
+    subscriber.connect()
+    subscriber.disconnect()
+
+    fabric_uuid = FABRIC["fabric_uuid"]
+    assert writer.deletes == [
+        ("aci_epg", [(fabric_uuid, "tn-t1", "ap-a1", "epg-gone")]),
+        ("aci_tenant", [(fabric_uuid, "tn-gone")]),
+    ]
+
+
+def test_events_are_applied(subscriber_module, monkeypatch):
+    session = FakeSession()
+    session.mos["uni/tn-t1/ap-a1/epg-e1"] = epg_mo("e1", "web tier", "b1")
+    subscriber = make_subscriber(subscriber_module, monkeypatch, session)
+    thread = threading.Thread(target=subscriber.run)
+    thread.start()
+    try:
+        wait_for(lambda: session.sockets)
+        ws = session.sockets[0]
+        ws.send_event("fvTenant", dn="uni/tn-t1", name="t1", status="created")
+        # Modified events only carry the changed attributes; the MO is fetched
+        ws.send_event("fvAEPg", dn="uni/tn-t1/ap-a1/epg-e1", descr="web tier", status="modified")
+        ws.send_event("fvBD", dn="uni/tn-t1/BD-b1", status="deleted")
+        ws.send_event("faultInst", dn="uni/tn-t1/fault-F0001", status="created")
+        writer = subscriber.writer
+        wait_for(lambda: len(writer.upserts) == 2 and writer.deletes)
+    finally:
+        subscriber.stop_event.set()
+        thread.join()
+
+    fabric_uuid = FABRIC["fabric_uuid"]
+    tables = dict(writer.upserts)
+    assert tables["aci_tenant"] == [(fabric_uuid, "tn-t1", "uni/tn-t1", "t1", "")]
+    assert tables["aci_epg"] == [(fabric_uuid, "epg-e1", "e1", "tn-t1", "ap-a1", "web tier", "BD-b1")]
+    assert writer.deletes == [("aci_bd", [(fabric_uuid, "tn-t1", "BD-b1")])]
+
+
+def test_epg_rows_carry_their_bd(subscriber_module, monkeypatch):
+    session = FakeSession()
+    session.mos["uni/tn-t1/ap-a1/epg-e2"] = epg_mo("e2", "", "b2")
+    subscriber = make_subscriber(subscriber_module, monkeypatch, session)
+    thread = threading.Thread(target=subscriber.run)
+    thread.start()
+    try:
+        wait_for(lambda: session.sockets)
+        ws = session.sockets[0]
+        # A created event carries no children, so the EPG is read back with its fvRsBd
+        ws.send_event("fvAEPg", dn="uni/tn-t1/ap-a1/epg-e2", name="e2", status="created")
+        writer = subscriber.writer
+        wait_for(lambda: len(writer.upserts) == 1)
+        # Binding the EPG to another BD only changes its fvRsBd child
+        session.mos["uni/tn-t1/ap-a1/epg-e2"] = epg_mo("e2", "", "b3")
+        ws.send_event("fvRsBd", dn="uni/tn-t1/ap-a1/epg-e2/rsbd", tDn="uni/tn-t1/BD-b3", status="modified")
+        wait_for(lambda: len(writer.upserts) == 2)
+    finally:
+        subscriber.stop_event.set()
+        thread.join()
+
+    assert [rows[0][-1] for table, rows in writer.upserts] == ["BD-b2", "BD-b3"]
+
+
+def test_bd_rows_carry_their_vrf(subscriber_module, monkeypatch):
+    session = FakeSession()
+    session.mos["uni/tn-t1/BD-b1"] = bd_mo("b1", "uni/tn-t1/ctx-v1")
+    # A VRF from tenant common cannot be referenced from tn-t1's rows
+    session.mos["uni/tn-t1/BD-b2"] = bd_mo("b2", "uni/tn-common/ctx-default")
+    subscriber = make_subscriber(subscriber_module, monkeypatch, session)
+    thread = threading.Thread(target=subscriber.run)
+    thread.start()
+    try:
+        wait_for(lambda: session.sockets)
+        ws = session.sockets[0]
+        ws.send_event("fvBD", dn="uni/tn-t1/BD-b1", name="b1", status="created")
+        ws.send_event("fvRsCtx", dn="uni/tn-t1/BD-b2/rsctx", tnFvCtxName="", status="modified")
+        writer = subscriber.writer
+        wait_for(lambda: len(writer.upserts) == 2)
+    finally:
+        subscriber.stop_event.set()
+        thread.join()
+
+    fabric_uuid = FABRIC["fabric_uuid"]
+    assert writer.upserts == [
+        ("aci_bd", [(fabric_uuid, "BD-b1", "b1", "tn-t1", "", "ctx-v1")]),
+        ("aci_bd", [(fabric_uuid, "BD-b2", "b2", "tn-t1", "", None)]),
+    ]
+
+
+def test_failed_refresh_reconnects(subscriber_module, monkeypatch):
+    session = FakeSession(fail_refreshes=1)
+    subscriber = make_subscriber(subscriber_module, monkeypatch, session)
+    thread = threading.Thread(target=subscriber.run)
+    thread.start()
+    try:
+        # The failed refresh closes the socket; run() backs off a second and subscribes again
+        wait_for(lambda: len(session.sockets) == 2)
+        assert session.sockets[0].closed
+        assert session.subscribed.count("fvTenant") == 2
+    finally:
+        subscriber.stop_event.set()
+        thread.join()
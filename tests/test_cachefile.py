@@ -0,0 +1,41 @@
+"""
+Atomic saves of the on-disk caches, from many threads at once.
+"""
+
+import threading
+
+from nati_data.cachefile import load_json, save_json
+from nati_data.resolver import DnsCache
+
+
+def test_concurrent_saves_leave_one_complete_file(tmp_path):
+    path = str(tmp_path / "dns_cache.json")
+    cache = DnsCache(path)
+    errors = []
+
+    def resolve_and_save(worker):
+        for seed in range(50):
+            cache.put(f"host-{worker}-{seed}", "192.0.2.1", f"host-{worker}-{seed}.example.net")
+            try:
+                cache.save()
+            except OSError as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=resolve_and_save, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert [entry.name for entry in tmp_path.iterdir()] == ["dns_cache.json"]
+    assert len(DnsCache(path).entries) == 400
+
+
+def test_unreadable_files_load_as_none(tmp_path):
+    path = tmp_path / "cache.json"
+    assert load_json(str(path), "cache") is None
+    path.write_text('{"truncated": ')
+    assert load_json(str(path), "cache") is None
+    save_json(str(path), {"complete": True})
+    assert load_json(str(path), "cache") == {"complete": True}
@@ -0,0 +1,117 @@
+"""
+insert_aci_hierarchy on subtree streams: rows are written while the
+stream is still being read, and never before the rows they reference.
+Also the worker counts load_config() accepts.
+"""
+
+import pytest
+
+from nati_data.aci_model import ap_info, bd_info, epg_info, tenant_info, vrf_info
+
+FABRIC_UUID = "3f1c6a52-3d4e-4a5b-9c0d-1e2f3a4b5c6d"
+
+
+@pytest.fixture
+def cisco_aci(tmp_path, monkeypatch):
+    # cisco_aci reads nati.ini from the working directory when imported
+    (tmp_path / "nati.ini").write_text(f"[database]\ntype = sqlite\nfilename = {tmp_path / 'nati.db'}\n")
+    monkeypatch.chdir(tmp_path)
+    from nati_data import cisco_aci
+    return cisco_aci
+
+
+def relation(class_name, tdn):
+    return [{class_name: {"attributes": {"tDn": tdn}}}]
+
+
+def tenant(name):
+    return "fvTenant", tenant_info({"dn": f"uni/tn-{name}", "name": name})
+
+
+def vrf(tn, name):
+    return "fvCtx", vrf_info({"dn": f"uni/tn-{tn}/ctx-{name}", "name": name})
+
+
+def ap(tn, name):
+    return "fvAp", ap_info({"dn": f"uni/tn-{tn}/ap-{name}", "name": name})
+
+
+def bd(tn, name, vrf_name):
+    children = relation("fvRsCtx", f"uni/tn-{tn}/ctx-{vrf_name}")
+    return "fvBD", bd_info({"dn": f"uni/tn-{tn}/BD-{name}", "name": name}, children)
+
+
+def epg(tn, ap_name, name):
+    return "fvAEPg", epg_info({"dn": f"uni/tn-{tn}/ap-{ap_name}/epg-{name}", "name": name})
+
+
+class Recorder:
+    """Stands in for the per-class inserts; records each write and how much of the stream was read."""
+
+    def __init__(self, cisco_aci, monkeypatch, items):
+        self.cisco_aci = cisco_aci
+        self.items = items
+        self.consumed = 0
+        self.writes = []
+        for class_name, (fetch, insert) in cisco_aci.ACI_CLASSES.items():
+            monkeypatch.setitem(cisco_aci.ACI_CLASSES, class_name, (fetch, self.insert(class_name)))
+
+    def stream(self):
+        for item in self.items:
+            self.consumed += 1
+            yield item
+
+    def insert(self, class_name):
+        def insert(writer, infos, fabric_uuid):
+            keys = [self.cisco_aci.INFO_KEYS[class_name](info) for info in infos]
+            self.writes.append((class_name, keys, self.consumed))
+        return insert
+
+    def written(self):
+        return [(class_name, key) for class_name, keys, _ in self.writes for key in keys]
+
+
+def test_rows_follow_the_rows_they_reference(cisco_aci, monkeypatch):
+    items = [
+        tenant("a"), ap("a", "app"), epg("a", "app", "web"), bd("a", "web", "prod"), vrf("a", "prod"),
+        # b's EPG and AP arrive ahead of their tenant
+        epg("b", "app", "db"), ap("b", "app"), tenant("b"),
+    ]
+    recorder = Recorder(cisco_aci, monkeypatch, items)
+    cisco_aci.insert_aci_hierarchy(None, recorder.stream(), FABRIC_UUID)
+
+    written = recorder.written()
+    assert sorted(written) == sorted((class_name, cisco_aci.INFO_KEYS[class_name](info)) for class_name, info in items)
+    for class_name, info in items:
+        row = written.index((class_name, cisco_aci.INFO_KEYS[class_name](info)))
+        for parent in cisco_aci.referenced_rows(class_name, info):
+            assert written.index(parent) < row
+
+
+def test_rows_are_written_while_the_stream_is_read(cisco_aci, monkeypatch):
+    monkeypatch.setattr(cisco_aci, "batch_size", 2)
+    items = [tenant(f"t{i}") for i in range(10)] + [vrf(f"t{i}", "prod") for i in range(10)]
+    recorder = Recorder(cisco_aci, monkeypatch, items)
+    cisco_aci.insert_aci_hierarchy(None, recorder.stream(), FABRIC_UUID)
+
+    assert len(recorder.written()) == len(items)
+    assert all(len(keys) <= 2 for _, keys, _ in recorder.writes)
+    assert recorder.writes[0][2] < len(items)
+
+
+def test_rows_of_stored_parents_are_written_at_the_end(cisco_aci, monkeypatch):
+    # Incremental runs return changed children without their unchanged parents
+    items = [epg("a", "app", "web"), bd("a", "web", "prod")]
+    recorder = Recorder(cisco_aci, monkeypatch, items)
+    cisco_aci.insert_aci_hierarchy(None, recorder.stream(), FABRIC_UUID)
+
+    assert [(class_name, keys) for class_name, keys, _ in recorder.writes] == [
+        ("fvBD", [("tn-a", "BD-web")]), ("fvAEPg", [("tn-a", "ap-app", "epg-web")])
+    ]
+
+
+def test_worker_counts_below_one_are_rejected(cisco_aci, tmp_path):
+    path = tmp_path / "zero.ini"
+    path.write_text("[database]\ntype = sqlite\n\n[ciscoaci]\nper_apic_workers = 0\n")
+    with pytest.raises(ValueError, match="per_apic_workers"):
+        cisco_aci.load_config(str(path))
@@ -0,0 +1,46 @@
+"""
+`show version` parsing against the fixture corpus in benchmarks/fixtures,
+whose expected.json holds the record each fixture must parse to.
+"""
+
+import json
+import os
+
+import pytest
+
+from nati_data.parsers import detect_platform, parse
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks", "fixtures", "show_version")
+
+with open(os.path.join(FIXTURE_DIR, "expected.json"), "r") as f:
+    EXPECTED = json.load(f)
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name), "r") as f:
+        return f.read()
+
+
+def test_every_fixture_has_an_expected_record():
+    fixtures = {name for name in os.listdir(FIXTURE_DIR) if name.endswith(".txt")}
+    assert fixtures == set(EXPECTED)
+
+
+@pytest.mark.parametrize("name", sorted(EXPECTED))
+def test_show_version(name):
+    output = read_fixture(name)
+    expected = EXPECTED[name]
+
+    platform = detect_platform(output)
+    assert platform == expected["platform"]
+
+    record = parse(platform, "show version", output)
+    assert record.hostname == expected["hostname"]
+    assert record.version == expected["version"]
+    assert record.serial == expected["serial"]
+    assert record._asdict() == expected
+
+
+def test_unknown_command_is_rejected():
+    with pytest.raises(ValueError):
+        parse("cisco_ios", "show inventory", "")
@@ -0,0 +1,142 @@
+"""
+ShardWorker leases and ring assignment: two workers sharing a scratch
+SQLite database, as two collector processes share the real one.
+"""
+
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("pymysql")
+
+from nati_data import migrations, sharding
+from nati_data.storage import BulkWriter, close_pools, transaction, SQLITE
+
+SHARDS = 8
+
+
+@pytest.fixture
+def writer(tmp_path):
+    db_config = {"type": SQLITE, "filename": str(tmp_path / "nati.db")}
+    with transaction(db_config) as cursor:
+        migrations.collector_leases(cursor, SQLITE)
+    yield BulkWriter(db_config)
+    close_pools()
+
+
+def make_workers(writer, lease_ttl=60):
+    workers = [sharding.ShardWorker(writer, "aci", name, SHARDS, lease_ttl) for name in ("a", "b")]
+    for worker in workers:
+        worker.register()
+    return workers
+
+
+def lease(writer, shard):
+    return writer.query("SELECT * FROM collector_lease WHERE kind = 'aci' AND shard = %s", (shard,))[0]
+
+
+class FakeJob:
+    """Items keyed like a sharded collector's; collect() records what it was given."""
+
+    def __init__(self, keys, fail=()):
+        self.items = {key: f"item-{key}" for key in keys}
+        self.fail = set(fail)
+        self.collected = []
+
+    def keys(self):
+        return self.items
+
+    def collect(self, items):
+        if self.fail.intersection(items):
+            raise RuntimeError("collection failed")
+        self.collected.extend(items)
+
+
+def test_a_shard_has_one_owner_at_a_time(writer):
+    a, b = make_workers(writer)
+    due = time.time()
+    assert a.claim(3, due)
+    assert not b.claim(3, due)
+    # Claiming a held lease again only renews it
+    assert a.claim(3, due)
+    assert lease(writer, 3)["owner"] == "a"
+
+    a.release(3, finished=False)
+    assert a.held == set()
+    assert b.claim(3, due)
+    assert lease(writer, 3)["owner"] == "b"
+
+
+def test_an_expired_lease_is_taken_over(writer):
+    a, b = make_workers(writer)
+    a.lease_ttl = 0.05
+    assert a.claim(5, time.time())
+    assert not b.claim(5, time.time())
+    # a stops renewing, as a dead worker would
+    time.sleep(0.1)
+    assert b.claim(5, time.time())
+    assert lease(writer, 5)["owner"] == "b"
+
+    # a's late release must not free b's lease
+    a.release(5, finished=True)
+    assert lease(writer, 5)["owner"] == "b"
+    assert lease(writer, 5)["finished_at"] == 0
+
+
+def test_a_finished_shard_waits_for_its_interval(writer):
+    a, b = make_workers(writer)
+    started = time.time()
+    assert a.claim(2, started)
+    a.release(2, finished=True)
+    finished_at = lease(writer, 2)["finished_at"]
+    assert finished_at >= started
+
+    # Not due again for a pass that began before it finished
+    assert not a.claim(2, started)
+    assert not b.claim(2, started)
+    assert b.claim(2, finished_at)
+
+
+def test_the_ring_splits_shards_and_reassigns_on_deregister(writer):
+    a, b = make_workers(writer)
+    assigned_a, assigned_b = set(a.assigned()), set(b.assigned())
+    assert assigned_a | assigned_b == set(range(SHARDS))
+    assert not assigned_a & assigned_b
+    assert assigned_a and assigned_b
+
+    held = min(assigned_b)
+    assert b.claim(held, time.time())
+    b.deregister()
+    # b's shards move to a, and the lease b held is free again
+    assert set(a.assigned()) == set(range(SHARDS))
+    assert lease(writer, held)["owner"] is None
+    assert a.claim(held, time.time())
+
+
+def test_run_pass_collects_each_item_once_across_workers(writer):
+    a, b = make_workers(writer)
+    job = FakeJob(range(40))
+    stop_event = threading.Event()
+    started = time.time()
+
+    collected = a.run_pass(job, started, stop_event) + b.run_pass(job, started, stop_event)
+    assert sorted(job.collected) == sorted(job.items.values())
+    assert collected == len({sharding.shard_of(key, SHARDS) for key in job.items})
+    assert a.held == b.held == set()
+
+    # Everything finished after `started`, so a second pass finds nothing due
+    assert a.run_pass(job, started, stop_event) + b.run_pass(job, started, stop_event) == 0
+
+
+def test_run_pass_leaves_a_failed_shard_due(writer):
+    a, b = make_workers(writer)
+    failing = next(key for key in range(40) if sharding.shard_of(key, SHARDS) in a.assigned())
+    job = FakeJob(range(40), fail=[f"item-{failing}"])
+    started = time.time()
+
+    a.run_pass(job, started, threading.Event())
+    shard = sharding.shard_of(failing, SHARDS)
+    assert lease(writer, shard)["owner"] is None
+    assert lease(writer, shard)["finished_at"] == 0
+    assert a.claim(shard, started)
@@ -0,0 +1,157 @@
+"""
+BulkWriter transactions on a scratch SQLite database: every chunk of a
+call commits together, and only rows that can be replayed are retried.
+"""
+
+import sqlite3
+from contextlib import contextmanager
+
+import pytest
+
+pymysql = pytest.importorskip("pymysql")
+
+from nati_data.storage import BulkWriter, DatabaseError, close_pools, connect, SQLITE
+
+COLUMNS = ("item_id", "value")
+
+
+@pytest.fixture
+def writer(tmp_path):
+    writer = BulkWriter({"type": SQLITE, "filename": str(tmp_path / "nati.db")}, chunk_size=2)
+    writer.execute("CREATE TABLE item (item_id INT PRIMARY KEY, value INT NOT NULL CHECK (value >= 0))")
+    yield writer
+    close_pools()
+
+
+def stored(writer):
+    return [(row["item_id"], row["value"]) for row in writer.query("SELECT * FROM item ORDER BY item_id")]
+
+
+class LockedOnce:
+    """Cursor whose first executemany() fails as a lock wait would."""
+
+    failed = False
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def executemany(self, sql, rows):
+        if not LockedOnce.failed:
+            LockedOnce.failed = True
+            raise sqlite3.OperationalError("database is locked")
+        return self.cursor.executemany(sql, rows)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+@pytest.fixture
+def locked_once(writer, monkeypatch):
+    transaction = writer.pool.transaction
+    LockedOnce.failed = False
+
+    @contextmanager
+    def flaky_transaction():
+        with transaction() as cursor:
+            yield LockedOnce(cursor)
+
+    monkeypatch.setattr(writer.pool, "transaction", flaky_transaction)
+    monkeypatch.setattr("nati_data.storage.RETRY_BACKOFF", 0)
+
+
+def test_a_failed_chunk_rolls_back_the_whole_call(writer):
+    rows = [(1, 1), (2, 2), (3, 3), (4, 4), (5, -1)]
+    with pytest.raises(DatabaseError):
+        writer.upsert("item", COLUMNS, iter(rows), keys=("item_id",))
+    assert stored(writer) == []
+
+
+def test_then_commits_with_the_upsert(writer):
+    writer.upsert("item", COLUMNS, [(1, 1), (2, 2), (3, 3)], keys=("item_id",))
+    prune = ("DELETE FROM item WHERE item_id NOT IN (%s, %s)", (1, 4))
+    writer.upsert("item", COLUMNS, [(1, 10), (4, 40)], keys=("item_id",), then=[prune])
+    assert stored(writer) == [(1, 10), (4, 40)]
+
+    broken = ("DELETE FROM missing_table", ())
+    with pytest.raises(DatabaseError):
+        writer.upsert("item", COLUMNS, [(1, 11), (5, 50), (6, 60)], keys=("item_id",), then=[broken])
+    assert stored(writer) == [(1, 10), (4, 40)]
+
+
+def test_a_transient_error_replays_a_list(writer, locked_once):
+    assert writer.upsert("item", COLUMNS, [(1, 1), (2, 2), (3, 3)], keys=("item_id",)) == 3
+    assert stored(writer) == [(1, 1), (2, 2), (3, 3)]
+
+
+def test_a_transient_error_is_raised_for_an_iterator(writer, locked_once):
+    # The first attempt spent the iterator; replaying it would write nothing
+    with pytest.raises(DatabaseError):
+        writer.upsert("item", COLUMNS, iter([(1, 1), (2, 2), (3, 3)]), keys=("item_id",))
+    assert stored(writer) == []
+
+
+def test_delete_is_one_transaction(writer):
+    writer.upsert("item", COLUMNS, [(1, 1), (2, 2), (3, 3)], keys=("item_id",))
+    assert writer.delete("item", ("item_id",), [(1,), (2,), (3,)]) == 3
+    assert stored(writer) == []
+
+
+class Recording:
+    """Cursor recording the rows each fetchall() returns."""
+
+    fetched = []
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def fetchall(self):
+        rows = self.cursor.fetchall()
+        Recording.fetched.append(rows)
+        return rows
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+def test_skip_unchanged_reads_back_only_the_chunk(writer, monkeypatch):
+    columns = ("grp", "item_id", "value")
+    writer.execute("CREATE TABLE tagged (grp TEXT, item_id INT, value INT, PRIMARY KEY (grp, item_id))")
+    writer.upsert("tagged", columns, [("a", i, i) for i in range(10)] + [("b", 1, 1)], keys=("grp", "item_id"))
+
+    transaction = writer.pool.transaction
+    Recording.fetched = []
+
+    @contextmanager
+    def recording_transaction():
+        with transaction() as cursor:
+            yield Recording(cursor)
+
+    monkeypatch.setattr(writer.pool, "transaction", recording_transaction)
+    rows = [("a", 1, 1), ("a", 2, 20), ("a", 11, 11)]
+    written = writer.upsert("tagged", columns, iter(rows), keys=("grp", "item_id"), skip_unchanged={"grp": "a"})
+
+    assert written == 2
+    # Two chunks; the stored rows read back are only those of their keys
+    assert [len(rows) for rows in Recording.fetched] == [2, 0]
+    assert writer.query("SELECT value FROM tagged WHERE grp = 'a' AND item_id IN (2, 11) ORDER BY item_id") == [
+        {"value": 20}, {"value": 11}
+    ]
+
+
+def test_connect_skips_unreachable_hosts(monkeypatch):
+    tried = []
+
+    def fake_connect(host, **settings):
+        tried.append(host)
+        if host != "db2":
+            raise pymysql.err.OperationalError(2003, f"Can't connect to {host}")
+        return "connection"
+
+    monkeypatch.setattr(pymysql, "connect", fake_connect)
+    db_config = {"host": None, "hosts": "db1, db2 db3", "user": "nati", "pool_size": 4}
+    assert connect(db_config) == "connection"
+    assert "db2" in tried
+
+    db_config["hosts"] = "db1,db3"
+    with pytest.raises(pymysql.err.OperationalError):
+        connect(db_config)